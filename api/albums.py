@@ -1,11 +1,33 @@
-from django.db import IntegrityError
-from ninja import Router
+import itertools
+from typing import Any, Iterator
+
+from django.db import IntegrityError, transaction
+from django.db.models import prefetch_related_objects
+from django.http import StreamingHttpResponse
+from ninja import Query, Router
+from ninja.decorators import decorate_view
 from ninja.responses import codes_4xx
 
-from api import models, schema, utilities as util
+from api import cache, models, renderers, schema, serializers, utilities as util
 
 router = Router()
 
+TRACKLIST_CHUNK_SIZE = 100
+
+INTEGRITY_ERRORS = {
+    '"duplicate_album"': (409, "Album already exists in database."),
+    "duplicate_track_number": (409, "Album already has a song with that track number."),
+    "duplicate_song_case_insensitive_match": (409, "Song already exists in database."),
+    "disc_number_must_be_greater_than_0": (
+        400,
+        "Disc must be a positive integer greater than 0.",
+    ),
+    "track_number_must_be_greater_than_0": (
+        400,
+        "Track number must be a positive integer greater than 0.",
+    ),
+}
+
 
 @router.post("", response={201: schema.AlbumOut, codes_4xx: schema.Error})
 def create_album(request, data: schema.AlbumIn):
@@ -46,6 +68,62 @@ def create_album(request, data: schema.AlbumIn):
         return 201, album
 
 
+@router.put(
+    "",
+    response={200: schema.AlbumOut, 201: schema.AlbumOut, codes_4xx: schema.Error},
+)
+def upsert_album(request, data: schema.AlbumIn):
+    """To create an album, or update it if an album with the same title
+    and release date already exists, include the same fields in the
+    request body as when creating an album. Titles are matched
+    case-insensitively. Responds with 201 if the album was created and
+    200 if it was updated.
+    """
+    try:
+        with transaction.atomic():
+            album, created = util.upsert_album(util.strip_whitespace(data.dict()))
+
+    except IntegrityError as error:
+        return 400, {"error": str(error.__cause__)}
+
+    else:
+        return (201 if created else 200), album
+
+
+@router.post(
+    "bulk", response={201: list[schema.AlbumOutBasic], codes_4xx: schema.Error}
+)
+def create_albums(request, data: list[schema.AlbumBulkIn]):
+    """To create many albums along with their tracklists in a single
+    request, include a list of albums in the request body. Each album
+    has the same fields as when creating a single album, plus the
+    following field:
+    - **songs** (*list[dict]*): The songs in the tracklist of the album
+    ***optional***\\
+        Each song has the same fields as when creating a single song.
+
+    Either every album and song in the request is created or, if any of
+    them cannot be created, none of them are.
+    """
+    album_data = [util.strip_whitespace(album.dict()) for album in data]
+
+    try:
+        with transaction.atomic():
+            albums = util.bulk_create_albums(album_data)
+
+    except IntegrityError as error:
+        error = str(error.__cause__)
+        for constraint, (status, message) in INTEGRITY_ERRORS.items():
+            if constraint in error:
+                return status, {"error": message}
+        return 400, {"error": error}
+
+    else:
+        prefetch_related_objects(albums, "artists")
+
+        return 201, albums
+
+
 @router.post(
     "{int:id}/songs",
     response={201: schema.SongOut, codes_4xx: schema.Error},
@@ -79,11 +157,13 @@ def create_song(request, id: int, data: schema.SongIn):
     - **path** (*string*): The file path of the local music file for the
     song (e.g. "/wutang-clan/enter-the-wutang-36-chambers/10_protect_ya_neck.flac")
     ***required***
+
+    If the file exists in the music library, the length is read from its
+    headers along with its sample rate, bit depth, channels, and bitrate.
     """
     song_data = util.strip_whitespace(data.dict())
-    artist_data = song_data.pop("artists")
-    group_member_data = song_data.pop("group_members")
-    producer_data = song_data.pop("producers")
+    song_data.update(util.probe_song(song_data["path"]))
+    credit_data = {field: song_data.pop(field) for field in util.CREDIT_FIELDS}
 
     try:
         song_data["album"] = models.Album.objects.get(pk=id)
@@ -109,22 +189,216 @@ def create_song(request, id: int, data: schema.SongIn):
             return 400, {"error": error}
 
     else:
-        song.artists.set(util.get_artists(artist_data))
-        if group_member_data:
-            song.artists.add(
-                *util.get_artists(group_member_data), through_defaults={"group": True}
-            )
-        if producer_data:
-            song.producers.set(util.get_artists(producer_data))
+        util.bulk_create_credits([song], [credit_data])
+        prefetch_related_objects([song], *models.song_prefetches())
 
         return 201, song
 
 
-@router.get("{int:id}")
-def retrieve_album(request, id: int):
-    pass
+@router.put(
+    "{int:id}/songs",
+    response={200: schema.SongOut, 201: schema.SongOut, codes_4xx: schema.Error},
+    tags=["songs"],
+)
+def upsert_song(request, id: int, data: schema.SongIn):
+    """To create a song, or update it if a song with the same path
+    already exists, include the same fields in the request body as when
+    creating a song. Paths are matched case-insensitively and an updated
+    song keeps its play count. Responds with 201 if the song was created
+    and 200 if it was updated.
+    """
+    song_data = util.strip_whitespace(data.dict())
+    song_data.update(util.probe_song(song_data["path"]))
+
+    try:
+        song_data["album"] = models.Album.objects.get(pk=id)
+        with transaction.atomic():
+            song, created = util.upsert_song(song_data)
+
+    except models.Album.DoesNotExist:
+        return 404, {"error": f"Album with id = {id} does not exist."}
+    except IntegrityError as error:
+        error = str(error.__cause__)
+        for constraint, (status, message) in INTEGRITY_ERRORS.items():
+            if constraint in error:
+                return status, {"error": message}
+        return 400, {"error": error}
+
+    else:
+        song.album = song_data["album"]
+        prefetch_related_objects([song], *models.song_prefetches())
+
+        return (201 if created else 200), song
+
+
+@router.get("", response={200: schema.AlbumPage, 400: schema.Error})
+@decorate_view(cache.cache_response(*cache.ALBUM_MODELS))
+@decorate_view(cache.conditional_response())
+def list_albums(
+    request,
+    pagination: Query[schema.PageIn],
+    fields: str | None = None,
+    include: str | None = None,
+    ids: str | None = None,
+):
+    """To browse the albums in order of release, page through the list
+    with the following query parameters:
+    - **cursor** (*string*): The **next** cursor of the previous page,
+    omitted for the first page ***optional***
+    - **limit** (*integer*): The number of albums per page, defaults to
+    100 ***optional***
+    - **fields** (*string*): A comma-separated list of the fields to
+    include in each album (e.g. id,title,url), all of them by default
+    ***optional***
+    - **include** (*string*): A comma-separated list of the related
+    resources to embed in each album, with the relations of embedded
+    resources separated by dots, up to two levels deep (e.g.
+    tracklist,artists.albums) ***optional***
+    - **ids** (*string*): A comma-separated list of up to 500 ids of
+    albums to retrieve instead of a page ***optional***
+
+    The response includes the **items** on the page and the **next**
+    cursor, which is null on the last page. The artists, tracklist, and
+    length of the albums are only retrieved if their fields are
+    requested.
+
+    With **ids**, the **items** are the albums in the same order as
+    the ids, with null in place of the ids no album has, and **next** is
+    null.
+    """
+    includes = serializers.select_includes(include, "album")
+    fields = serializers.select_fields(fields, serializers.ALBUM_FIELDS, includes)
+    queryset = models.Album.objects.with_tracklist(*fields)
+    if ids is None:
+        page = serializers.paginate(
+            request, queryset, pagination, fields, serializers.serialize_albums
+        )
+    else:
+        items = serializers.retrieve_many(
+            request,
+            queryset,
+            serializers.select_ids(ids),
+            fields,
+            serializers.serialize_albums,
+        )
+        page = {"items": items, "next": None}
+    serializers.embed(request, "album", page["items"], includes)
+    return router.api.create_response(request, page, status=200)
+
+
+@router.get("{int:id}", response={200: schema.AlbumOut, codes_4xx: schema.Error})
+@decorate_view(cache.cache_response(*cache.ALBUM_MODELS))
+@decorate_view(
+    cache.conditional_response(
+        lambda id: models.Album.objects.filter(pk=id), "albumartist", "artists", "song"
+    )
+)
+def retrieve_album(
+    request, id: int, fields: str | None = None, include: str | None = None
+):
+    """The fields of the album can be selected, and its related resources
+    embedded, with the same **fields** and **include** query parameters
+    as the list of albums.
+    """
+    includes = serializers.select_includes(include, "album")
+    fields = serializers.select_fields(fields, serializers.ALBUM_FIELDS, includes)
+    try:
+        album = serializers.retrieve(
+            request,
+            models.Album.objects.with_tracklist(*fields).filter(pk=id),
+            fields,
+            serializers.serialize_albums,
+        )
+
+    except models.Album.DoesNotExist:
+        return 404, {"error": f"Album with id = {id} does not exist."}
+
+    else:
+        serializers.embed(request, "album", [album], includes)
+        return router.api.create_response(request, album, status=200)
+
+
+@router.get(
+    "{int:id}/songs", response={200: schema.TracklistOut, codes_4xx: schema.Error}
+)
+@decorate_view(cache.cache_response(*cache.SONG_MODELS))
+@decorate_view(
+    cache.conditional_response(
+        lambda id: models.Album.objects.filter(pk=id),
+        "albumartist",
+        "artists",
+        "song",
+        "song__songartist",
+        "song__artists",
+        "song__songproducer",
+        "song__producers",
+    )
+)
+def retrieve_album_songs(request, id: int, fields: str | None = None):
+    """The tracklist of an album is grouped by disc, with the songs on
+    each disc in track order. It is streamed as it is read from the
+    database, so even box sets with hundreds of songs are returned
+    without being held in memory as a whole. The fields of the songs can
+    be selected with the same **fields** query parameter as the list of
+    songs.
+    """
+    fields = serializers.select_fields(fields, serializers.SONG_FIELDS)
+    try:
+        album = serializers.retrieve(
+            request,
+            models.Album.objects.filter(pk=id),
+            serializers.ALBUM_BASIC_FIELDS,
+            serializers.serialize_albums,
+        )
+
+    except models.Album.DoesNotExist:
+        return 404, {"error": f"Album with id = {id} does not exist."}
+
+    else:
+        return StreamingHttpResponse(
+            stream_tracklist(request, album, fields), content_type="application/json"
+        )
+
+
+def stream_tracklist(
+    request, album: dict[str, Any], fields: dict[str, tuple[str, ...]]
+) -> Iterator[bytes]:
+    """Serialize the tracklist of an album one chunk of songs at a time.
+
+    The songs are read in (disc, track_number) order through the
+    duplicate_track_number unique index on (album, disc, track_number),
+    in chunks of TRACKLIST_CHUNK_SIZE rows, and serialized with
+    serializers.serialize_songs along with their credits.
+
+    Arguments:
+        request (HttpRequest) -- The request the tracklist is serialized
+        for.
+        album (dict) -- The album serialized with the fields in
+        serializers.ALBUM_BASIC_FIELDS.
+        fields (dict) -- The fields of the songs to serialize.
+
+    Returns:
+        tracklist (iterator) -- An iterator over the chunks of the JSON
+        representation of a schema.TracklistOut object.
+    """
+    rows = (
+        models.Song.objects.filter(album=album["id"])
+        .order_by("disc", "track_number")
+        .values(*serializers.get_columns(fields, "id", "disc"))
+        .iterator(chunk_size=TRACKLIST_CHUNK_SIZE)
+    )
 
+    yield b'{"album":' + renderers.dumps(album) + b',"discs":['
+    disc = None
+    for batch in itertools.batched(rows, TRACKLIST_CHUNK_SIZE):
+        songs = serializers.serialize_songs(request, batch, fields, album=album)
+        for row, song in zip(batch, songs):
+            if row["disc"] != disc:
+                separator = b"" if disc is None else b"]},"
+                prefix = separator + b'{"disc":%d,"songs":[' % row["disc"]
+                disc = row["disc"]
+            else:
+                prefix = b","
+            yield prefix + renderers.dumps(song)
 
-@router.get("{int:id}/songs")
-def retrieve_album_songs(request, id: int):
-    pass
+    yield b"]}]}" if disc is not None else b"]}"
@@ -1,10 +1,39 @@
+from django.http import Http404
 from ninja import NinjaAPI
 from api.artists import router as artists_router
 from api.albums import router as albums_router
+from api.pagination import InvalidCursor
+from api.renderers import ORJSONRenderer
+from api.search import router as search_router
+from api.serializers import InvalidFields, InvalidIds
 from api.songs import router as songs_router
+from api.typeahead import router as typeahead_router
+
+api = NinjaAPI(renderer=ORJSONRenderer(), urls_namespace="api")
+
+
+@api.exception_handler(InvalidCursor)
+def invalid_cursor(request, error):
+    return api.create_response(request, {"error": str(error)}, status=400)
+
+
+@api.exception_handler(InvalidFields)
+def invalid_fields(request, error):
+    return api.create_response(request, {"error": str(error)}, status=400)
+
+
+@api.exception_handler(InvalidIds)
+def invalid_ids(request, error):
+    return api.create_response(request, {"error": str(error)}, status=400)
+
+
+@api.exception_handler(Http404)
+def not_found(request, error):
+    return api.create_response(request, {"error": str(error)}, status=404)
 
-api = NinjaAPI(urls_namespace="api")
 
 api.add_router("artists/", artists_router, tags=["artists"])
 api.add_router("albums/", albums_router, tags=["albums"])
 api.add_router("songs/", songs_router, tags=["songs"])
+api.add_router("search/", search_router, tags=["search"])
+api.add_router("typeahead/", typeahead_router, tags=["search"])
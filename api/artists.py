@@ -1,8 +1,10 @@
 from django.db import IntegrityError
-from ninja import Router
+from django.http import Http404
+from ninja import Query, Router
+from ninja.decorators import decorate_view
 from ninja.responses import codes_4xx
 
-from api import models, schema, utilities as util
+from api import cache, models, schema, serializers, utilities as util
 
 router = Router()
 
@@ -32,33 +34,236 @@ def create_artist(request, data: schema.ArtistIn):
         return 201, artist
 
 
+@router.put(
+    "",
+    response={200: schema.ArtistOut, 201: schema.ArtistOut, codes_4xx: schema.Error},
+)
+def upsert_artist(request, data: schema.ArtistIn):
+    """To create an artist, or update it if an artist with the same name
+    already exists, include the same fields in the request body as when
+    creating an artist. Names are matched case-insensitively and the
+    hometown of an existing artist is only replaced if one is included.
+    Responds with 201 if the artist was created and 200 if it was
+    updated.
+    """
+    artist, created = util.upsert_artist(util.strip_whitespace(data.dict()))
+
+    return (201 if created else 200), artist
+
+
+@router.get("", response={200: schema.ArtistPage, 400: schema.Error})
+@decorate_view(cache.cache_response(*cache.ARTIST_MODELS))
+@decorate_view(cache.conditional_response())
+def list_artists(
+    request,
+    pagination: Query[schema.PageIn],
+    fields: str | None = None,
+    include: str | None = None,
+    ids: str | None = None,
+):
+    """To browse the artists in alphabetical order, page through the
+    list with the following query parameters:
+    - **cursor** (*string*): The **next** cursor of the previous page,
+    omitted for the first page ***optional***
+    - **limit** (*integer*): The number of artists per page, defaults
+    to 100 ***optional***
+    - **fields** (*string*): A comma-separated list of the fields to
+    include in each artist (e.g. id,name,url), all of them by default
+    ***optional***
+    - **include** (*string*): A comma-separated list of the related
+    resources to embed in each artist, with the relations of embedded
+    resources separated by dots, up to two levels deep (e.g.
+    albums,songs.album) ***optional***
+    - **ids** (*string*): A comma-separated list of up to 500 ids of
+    artists to retrieve instead of a page ***optional***
+
+    The response includes the **items** on the page and the **next**
+    cursor, which is null on the last page. The counts of the albums,
+    singles, songs, and songs produced of the artists are only computed
+    if their fields are requested.
+
+    Embedded albums, singles, songs, and songs produced hold up to 100
+    **items**, with the **next** cursor of the endpoint at **url** if
+    there are more.
+
+    With **ids**, the **items** are the artists in the same order as
+    the ids, with null in place of the ids no artist has, and **next** is
+    null.
+    """
+    includes = serializers.select_includes(include, "artist")
+    fields = serializers.select_fields(fields, serializers.ARTIST_FIELDS, includes)
+    queryset = models.Artist.objects.with_previews(*fields)
+    if ids is None:
+        page = serializers.paginate(
+            request, queryset, pagination, fields, serializers.serialize_artists
+        )
+    else:
+        items = serializers.retrieve_many(
+            request,
+            queryset,
+            serializers.select_ids(ids),
+            fields,
+            serializers.serialize_artists,
+        )
+        page = {"items": items, "next": None}
+    serializers.embed(request, "artist", page["items"], includes)
+    return router.api.create_response(request, page, status=200)
+
+
 @router.get("{int:id}", response={200: schema.ArtistOut, codes_4xx: schema.Error})
-def retrieve_artist(request, id: int):
+@decorate_view(cache.cache_response(*cache.ARTIST_MODELS))
+@decorate_view(
+    cache.conditional_response(
+        lambda id: models.Artist.objects.filter(pk=id),
+        "album_artists",
+        "songartist",
+        "songproducer",
+    )
+)
+def retrieve_artist(
+    request, id: int, fields: str | None = None, include: str | None = None
+):
+    """The fields of the artist can be selected, and its related resources
+    embedded, with the same **fields** and **include** query parameters
+    as the list of artists.
+    """
+    includes = serializers.select_includes(include, "artist")
+    fields = serializers.select_fields(fields, serializers.ARTIST_FIELDS, includes)
     try:
-        artist = models.Artist.objects.get(pk=id)
+        artist = serializers.retrieve(
+            request,
+            models.Artist.objects.with_previews(*fields).filter(pk=id),
+            fields,
+            serializers.serialize_artists,
+        )
 
     except models.Artist.DoesNotExist:
         return 404, {"error": f"Artist with id = {id} does not exist."}
 
     else:
-        return artist
+        serializers.embed(request, "artist", [artist], includes)
+        return router.api.create_response(request, artist, status=200)
+
+
+# The discography endpoints page through the rows joined to an artist
+# through the artist_id and producer_id indexes of AlbumArtist, SongArtist,
+# and SongProducer, and retrieve the credits of each page as a whole.
+
 
+@router.get(
+    "{int:id}/albums",
+    response={200: schema.AlbumBasicPage, codes_4xx: schema.Error},
+)
+@decorate_view(cache.cache_response(*cache.ALBUM_MODELS))
+@decorate_view(cache.conditional_response())
+def retrieve_artist_albums(
+    request,
+    id: int,
+    pagination: Query[schema.PageIn],
+    fields: str | None = None,
+):
+    """The albums of an artist are listed in order of release and paged
+    through with the same **cursor** and **limit** query parameters as
+    the list of artists, and their fields selected with the same
+    **fields** query parameter.
+    """
+    fields = serializers.select_fields(fields, serializers.ALBUM_BASIC_FIELDS)
+    page = serializers.paginate(
+        request,
+        models.Album.objects.filter(artists=get_artist_id(id)).exclude(
+            album_type="single"
+        ),
+        pagination,
+        fields,
+        serializers.serialize_albums,
+    )
+    return router.api.create_response(request, page, status=200)
 
-@router.get("{int:id}/albums")
-def retrieve_artist_albums(request, id: int):
-    pass
 
+@router.get(
+    "{int:id}/singles",
+    response={200: schema.AlbumBasicPage, codes_4xx: schema.Error},
+)
+@decorate_view(cache.cache_response(*cache.ALBUM_MODELS))
+@decorate_view(cache.conditional_response())
+def retrieve_artist_singles(
+    request,
+    id: int,
+    pagination: Query[schema.PageIn],
+    fields: str | None = None,
+):
+    """The singles of an artist are listed in order of release and paged
+    through with the same **cursor** and **limit** query parameters as
+    the list of artists, and their fields selected with the same
+    **fields** query parameter.
+    """
+    fields = serializers.select_fields(fields, serializers.ALBUM_BASIC_FIELDS)
+    page = serializers.paginate(
+        request,
+        models.Album.objects.filter(artists=get_artist_id(id), album_type="single"),
+        pagination,
+        fields,
+        serializers.serialize_albums,
+    )
+    return router.api.create_response(request, page, status=200)
 
-@router.get("{int:id}/singles")
-def retrieve_artist_singles(request, id: int):
-    pass
 
+@router.get("{int:id}/songs", response={200: schema.SongPage, codes_4xx: schema.Error})
+@decorate_view(cache.cache_response(*cache.SONG_MODELS))
+@decorate_view(cache.conditional_response())
+def retrieve_artist_songs(
+    request,
+    id: int,
+    pagination: Query[schema.PageIn],
+    fields: str | None = None,
+):
+    """The songs an artist is credited on, as a featured artist or as a
+    group member, are listed from most to least played and paged through
+    with the same **cursor** and **limit** query parameters as the list
+    of artists, and their fields selected with the same **fields** query
+    parameter.
+    """
+    fields = serializers.select_fields(fields, serializers.SONG_FIELDS)
+    page = serializers.paginate(
+        request,
+        models.Song.objects.filter(artists=get_artist_id(id)),
+        pagination,
+        fields,
+        serializers.serialize_songs,
+    )
+    return router.api.create_response(request, page, status=200)
 
-@router.get("{int:id}/songs")
-def retrieve_artist_songs(request, id: int):
-    pass
+
+@router.get(
+    "{int:id}/songs-produced",
+    response={200: schema.SongPage, codes_4xx: schema.Error},
+)
+@decorate_view(cache.cache_response(*cache.SONG_MODELS))
+@decorate_view(cache.conditional_response())
+def retrieve_artist_songs_produced(
+    request,
+    id: int,
+    pagination: Query[schema.PageIn],
+    fields: str | None = None,
+):
+    """The songs an artist produced are listed from most to least played
+    and paged through with the same **cursor** and **limit** query
+    parameters as the list of artists, and their fields selected with
+    the same **fields** query parameter.
+    """
+    fields = serializers.select_fields(fields, serializers.SONG_FIELDS)
+    page = serializers.paginate(
+        request,
+        models.Song.objects.filter(producers=get_artist_id(id)),
+        pagination,
+        fields,
+        serializers.serialize_songs,
+    )
+    return router.api.create_response(request, page, status=200)
 
 
-@router.get("{int:id}/songs-produced")
-def retrieve_artist_songs_produced(request, id: int):
-    pass
+def get_artist_id(id: int) -> int:
+    """Return the id of an artist, or raise Http404 if it does not exist."""
+    if not models.Artist.objects.filter(pk=id).exists():
+        raise Http404(f"Artist with id = {id} does not exist.")
+    return id
@@ -0,0 +1,365 @@
+import hashlib
+import time
+import uuid
+from functools import partial, wraps
+from typing import Callable, Iterator
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max, Model, OuterRef, QuerySet, Subquery, TextField
+from django.db.models.functions import MD5, Cast
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from api import models
+
+LOCK_TIMEOUT = 10
+LOCK_POLL_INTERVAL = 0.05
+
+# The models each kind of response is rendered from, including the models
+# its counts and credits are read from.
+ARTIST_MODELS = (
+    models.Artist,
+    models.Album,
+    models.AlbumArtist,
+    models.SongArtist,
+    models.SongProducer,
+)
+ALBUM_MODELS = (models.Album, models.AlbumArtist, models.Artist, models.Song)
+SONG_MODELS = (*ALBUM_MODELS, models.SongArtist, models.SongProducer)
+
+# Responses with related resources embedded with ?include= depend on every
+# model.
+EMBEDDED_MODELS = SONG_MODELS
+
+
+def cache_response(*dependencies: type[Model]) -> Callable:
+    """Cache the responses of a GET endpoint until the catalog changes.
+
+    Responses are cached under a key made of the path and query
+    parameters of the request and the current versions of the models
+    the endpoint reads from, so a repeat request is answered without
+    querying the database. Saving or deleting an object of one of those
+    models gives the model a new version (see invalidate), after which
+    the old responses are never read again and expire on their own.
+
+    Responses with embedded resources depend on every model instead.
+    Responses are only cached if the RESPONSE_CACHE setting is on, i.e.
+    with a cache backend shared between processes. Only 200 responses
+    are cached. Streamed responses are cached once
+    they have been streamed in full. While one request renders a missing
+    response, concurrent requests for the same key wait for it to be
+    cached rather than rendering it as well.
+
+    Arguments:
+        dependencies (Model) -- The models the responses of the endpoint
+        are rendered from.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs) -> HttpResponse:
+            if not settings.RESPONSE_CACHE:
+                return view(request, *args, **kwargs)
+
+            key = get_response_key(
+                request,
+                EMBEDDED_MODELS if "include" in request.GET else dependencies,
+            )
+            response = load_response(key)
+            if response is not None:
+                return revalidate(request, response)
+
+            lock = f"avalon:lock:{key}"
+            locked = cache.add(lock, True, LOCK_TIMEOUT)
+            if not locked:
+                response = wait_for_response(key, lock)
+                if response is not None:
+                    return revalidate(request, response)
+
+            release = partial(cache.delete, lock) if locked else lambda: None
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                release()
+                raise
+
+            return save_response(key, response, release)
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_response(
+    get_queryset: Callable | None = None, *lookups: str
+) -> Callable:
+    """Answer conditional GET requests with 304 Not Modified.
+
+    The ETag of the response about a single object is derived from its
+    updated_at timestamp and from the ids and updated_at timestamps of
+    its related objects, which are looked up with one query, so a
+    request with a matching If-None-Match header is answered before the
+    response is rendered or even fetched from the response cache.
+
+    Responses have no Last-Modified header, so If-Modified-Since is
+    ignored: adding or removing a credit changes a response without
+    changing the updated_at timestamp of any object it is rendered
+    from, so no timestamp tells when the response last changed.
+
+    Lists, and responses with related resources embedded with
+    ?include=, are validated by an ETag hashed from their content once
+    rendered instead: looking up every object they are rendered from
+    would cost about as much as rendering them. The 304 response still
+    saves sending the content, and a cached response is revalidated
+    without querying the database.
+
+    Arguments:
+        get_queryset (function) -- A function that is passed the path
+        parameters of the request and returns the queryset of the
+        object the response is about [optional, for lists].
+        lookups (str) -- The relations of that object that are rendered
+        in the response along with it (e.g. "album__artists" for the
+        album artists of a song). Relations to credits (e.g.
+        "songartist") are needed for credits that are added or removed
+        without changing the credited objects.
+    """
+
+    def decorator(view: Callable) -> Callable:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs) -> HttpResponse:
+            if get_queryset is None or "include" in request.GET:
+                return validate_content(request, view(request, *args, **kwargs))
+
+            etag = get_etag(request, get_queryset(**kwargs), lookups)
+            if etag is None:
+                return view(request, *args, **kwargs)
+
+            response = get_conditional_response(request, etag=etag) or view(
+                request, *args, **kwargs
+            )
+            if response.status_code in (200, 304):
+                response["ETag"] = etag
+
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def validate_content(request, response: HttpResponse) -> HttpResponse:
+    """Set the ETag of a rendered response to the hash of its content,
+    and answer the request with 304 Not Modified if it matches."""
+    if response.status_code != 200 or response.streaming:
+        return response
+
+    etag = quote_etag(hashlib.sha256(response.content).hexdigest()[:32])
+    response["ETag"] = etag
+    return get_conditional_response(request, etag=etag, response=response) or response
+
+
+def get_etag(request, queryset: QuerySet, lookups: tuple[str, ...]) -> str | None:
+    """Return the ETag of the response about a single object.
+
+    Each relation is read with a correlated subquery rather than by
+    joining them all, which would multiply the rows of e.g. an artist
+    with many albums and songs. The ETag changes whenever the object or
+    one of its related objects is updated, or a related object is added
+    or removed.
+
+    Returns:
+        etag (str) -- The quoted ETag, or None if the queryset is empty.
+    """
+    expressions = {}
+    for index, lookup in enumerate(lookups):
+        related = queryset.model.objects.filter(pk=OuterRef("pk")).values("pk")
+        expressions[f"ids_{index}"] = Subquery(
+            related.annotate(
+                ids=MD5(
+                    StringAgg(
+                        Cast(f"{lookup}__pk", TextField()),
+                        ",",
+                        ordering=f"{lookup}__pk",
+                    )
+                )
+            ).values("ids")
+        )
+        if has_timestamps(queryset.model, lookup):
+            expressions[f"updated_at_{index}"] = Subquery(
+                related.annotate(updated_at=Max(f"{lookup}__updated_at")).values(
+                    "updated_at"
+                )
+            )
+
+    state = queryset.order_by().values("pk", "updated_at", **expressions).first()
+    if state is None:
+        return None
+
+    parameters = sorted(
+        (name, value) for name, values in request.GET.lists() for value in values
+    )
+    digest = hashlib.sha256(repr((request.path, parameters, state)).encode())
+
+    return quote_etag(digest.hexdigest()[:32])
+
+
+def has_timestamps(model: type[Model], lookup: str) -> bool:
+    """Return whether the objects at the end of a lookup have an
+    updated_at timestamp, as artists, albums, and songs do but credits
+    do not."""
+    for name in lookup.split("__"):
+        model = model._meta.get_field(name).related_model
+    return any(field.name == "updated_at" for field in model._meta.fields)
+
+
+def get_headers(response: HttpResponse) -> dict[str, str]:
+    """Return the headers of a response stored along with its content."""
+    return {
+        header: response[header]
+        for header in ("Content-Type", "ETag")
+        if response.has_header(header)
+    }
+
+
+def get_response_key(request, dependencies: tuple[type[Model], ...]) -> str:
+    """Return the cache key of the response to a request.
+
+    The key includes the scheme and host of the request along with its
+    path, as responses hold absolute URLs built from them.
+    """
+    parameters = sorted(
+        (name, value) for name, values in request.GET.lists() for value in values
+    )
+    versions = get_versions(dependencies)
+    url = request.build_absolute_uri(request.path)
+    digest = hashlib.sha256(repr((url, parameters, versions)).encode())
+
+    return f"avalon:response:{digest.hexdigest()}"
+
+
+def get_versions(dependencies: tuple[type[Model], ...]) -> list[str]:
+    """Return the current versions of the models a response depends on.
+
+    A model without a version, because it was never changed or because
+    its version was evicted from the cache, is given a new one. Versions
+    are random rather than counters so that an evicted version can never
+    come back and revive the responses cached under it.
+    """
+    keys = [get_version_key(model) for model in dependencies]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+
+    return [versions[key] for key in keys]
+
+
+def get_version_key(model: type[Model]) -> str:
+    return f"avalon:version:{model._meta.label_lower}"
+
+
+def invalidate(*dependencies: type[Model]):
+    """Give models new versions so the responses rendered from them are
+    no longer served.
+
+    The versions are changed right away, so the changes are visible to
+    later requests in the same transaction, and again once the
+    transaction commits, since a concurrent request could otherwise
+    cache the rows it read before the commit under the new version.
+    """
+    bump_versions(dependencies)
+    transaction.on_commit(partial(bump_versions, dependencies))
+
+
+def bump_versions(models: tuple[type[Model], ...]):
+    cache.set_many({get_version_key(model): uuid.uuid4().hex for model in models}, None)
+
+
+def save_response(key: str, response: HttpResponse, release: Callable) -> HttpResponse:
+    """Cache a rendered 200 response, once it is streamed if it is a
+    streaming response, and release the lock on its key."""
+    if response.status_code != 200:
+        release()
+    elif response.streaming:
+        response.streaming_content = record_stream(
+            key, response.streaming_content, get_headers(response), release
+        )
+    else:
+        store_response(key, response.content, get_headers(response))
+        release()
+
+    return response
+
+
+def load_response(key: str) -> HttpResponse | None:
+    cached = cache.get(key)
+    if cached is None:
+        return None
+
+    content, headers = cached
+    return HttpResponse(content, headers=headers)
+
+
+def record_stream(
+    key: str, content: Iterator[bytes], headers: dict[str, str], release: Callable
+) -> Iterator[bytes]:
+    """Cache the content of a streamed response as it is sent.
+
+    Nothing is cached if the client disconnects before the end of the
+    stream, or if the content is larger than the
+    RESPONSE_CACHE_MAX_STREAM_SIZE setting, in which case the chunks
+    recorded so far are dropped and the rest is only streamed. The lock
+    on the key is released either way.
+    """
+    try:
+        chunks, size = [], 0
+        for chunk in content:
+            if chunks is not None:
+                size += len(chunk)
+                chunks.append(chunk)
+                if size > settings.RESPONSE_CACHE_MAX_STREAM_SIZE:
+                    chunks = None
+            yield chunk
+        if chunks is not None:
+            store_response(key, b"".join(chunks), headers)
+    finally:
+        release()
+
+
+def revalidate(request, response: HttpResponse) -> HttpResponse:
+    """Answer a conditional request with 304 Not Modified if the cached
+    response has not changed."""
+    return get_conditional_response(
+        request, etag=response.get("ETag"), response=response
+    )
+
+
+def store_response(key: str, content: bytes, headers: dict[str, str]):
+    cache.set(key, (content, headers), settings.RESPONSE_CACHE_TIMEOUT)
+
+
+def wait_for_response(key: str, lock: str) -> HttpResponse | None:
+    """Wait for the request holding the lock on a key to cache its
+    response.
+
+    Returns:
+        response (HttpResponse) -- The cached response, or None if the
+        lock was released or expired without a response being cached.
+    """
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        response = load_response(key)
+        if response is not None:
+            return response
+        if cache.get(lock) is None:
+            return load_response(key)
+
+    return None
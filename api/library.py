@@ -0,0 +1,215 @@
+import datetime
+import hashlib
+import os
+from pathlib import Path
+from typing import Any, Iterator
+
+import mutagen
+
+from api import probe
+
+AUDIO_EXTENSIONS = {".flac", ".m4a", ".mp3", ".mp4", ".oga", ".ogg", ".opus"}
+HASH_SAMPLE_SIZE = 64 * 1024
+
+
+def find_audio_files(root: str) -> Iterator[str]:
+    """Find the audio files in a music library.
+
+    This utility walks the directory tree under the library root and
+    yields the path of every file with an audio file extension, in
+    sorted order so that the songs of an album are found together.
+
+    Arguments:
+        root (str) -- The path of the root directory of the library.
+
+    Returns:
+        paths (iterator) -- An iterator over the paths of the audio
+        files in the library.
+    """
+    for directory, subdirectories, files in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS:
+                yield os.path.join(directory, name)
+
+
+def get_file_state(stat: os.stat_result) -> dict[str, int]:
+    """Return the file state stored on a Song from the stat of its file.
+
+    Arguments:
+        stat (stat_result) -- The result of os.stat on the audio file.
+
+    Returns:
+        state (dict) -- A dictionary with the file_size, file_mtime (in
+        nanoseconds), and file_inode fields of the Song.
+    """
+    return {
+        "file_size": stat.st_size,
+        "file_mtime": stat.st_mtime_ns,
+        "file_inode": stat.st_ino,
+    }
+
+
+def get_song_path(root: str, path: str) -> str:
+    """Return the path of an audio file relative to the library root.
+
+    Songs store their path relative to the root of the library with a
+    leading slash (e.g. "/wutang-clan/enter-the-wutang-36-chambers/
+    10_protect_ya_neck.flac") so the library can be mounted anywhere.
+
+    Arguments:
+        root (str) -- The path of the root directory of the library.
+        path (str) -- The path of the audio file.
+
+    Returns:
+        path (str) -- The path of the audio file as stored on its Song.
+    """
+    return "/" + Path(path).relative_to(root).as_posix()
+
+
+def hash_file(path: str) -> str:
+    """Return a content hash of an audio file.
+
+    The hash covers the size of the file along with its first and last
+    64 KiB, which hold the tags, the stream headers, and the end of the
+    audio stream. That is enough to recognize a file that was moved or
+    renamed without reading the whole file, which matters for libraries
+    of lossless audio.
+
+    Arguments:
+        path (str) -- The path of the audio file.
+
+    Returns:
+        hash (str) -- The hex digest of the hash.
+    """
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        digest.update(size.to_bytes(8, "big"))
+        digest.update(file.read(HASH_SAMPLE_SIZE))
+        if size > HASH_SAMPLE_SIZE:
+            file.seek(max(size - HASH_SAMPLE_SIZE, HASH_SAMPLE_SIZE))
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+def read_file(root: str, path: str) -> tuple[dict[str, Any] | None, str]:
+    """Read the metadata and content hash of an audio file.
+
+    Arguments:
+        root (str) -- The path of the root directory of the library.
+        path (str) -- The path of the audio file.
+
+    Returns:
+        song_data (dict) -- The metadata returned by read_tags, with the
+        length and stream properties returned by probe.probe_file if
+        the headers of the file could be parsed.
+        hash (str) -- The content hash returned by hash_file, or an
+        empty string if the file cannot be read.
+    """
+    try:
+        song_data = read_tags(root, path)
+        if song_data:
+            song_data.update(probe.probe_file(path) or {})
+        return song_data, hash_file(path)
+    # mutagen raises more than MutagenError on some corrupt files (e.g.
+    # struct.error or IndexError), and one such file must not abort the
+    # scan of the rest of the library. The scanner reports it as unreadable.
+    except Exception:
+        return None, ""
+
+
+def read_tags(root: str, path: str) -> dict[str, Any] | None:
+    """Read the metadata of a song from the tags of an audio file.
+
+    This utility reads the tags and stream info from the headers of a
+    FLAC, MP3, Ogg, or MP4 file and returns the metadata in the shape
+    expected by utilities.import_songs. It does not touch the database,
+    so it can run in a separate process.
+
+    Arguments:
+        root (str) -- The path of the root directory of the library.
+        path (str) -- The path of the audio file.
+
+    Returns:
+        song_data (dict) -- A dictionary with the metadata of the song
+        and its album, or None if the file cannot be read or is missing
+        the title, album, date, or track number tags.
+    """
+    try:
+        audio = mutagen.File(path, easy=True)
+    except mutagen.MutagenError:
+        return None
+    if audio is None or not audio.tags:
+        return None
+
+    tags = audio.tags
+    disc, disc_total = parse_number(get_tag(tags, "discnumber"))
+    disc_total = disc_total or parse_number(get_tag(tags, "disctotal"))[0]
+    track_number, _ = parse_number(get_tag(tags, "tracknumber"))
+    release_date = parse_date(get_tag(tags, "originaldate", "date"))
+    if not (get_tag(tags, "title") and get_tag(tags, "album")):
+        return None
+    if not (track_number and release_date):
+        return None
+
+    artists = get_artist_data(tags, "artist")
+    return {
+        "title": get_tag(tags, "title"),
+        "artists": artists,
+        "producers": get_artist_data(tags, "producer"),
+        "disc": disc or 1,
+        "track_number": track_number,
+        "length": round(audio.info.length),
+        "path": get_song_path(root, path),
+        "album": {
+            "title": get_tag(tags, "album"),
+            "artists": get_artist_data(tags, "albumartist") or artists,
+            "release_date": release_date,
+            "label": get_tag(tags, "label", "organization"),
+            "album_type": get_album_type(tags, disc, disc_total),
+        },
+    }
+
+
+def get_album_type(tags: Any, disc: int | None, disc_total: int | None) -> str:
+    """Determine the album type of a song's album from its tags."""
+    if "single" in get_tag(tags, "releasetype", "musicbrainz_albumtype").lower():
+        return "single"
+    elif (disc_total or disc or 1) > 1:
+        return "multidisc"
+    else:
+        return "album"
+
+
+def get_artist_data(tags: Any, key: str) -> list[dict[str, str]]:
+    """Return the artists in a multi-valued tag as artist metadata."""
+    names = tags[key] if key in tags.keys() else []
+    return [{"name": name.strip(), "hometown": ""} for name in names if name.strip()]
+
+
+def get_tag(tags: Any, *keys: str) -> str:
+    """Return the first value of the first tag present out of keys."""
+    for key in keys:
+        if key in tags.keys() and tags[key] and tags[key][0].strip():
+            return tags[key][0].strip()
+    return ""
+
+
+def parse_date(value: str) -> datetime.date | None:
+    """Parse a tag date like "1997-03-25", "1997-03", or "1997"."""
+    parts = value[:10].split("-")
+    try:
+        return datetime.date(*(int(part) for part in parts), *[1] * (3 - len(parts)))
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_number(value: str) -> tuple[int | None, int | None]:
+    """Parse a tag number like "3" or "3/12" into (number, total)."""
+    number, _, total = value.partition("/")
+    return (
+        int(number) if number.strip().isdigit() else None,
+        int(total) if total.strip().isdigit() else None,
+    )
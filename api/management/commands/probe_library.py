@@ -0,0 +1,90 @@
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DataError, transaction
+
+from api import models, probe, signals
+from api.scanner import POOL_THRESHOLD
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill in the length, sample rate, bit depth, channels, and bitrate of "
+        "songs by parsing the headers of their audio files. No audio is decoded."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("root", help="The root directory of the music library.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="The number of processes reading files, defaults to the CPU count.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The number of songs written to the database per query.",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Probe every song, not just the songs that were never probed.",
+        )
+
+    def handle(self, *args, root, workers, batch_size, all, **options):
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory.")
+
+        songs = models.Song.objects.order_by("id")
+        if not all:
+            songs = songs.filter(sample_rate__isnull=True)
+
+        counts, last_id = Counter(), 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            while batch := list(
+                songs.filter(id__gt=last_id).values_list("id", "path")[:batch_size]
+            ):
+                last_id = batch[-1][0]
+                paths = [os.path.join(root, path.lstrip("/")) for _, path in batch]
+                if len(paths) < POOL_THRESHOLD:
+                    results = map(probe.probe_file, paths)
+                else:
+                    results = executor.map(probe.probe_file, paths, chunksize=64)
+
+                updates = []
+                for (id, path), properties in zip(batch, results):
+                    if properties:
+                        updates.append(models.Song(id=id, **properties))
+                    else:
+                        self.stderr.write(f"Could not probe {path}.")
+                if not self.write(updates):
+                    updates = []
+                counts["probed"] += len(updates)
+                counts["failed"] += len(batch) - len(updates)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Probed {counts["probed"]} songs. Could not probe "
+                f"{counts["failed"]} files."
+            )
+        )
+
+    def write(self, updates: list[models.Song]) -> bool:
+        """Write a batch of probed songs, reporting the batch instead of
+        aborting the backfill if the database rejects it."""
+        try:
+            with transaction.atomic():
+                models.Song.objects.bulk_update(
+                    updates, ["length", *probe.AUDIO_FIELDS]
+                )
+        except DataError as error:
+            ids = f"{updates[0].id} to {updates[-1].id}"
+            self.stderr.write(f"Could not write songs {ids}: {error}")
+            return False
+
+        signals.catalog_changed.send(sender=models.Song)
+        return True
@@ -0,0 +1,53 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.scanner import LibraryScanner
+
+
+class Command(BaseCommand):
+    help = (
+        "Synchronize the songs in the database with a music library by reading "
+        "the tags of its FLAC, MP3, Ogg, and MP4 files. Only files that were "
+        "added, changed, moved, or deleted since the last scan are read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("root", help="The root directory of the music library.")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="The number of processes reading tags, defaults to the CPU count.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The number of songs written to the database per transaction.",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Read every file again, even if it has not changed.",
+        )
+
+    def handle(self, *args, root, workers, batch_size, full, **options):
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory.")
+        if not any(os.scandir(root)):
+            # An unmounted library would otherwise delete every song.
+            raise CommandError(f"{root} is empty.")
+
+        scanner = LibraryScanner(root, workers, batch_size, stderr=self.stderr)
+        counts = scanner.scan(full=full)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Added {counts["added"]} songs, updated {counts["updated"]}, "
+                f"moved {counts["moved"]}, deleted {counts["deleted"]}, and left "
+                f"{counts["unchanged"]} unchanged. Could not read "
+                f"{counts["unreadable"]} files and could not write "
+                f"{counts["failed"]} songs."
+            )
+        )
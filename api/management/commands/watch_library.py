@@ -0,0 +1,82 @@
+import os
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+
+from api.scanner import LibraryScanner
+from api.watcher import LibraryWatcher
+
+# The number of seconds to wait before retrying changes that could not be
+# synchronized because the database was unavailable.
+RETRY_DELAY = 5.0
+
+
+class Command(BaseCommand):
+    help = (
+        "Watch a music library with inotify and keep the songs in the database "
+        "in sync with its files as they are added, changed, moved, or deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("root", help="The root directory of the music library.")
+        parser.add_argument(
+            "--debounce",
+            type=float,
+            default=0.25,
+            help="The number of quiet seconds after which changes are written.",
+        )
+        parser.add_argument(
+            "--max-delay",
+            type=float,
+            default=1.0,
+            help="The maximum number of seconds a change is held back.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="The number of songs written to the database per transaction.",
+        )
+
+    def handle(self, *args, root, debounce, max_delay, batch_size, **options):
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory.")
+
+        scanner = LibraryScanner(root, batch_size=batch_size, stderr=self.stderr)
+        try:
+            watcher = LibraryWatcher(scanner, debounce, max_delay)
+        except OSError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(f"Watching {scanner.root} for changes.")
+        try:
+            while True:
+                counts = self.poll(watcher)
+                if counts is None:
+                    continue
+
+                # Do not hold on to a connection between bursts of changes.
+                close_old_connections()
+                if self.verbosity > 0:
+                    self.stdout.write(
+                        f"Added {counts["added"]} songs, updated {counts["updated"]}, "
+                        f"moved {counts["moved"]}, and deleted {counts["deleted"]}."
+                    )
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
+    def poll(self, watcher: LibraryWatcher) -> Counter | None:
+        """Poll the watcher, waiting out errors of the database."""
+        try:
+            return watcher.poll()
+        except DatabaseError as error:
+            # The watcher keeps the pending changes, so they are retried on
+            # a new connection once the database is back.
+            self.stderr.write(f"Could not synchronize changes: {error}")
+            connection.close()
+            time.sleep(RETRY_DELAY)
+            return None
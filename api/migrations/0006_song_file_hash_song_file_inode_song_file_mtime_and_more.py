@@ -0,0 +1,37 @@
+# Generated by Django 5.1.3 on 2026-10-18 17:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_remove_songproducer_role"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="song",
+            name="file_hash",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="file_inode",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="file_mtime",
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="file_size",
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(fields=["file_inode"], name="song_file_inode"),
+        ),
+    ]
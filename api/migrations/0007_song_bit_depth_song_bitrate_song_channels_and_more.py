@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0006_song_file_hash_song_file_inode_song_file_mtime_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="song",
+            name="bit_depth",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="bitrate",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="channels",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="sample_rate",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
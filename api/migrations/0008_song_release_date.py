@@ -0,0 +1,45 @@
+# Generated by Django 5.1.3 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_song_bit_depth_song_bitrate_song_channels_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="song",
+            name="release_date",
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE api_song
+                SET release_date = api_album.release_date
+                FROM api_album
+                WHERE api_song.album_id = api_album.id
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="song",
+            name="release_date",
+            field=models.DateField(editable=False),
+        ),
+        migrations.AlterModelOptions(
+            name="song",
+            options={
+                "ordering": ["-play_count", "-release_date", "disc", "track_number"]
+            },
+        ),
+        migrations.AddIndex(
+            model_name="song",
+            index=models.Index(
+                fields=["-play_count", "-release_date", "disc", "track_number", "id"],
+                name="song_default_ordering",
+            ),
+        ),
+    ]
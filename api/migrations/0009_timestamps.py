@@ -0,0 +1,56 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+# Every update of an artist, album, or song sets its updated_at, including
+# bulk_update, QuerySet.update, and raw SQL, which do not call Model.save.
+# clock_timestamp() is used rather than now() so that changes made later in
+# the same transaction get later timestamps.
+SET_UPDATED_AT = """
+    CREATE FUNCTION api_set_updated_at() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.updated_at := clock_timestamp();
+        RETURN NEW;
+    END
+    $$;
+    CREATE TRIGGER set_updated_at BEFORE UPDATE ON api_artist
+        FOR EACH ROW EXECUTE FUNCTION api_set_updated_at();
+    CREATE TRIGGER set_updated_at BEFORE UPDATE ON api_album
+        FOR EACH ROW EXECUTE FUNCTION api_set_updated_at();
+    CREATE TRIGGER set_updated_at BEFORE UPDATE ON api_song
+        FOR EACH ROW EXECUTE FUNCTION api_set_updated_at();
+"""
+
+DROP_SET_UPDATED_AT = "DROP FUNCTION api_set_updated_at CASCADE;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_song_release_date"),
+    ]
+
+    operations = [
+        *[
+            operation
+            for model_name in ("artist", "album", "song")
+            for operation in (
+                migrations.AddField(
+                    model_name=model_name,
+                    name="created_at",
+                    field=models.DateTimeField(
+                        auto_now_add=True, default=django.utils.timezone.now
+                    ),
+                    preserve_default=False,
+                ),
+                migrations.AddField(
+                    model_name=model_name,
+                    name="updated_at",
+                    field=models.DateTimeField(
+                        auto_now=True, db_index=True, default=django.utils.timezone.now
+                    ),
+                    preserve_default=False,
+                ),
+            )
+        ],
+        migrations.RunSQL(sql=SET_UPDATED_AT, reverse_sql=DROP_SET_UPDATED_AT),
+    ]
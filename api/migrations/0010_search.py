@@ -0,0 +1,98 @@
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+# api_unaccent strips the accents of text with the unaccent extension where
+# it is available. Otherwise it decomposes the text (NFD) and drops the
+# combining marks, which covers accented Latin letters but not ligatures or
+# letters like "ø", and which needs a UTF8 database. The migration fails
+# rather than leave accents in the search columns if neither is available,
+# since the columns would have to be rebuilt to fix them. unaccent() itself
+# is only STABLE, as its dictionary could change, so it is wrapped in an
+# IMMUTABLE function to be usable in generated columns.
+CREATE_UNACCENT = """
+    DO $do$
+    DECLARE
+        extension_schema name;
+    BEGIN
+        IF EXISTS (SELECT FROM pg_available_extensions WHERE name = 'unaccent') THEN
+            CREATE EXTENSION IF NOT EXISTS unaccent;
+            SELECT extnamespace::regnamespace::name INTO extension_schema
+            FROM pg_extension WHERE extname = 'unaccent';
+            EXECUTE format(
+                'CREATE FUNCTION api_unaccent(text) RETURNS text '
+                'LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE '
+                'AS $fn$ SELECT %I.unaccent(%L::regdictionary, $1) $fn$',
+                extension_schema, extension_schema || '.unaccent'
+            );
+        ELSIF current_setting('server_encoding') = 'UTF8' THEN
+            CREATE FUNCTION api_unaccent(text) RETURNS text
+                LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE
+                AS $fn$ SELECT regexp_replace(normalize($1, NFD), '[\\u0300-\\u036f]', '', 'g') $fn$;
+        ELSE
+            RAISE EXCEPTION 'api_unaccent needs the unaccent extension or a UTF8 database'
+                USING HINT = 'Install the unaccent extension (postgresql-contrib) or '
+                             'create the database with ENCODING ''UTF8''.';
+        END IF;
+    END
+    $do$;
+"""
+
+DROP_UNACCENT = "DROP FUNCTION api_unaccent;"
+
+
+def search_vector(name, weight):
+    return django.contrib.postgres.search.SearchVector(
+        models.Func(
+            models.F(name), function="api_unaccent", output_field=models.TextField()
+        ),
+        config="simple",
+        weight=weight,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_timestamps"),
+    ]
+
+    operations = [
+        migrations.RunSQL(sql=CREATE_UNACCENT, reverse_sql=DROP_UNACCENT),
+        migrations.AddField(
+            model_name="artist",
+            name="search",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=search_vector("name", "A"),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name="album",
+            name="search",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=search_vector("title", "A") + search_vector("label", "B"),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name="song",
+            name="search",
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=search_vector("title", "A"),
+                output_field=django.contrib.postgres.search.SearchVectorField(),
+            ),
+        ),
+        *[
+            migrations.AddIndex(
+                model_name=model_name,
+                index=django.contrib.postgres.indexes.GinIndex(
+                    fields=["search"], name=f"{model_name}_search"
+                ),
+            )
+            for model_name in ("artist", "album", "song")
+        ],
+    ]
@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+# Every statement deleting artists, albums, or songs logs their ids with a
+# single INSERT, including cascades and raw deletes. clock_timestamp() is
+# used rather than now() so that the log can be read from the time it was
+# last read, like updated_at.
+LOG_DELETIONS = """
+    CREATE FUNCTION api_log_deletions() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        INSERT INTO api_deletion (kind, object_id, deleted_at)
+        SELECT TG_ARGV[0], id, clock_timestamp() FROM old_rows;
+        RETURN NULL;
+    END
+    $$;
+    CREATE TRIGGER log_deletions AFTER DELETE ON api_artist
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION api_log_deletions('artist');
+    CREATE TRIGGER log_deletions AFTER DELETE ON api_album
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION api_log_deletions('album');
+    CREATE TRIGGER log_deletions AFTER DELETE ON api_song
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION api_log_deletions('song');
+"""
+
+DROP_LOG_DELETIONS = "DROP FUNCTION api_log_deletions CASCADE;"
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_search"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Deletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=10)),
+                ("object_id", models.BigIntegerField()),
+                ("deleted_at", models.DateTimeField(db_index=True)),
+            ],
+            options={
+                "ordering": ["id"],
+            },
+        ),
+        migrations.RunSQL(sql=LOG_DELETIONS, reverse_sql=DROP_LOG_DELETIONS),
+    ]
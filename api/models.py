@@ -1,11 +1,93 @@
+import functools
+import operator
+
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.core import validators
 from django.urls import reverse
 
 
+def unaccent(expression: models.Expression) -> models.Func:
+    """Return text without its accents (e.g. "Beyonce" for "Beyoncé").
+
+    api_unaccent is created by migration 0010 and is immutable, so it
+    can be used in generated columns and index expressions.
+    """
+    return models.Func(
+        expression, function="api_unaccent", output_field=models.TextField()
+    )
+
+
+def search_vector(*columns: tuple[str, str]) -> SearchVector:
+    """Return the full-text search document of a row.
+
+    Words are neither stemmed nor dropped as stop words, as names and
+    titles are in any language, and are stripped of their accents.
+
+    Arguments:
+        columns (tuple) -- The name and weight, from "A" to "D", of each
+        column of the document.
+    """
+    vectors = [
+        SearchVector(unaccent(models.F(name)), config="simple", weight=weight)
+        for name, weight in columns
+    ]
+    return functools.reduce(operator.add, vectors)
+
+
+class ArtistQuerySet(models.QuerySet):
+    def with_previews(self, *fields: str) -> "ArtistQuerySet":
+        """Annotate the number of albums, singles, songs, and production
+        credits of each artist, so artists can be serialized with
+        schema.ArtistOut in a single query.
+
+        Albums and singles are counted with conditional aggregation over
+        one join. Songs and production credits are counted in correlated
+        subqueries, as joining all three relations at once would
+        multiply the rows of prolific artists.
+
+        Arguments:
+            fields (str) -- The fields of schema.ArtistOut to serialize,
+            of which only the counts of albums, singles, songs, and
+            songs_produced are annotated [optional, all by default].
+        """
+        annotations = {}
+        if not fields or "albums" in fields:
+            annotations["album_count"] = models.Count(
+                "album_artists", filter=~models.Q(album_artists__album_type="single")
+            )
+        if not fields or "singles" in fields:
+            annotations["single_count"] = models.Count(
+                "album_artists", filter=models.Q(album_artists__album_type="single")
+            )
+        if not fields or "songs" in fields:
+            annotations["song_count"] = count_subquery(
+                SongArtist, artist=models.OuterRef("pk")
+            )
+        if not fields or "songs_produced" in fields:
+            annotations["songs_produced_count"] = count_subquery(
+                SongProducer, producer=models.OuterRef("pk")
+            )
+
+        return self.annotate(**annotations)
+
+
 class Artist(models.Model):
     name = models.CharField(max_length=100, unique=True)
     hometown = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Also set by a database trigger on every update, including bulk and raw
+    # updates (see migration 0009). Changes to related rows are read from
+    # those rows when responses are validated (see cache.get_etag).
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    search = models.GeneratedField(
+        expression=search_vector(("name", "A")),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = ArtistQuerySet.as_manager()
 
     def __str__(self):
         return self.name
@@ -32,6 +114,7 @@ class Artist(models.Model):
 
     class Meta:
         ordering = ["name"]
+        indexes = [GinIndex(fields=["search"], name="artist_search")]
         constraints = [
             models.UniqueConstraint(
                 models.functions.Lower("name"),
@@ -40,6 +123,30 @@ class Artist(models.Model):
         ]
 
 
+class AlbumQuerySet(models.QuerySet):
+    def with_tracklist(self, *fields: str) -> "AlbumQuerySet":
+        """Annotate the number of songs and the total length of each
+        album and prefetch its artists, so albums can be serialized with
+        schema.AlbumOut in a fixed number of queries.
+
+        Arguments:
+            fields (str) -- The fields of schema.AlbumOut to serialize,
+            of which only the tracklist, length, and artists are
+            annotated or prefetched [optional, all by default].
+        """
+        annotations = {}
+        if not fields or "tracklist" in fields:
+            annotations["song_count"] = models.Count("song")
+        if not fields or "length" in fields:
+            annotations["song_length"] = models.Sum("song__length")
+
+        queryset = self.annotate(**annotations)
+        if not fields or "artists" in fields:
+            queryset = queryset.prefetch_related("artists")
+
+        return queryset
+
+
 class Album(models.Model):
     ALBUM_TYPES = {"album": "album", "multidisc": "multidisc", "single": "single"}
 
@@ -50,6 +157,15 @@ class Album(models.Model):
     release_date = models.DateField()
     label = models.CharField(max_length=100, blank=True)
     album_type = models.CharField(max_length=10, choices=ALBUM_TYPES, default="album")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    search = models.GeneratedField(
+        expression=search_vector(("title", "A"), ("label", "B")),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    objects = AlbumQuerySet.as_manager()
 
     def __str__(self):
         return self.title
@@ -64,6 +180,7 @@ class Album(models.Model):
 
     class Meta:
         ordering = ["release_date"]
+        indexes = [GinIndex(fields=["search"], name="album_search")]
         constraints = [
             models.UniqueConstraint(
                 models.functions.Lower("title"),
@@ -98,6 +215,9 @@ class Song(models.Model):
         Artist, through="SongProducer", related_name="song_producers"
     )
     album = models.ForeignKey(Album, on_delete=models.CASCADE)
+    # A copy of album.release_date kept in sync by api.signals, so the
+    # default ordering can be served from an index without joining Album.
+    release_date = models.DateField(editable=False)
     disc = models.PositiveSmallIntegerField(
         default=1, validators=[validators.MinValueValidator(1)]
     )
@@ -107,6 +227,21 @@ class Song(models.Model):
     length = models.PositiveSmallIntegerField()
     path = models.CharField(max_length=1000, unique=True)
     play_count = models.PositiveIntegerField(default=0)
+    file_size = models.PositiveBigIntegerField(null=True, blank=True)
+    file_mtime = models.BigIntegerField(null=True, blank=True)
+    file_inode = models.PositiveBigIntegerField(null=True, blank=True)
+    file_hash = models.CharField(max_length=64, blank=True)
+    sample_rate = models.PositiveIntegerField(null=True, blank=True)
+    bit_depth = models.PositiveSmallIntegerField(null=True, blank=True)
+    channels = models.PositiveSmallIntegerField(null=True, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    search = models.GeneratedField(
+        expression=search_vector(("title", "A")),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
 
     def __str__(self):
         return f"{self.track_number}. {self.title} [{self.album.title}]"
@@ -116,7 +251,15 @@ class Song(models.Model):
         return reverse("api:retrieve_song", args=[str(self.id)])
 
     class Meta:
-        ordering = ["-play_count", "-album__release_date", "disc", "track_number"]
+        ordering = ["-play_count", "-release_date", "disc", "track_number"]
+        indexes = [
+            models.Index(fields=["file_inode"], name="song_file_inode"),
+            models.Index(
+                fields=["-play_count", "-release_date", "disc", "track_number", "id"],
+                name="song_default_ordering",
+            ),
+            GinIndex(fields=["search"], name="song_search"),
+        ]
         constraints = [
             models.UniqueConstraint(
                 models.functions.Lower("path"),
@@ -167,3 +310,49 @@ class SongProducer(models.Model):
                 fields=["song", "producer"], name="duplicate_producer"
             )
         ]
+
+
+class Deletion(models.Model):
+    # Written by database triggers whenever artists, albums, or songs are
+    # deleted, however they are deleted (see migration 0011), and read by
+    # api.typeahead to drop them from the indexes of every process.
+    kind = models.CharField(max_length=10)
+    object_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}"
+
+    class Meta:
+        ordering = ["id"]
+
+
+def count_subquery(model: type[models.Model], **filters) -> models.Func:
+    """Return a subquery counting the rows of model matching filters."""
+    counts = (
+        model.objects.filter(**filters)
+        .order_by()
+        .values(*filters)
+        .annotate(count=models.Count("*"))
+        .values("count")
+    )
+    return models.functions.Coalesce(
+        models.Subquery(counts, output_field=models.IntegerField()), 0
+    )
+
+
+def song_prefetches(album: bool = True) -> list[str | models.Prefetch]:
+    """Return the lookups prefetched for serializing songs.
+
+    Every credit of a song is fetched along with its artist in one
+    query, and split into featured artists and group members in memory.
+    The artists of the album are left out if album is False, e.g. when
+    the songs all belong to an album that was already retrieved.
+    """
+    lookups = [
+        models.Prefetch(
+            "songartist_set", queryset=SongArtist.objects.select_related("artist")
+        ),
+        "producers",
+    ]
+    return [*lookups, "album__artists"] if album else lookups
@@ -0,0 +1,117 @@
+import base64
+import binascii
+import datetime
+import json
+from typing import Any
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def paginate_keyset(
+    queryset: QuerySet, ordering: tuple[str, ...], cursor: str | None, limit: int
+) -> tuple[list[Any], str | None]:
+    """Retrieve a page of a queryset after the position of a cursor.
+
+    This utility sorts the queryset by ordering and the primary key,
+    filters out every item up to and including the item the cursor
+    points at, and retrieves one item more than the page holds to find
+    out whether there is a next page.
+
+    Arguments:
+        queryset (QuerySet) -- The items to paginate.
+        ordering (tuple) -- The fields the items are sorted by, with a
+        leading "-" for descending order (e.g. ("-play_count",
+        "-release_date", "disc", "track_number")).
+        cursor (str) -- The cursor returned with the previous page, or
+        None for the first page.
+        limit (int) -- The number of items per page.
+
+    Returns:
+        items (list) -- The items on the page.
+        cursor (str) -- The cursor of the next page, or None if this is
+        the last page.
+
+    Raises:
+        InvalidCursor -- If the cursor was not returned by this utility
+        for the same ordering.
+    """
+    keys = [*ordering, "id"]
+    queryset = queryset.order_by(*keys)
+    if cursor is not None:
+        try:
+            queryset = queryset.filter(seek(keys, decode_cursor(cursor, len(keys))))
+        except (TypeError, ValueError, ValidationError):
+            raise InvalidCursor("Cursor is invalid.")
+
+    items = list(queryset[: limit + 1])
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    return items, encode_cursor([get_value(items[-1], key) for key in keys])
+
+
+def seek(keys: list[str], values: list[Any]) -> Q:
+    """Return the condition matching the items sorted after values.
+
+    For keys (a, -b, id) this is a >= A AND (a > A OR (a = A AND b < B)
+    OR (a = A AND b = B AND id > ID)). The first condition is implied by
+    the others, but unlike a chain of ORs it bounds a scan of an index
+    on the keys, which then starts at the cursor rather than at the
+    first row.
+    """
+    condition, equal = Q(), Q()
+    for key, value in zip(keys, values):
+        field = key.lstrip("-")
+        after = Q(**{f"{field}__lt" if key.startswith("-") else f"{field}__gt": value})
+        condition |= equal & after
+        equal &= Q(**{field: value})
+
+    first = keys[0].lstrip("-")
+    bound = Q(
+        **{f"{first}__lte" if keys[0].startswith("-") else f"{first}__gte": values[0]}
+    )
+    return bound & condition
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any]:
+    """Decode the sort key values of a cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode() + b"=="))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Cursor is invalid.")
+    if not isinstance(values, list) or len(values) != length:
+        raise InvalidCursor("Cursor is invalid.")
+
+    return values
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """Encode sort key values as an opaque, URL-safe cursor."""
+    data = json.dumps(
+        [
+            value.isoformat() if isinstance(value, datetime.date) else value
+            for value in values
+        ],
+        separators=(",", ":"),
+    )
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip("=")
+
+
+def get_value(item: Any, key: str) -> Any:
+    """Return the value of a sort key like "-album__release_date".
+
+    The item is either a model instance or a row retrieved with
+    QuerySet.values().
+    """
+    if isinstance(item, dict):
+        return item[key.lstrip("-")]
+
+    for attribute in key.lstrip("-").split("__"):
+        item = getattr(item, attribute)
+    return item
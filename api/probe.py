@@ -0,0 +1,359 @@
+import mmap
+import struct
+from typing import Any
+
+AUDIO_FIELDS = ("sample_rate", "bit_depth", "channels", "bitrate")
+# The largest values the columns of the probed fields hold. Corrupt headers
+# or very long recordings (a 40000 second FLAC file) are rejected rather
+# than stored truncated or left to fail the write.
+FIELD_LIMITS = {
+    "length": 32767,
+    "sample_rate": 2147483647,
+    "bit_depth": 32767,
+    "channels": 32767,
+    "bitrate": 2147483647,
+}
+
+# Bitrates in kbps indexed by [MPEG-1][layer][bitrate index], from ISO 11172-3
+# and ISO 13818-3. Layers II and III share a table for MPEG-2 and MPEG-2.5.
+MP3_BITRATES = {
+    True: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    False: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+# Sample rates indexed by the version bits of an MPEG audio frame header.
+MP3_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000)}
+MP3_SAMPLE_RATES[3] = (44100, 48000, 32000)
+# Audio frames are expected this close to the end of the ID3v2 tag.
+MP3_SYNC_WINDOW = 64 * 1024
+# MP4 boxes that contain the boxes on the way to the sample description.
+MP4_CONTAINERS = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+MP4_LOSSLESS_CODECS = {b"alac", b"fLaC"}
+
+
+def probe_file(path: str) -> dict[str, Any] | None:
+    """Read the duration and stream properties of an audio file.
+
+    This utility parses only the container headers of a file, i.e. the
+    STREAMINFO block of a FLAC file, the Xing or VBRI header of an MP3
+    file, the mvhd and stsd boxes of an MP4 file, and the identification
+    header and last granule position of an Ogg file. The file is mapped
+    into memory, so only the pages holding those headers are read from
+    disk and no audio is ever decoded.
+
+    Arguments:
+        path (str) -- The path of the audio file.
+
+    Returns:
+        properties (dict) -- A dictionary with the following fields, or
+        None if the file cannot be read, is not a supported format, or
+        has a field out of the range of its column (see FIELD_LIMITS):
+            length (int) - The duration in seconds
+            sample_rate (int) - The sample rate in Hz
+            bit_depth (int) - The bits per sample, None for lossy codecs
+            channels (int) - The number of channels
+            bitrate (int) - The average bitrate in kbps
+    """
+    try:
+        with open(path, "rb") as file, mmap.mmap(
+            file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as data:
+            properties = probe(data)
+    except (OSError, ValueError, IndexError, struct.error):
+        # Empty files cannot be mapped and truncated ones fail to unpack.
+        return None
+
+    if properties is None or not properties["sample_rate"]:
+        return None
+    if any(
+        value is not None and not 0 <= value <= FIELD_LIMITS[field]
+        for field, value in properties.items()
+    ):
+        return None
+    return properties
+
+
+def probe(data: mmap.mmap) -> dict[str, Any] | None:
+    """Read the stream properties from the contents of an audio file."""
+    offset = skip_id3(data)
+    if peek(data, offset, 4) == b"fLaC":
+        return probe_flac(data, offset + 4)
+    elif data[:4] == b"OggS":
+        return probe_ogg(data)
+    elif data[4:8] == b"ftyp":
+        return probe_mp4(data)
+    else:
+        return probe_mp3(data, offset)
+
+
+def probe_flac(data: mmap.mmap, offset: int) -> dict[str, Any] | None:
+    """Read the STREAMINFO block of a FLAC stream.
+
+    Arguments:
+        data (mmap) -- The contents of the audio file.
+        offset (int) -- The offset of the first metadata block.
+    """
+    if data[offset] & 0x7F != 0:  # STREAMINFO must be the first block.
+        return None
+    properties = parse_streaminfo(data, offset + 4)
+
+    # The audio frames start after the last metadata block.
+    last = False
+    while not last:
+        last = bool(data[offset] & 0x80)
+        offset += 4 + int.from_bytes(peek(data, offset + 1, 3), "big")
+
+    return with_bitrate(properties, len(data) - offset)
+
+
+def probe_mp3(data: mmap.mmap, offset: int) -> dict[str, Any] | None:
+    """Read the first frame header of an MPEG audio stream.
+
+    The duration of a VBR stream is read from the frame count in its
+    Xing (or Info) or VBRI header. A stream without either is assumed
+    to be CBR, so its duration follows from its size and bitrate.
+
+    Arguments:
+        data (mmap) -- The contents of the audio file.
+        offset (int) -- The offset after the ID3v2 tag, if any.
+    """
+    offset = find_mp3_frame(data, offset)
+    if offset is None:
+        return None
+
+    header = int.from_bytes(peek(data, offset, 4), "big")
+    version, layer = header >> 19 & 3, 4 - (header >> 17 & 3)
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[mpeg1][layer][header >> 12 & 15]
+    sample_rate = MP3_SAMPLE_RATES[version][header >> 10 & 3]
+    channels = 1 if header >> 6 & 3 == 3 else 2
+    samples_per_frame = 384 if layer == 1 else 1152 if mpeg1 or layer == 2 else 576
+
+    end = len(data) - (128 if data[-128:-125] == b"TAG" else 0)
+    frames, size = read_vbr_header(data, offset, mpeg1, channels)
+    size = size or end - offset
+    if frames:
+        length = frames * samples_per_frame / sample_rate
+    else:
+        length = size * 8 / (bitrate * 1000)
+
+    return with_bitrate(
+        {
+            "length": length,
+            "sample_rate": sample_rate,
+            "bit_depth": None,
+            "channels": channels,
+        },
+        size,
+    )
+
+
+def probe_mp4(data: mmap.mmap) -> dict[str, Any] | None:
+    """Read the mvhd box and the audio sample description of an MP4 file."""
+    boxes = dict(iter_boxes(data, 0, len(data)))
+    if b"moov" not in boxes:
+        return None
+    start, end = boxes[b"moov"]
+    moov = dict(iter_boxes(data, start, end))
+    if b"mvhd" not in moov:
+        return None
+
+    offset = moov[b"mvhd"][0]
+    if data[offset] == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, offset + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, offset + 12)
+
+    entry = find_mp4_sample_entry(data, start, end)
+    if entry is None or not timescale:
+        return None
+    codec, offset = entry
+    channels, sample_size = struct.unpack_from(">HH", data, offset + 24)
+    sample_rate = struct.unpack_from(">I", data, offset + 32)[0] >> 16
+    if codec == b"alac" and peek(data, offset + 40, 4) == b"alac":
+        # The 16.16 field cannot hold rates above 65535 Hz, so read the
+        # ALAC decoder config box that follows it instead.
+        sample_size, channels = data[offset + 53], data[offset + 57]
+        sample_rate = struct.unpack_from(">I", data, offset + 68)[0]
+
+    mdat_start, mdat_end = boxes.get(b"mdat", (0, 0))
+    return with_bitrate(
+        {
+            "length": duration / timescale,
+            "sample_rate": sample_rate,
+            "bit_depth": sample_size if codec in MP4_LOSSLESS_CODECS else None,
+            "channels": channels,
+        },
+        mdat_end - mdat_start,
+    )
+
+
+def probe_ogg(data: mmap.mmap) -> dict[str, Any] | None:
+    """Read the identification header and last granule of an Ogg stream.
+
+    The granule position of the last page is the number of samples in
+    the stream (always counted at 48 kHz for Opus).
+    """
+    segments = data[26]
+    packet = 27 + segments
+    last_page = data.rfind(b"OggS")
+    granule = struct.unpack_from("<q", data, last_page + 6)[0]
+
+    if peek(data, packet, 7) == b"\x01vorbis":
+        channels = data[packet + 11]
+        sample_rate = struct.unpack_from("<I", data, packet + 12)[0]
+        properties = {"sample_rate": sample_rate, "bit_depth": None}
+        samples, rate = granule, sample_rate
+    elif peek(data, packet, 8) == b"OpusHead":
+        channels = data[packet + 9]
+        pre_skip = struct.unpack_from("<H", data, packet + 10)[0]
+        properties = {"sample_rate": 48000, "bit_depth": None}
+        samples, rate = granule - pre_skip, 48000
+    elif peek(data, packet, 5) == b"\x7fFLAC":
+        # The STREAMINFO block follows the mapping header and "fLaC".
+        properties = parse_streaminfo(data, packet + 17)
+        channels = properties["channels"]
+        samples, rate = granule, properties["sample_rate"]
+    else:
+        return None
+
+    return with_bitrate(
+        dict(
+            properties,
+            length=max(samples, 0) / rate if rate else 0,
+            channels=channels,
+        ),
+        len(data),
+    )
+
+
+def find_mp3_frame(data: mmap.mmap, offset: int) -> int | None:
+    """Return the offset of the first valid MPEG audio frame header."""
+    end = min(offset + MP3_SYNC_WINDOW, len(data) - 4)
+    while offset < end:
+        offset = data.find(b"\xff", offset, end)
+        if offset < 0:
+            return None
+        header = int.from_bytes(peek(data, offset, 4), "big")
+        if (
+            header >> 21 == 0x7FF
+            and header >> 19 & 3 != 1
+            and header >> 17 & 3 != 0
+            and 0 < header >> 12 & 15 < 15
+            and header >> 10 & 3 != 3
+        ):
+            return offset
+        offset += 1
+    return None
+
+
+def find_mp4_sample_entry(
+    data: mmap.mmap, start: int, end: int
+) -> tuple[bytes, int] | None:
+    """Return the codec and offset of the first audio sample entry.
+
+    The sample entry is found by descending from the moov box through
+    the trak boxes whose handler is "soun" down to the stsd box.
+    """
+    for box, (box_start, box_end) in iter_boxes(data, start, end):
+        if box == b"trak":
+            mdia = dict(iter_boxes(data, box_start, box_end)).get(b"mdia")
+            hdlr = mdia and dict(iter_boxes(data, *mdia)).get(b"hdlr")
+            if not hdlr or peek(data, hdlr[0] + 8, 4) != b"soun":
+                continue
+        if box == b"stsd":
+            # Skip the version, flags, and entry count of the box, and
+            # the size of the first entry.
+            return peek(data, box_start + 12, 4), box_start + 8
+        if box in MP4_CONTAINERS:
+            entry = find_mp4_sample_entry(data, box_start, box_end)
+            if entry:
+                return entry
+    return None
+
+
+def iter_boxes(data: mmap.mmap, start: int, end: int):
+    """Yield the type and payload range of the MP4 boxes in a range."""
+    offset = start
+    while offset + 8 <= end:
+        size, box = struct.unpack_from(">I4s", data, offset)
+        header = 8
+        if size == 1:
+            size, header = struct.unpack_from(">Q", data, offset + 8)[0], 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box, (offset + header, min(offset + size, end))
+        offset += size
+
+
+def parse_streaminfo(data: mmap.mmap, offset: int) -> dict[str, Any]:
+    """Parse the sample rate, channels, bit depth, and duration fields
+    of a FLAC STREAMINFO block."""
+    info = int.from_bytes(peek(data, offset + 10, 8), "big")
+    sample_rate = info >> 44
+    total_samples = info & 0xFFFFFFFFF
+
+    return {
+        "length": total_samples / sample_rate if sample_rate else 0,
+        "sample_rate": sample_rate,
+        "bit_depth": (info >> 36 & 0x1F) + 1,
+        "channels": (info >> 41 & 0x7) + 1,
+    }
+
+
+def read_vbr_header(
+    data: mmap.mmap, offset: int, mpeg1: bool, channels: int
+) -> tuple[int | None, int | None]:
+    """Return the frame count and stream size in the Xing or VBRI header
+    of the first frame of an MPEG audio stream, if it has one."""
+    side_info = (32 if channels == 2 else 17) if mpeg1 else (17 if channels == 2 else 9)
+    xing = offset + 4 + side_info
+    if peek(data, xing, 4) in (b"Xing", b"Info"):
+        flags = struct.unpack_from(">I", data, xing + 4)[0]
+        fields = iter(struct.unpack_from(">II", data, xing + 8))
+        frames = next(fields) if flags & 1 else None
+        size = next(fields) if flags & 2 else None
+        return frames, size
+
+    vbri = offset + 36
+    if peek(data, vbri, 4) == b"VBRI":
+        size, frames = struct.unpack_from(">II", data, vbri + 10)
+        return frames, size
+
+    return None, None
+
+
+def peek(data: mmap.mmap, offset: int, size: int) -> bytes:
+    """Return size bytes of the contents of a file starting at offset."""
+    end = offset + size
+    return data[offset:end]
+
+
+def skip_id3(data: mmap.mmap) -> int:
+    """Return the offset after the ID3v2 tag at the start of a file."""
+    if data[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in data[6:10]:  # The size is a 28-bit synchsafe integer.
+        size = size << 7 | byte & 0x7F
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def with_bitrate(properties: dict[str, Any], size: int) -> dict[str, Any]:
+    """Round the duration of a stream and add its average bitrate."""
+    length = properties["length"]
+    return dict(
+        properties,
+        length=round(length),
+        bitrate=round(size * 8 / length / 1000) if length else None,
+    )
@@ -0,0 +1,35 @@
+from typing import Any
+
+import orjson
+from ninja.renderers import BaseRenderer
+from ninja.responses import NinjaJSONEncoder
+
+# Dates and times are passed to NinjaJSONEncoder rather than encoded by
+# orjson, whose format differs from Django's (e.g. "+00:00" rather than
+# "Z" for UTC), so responses read the same whichever encoder produced them.
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(BaseRenderer):
+    """Render responses with orjson rather than the json module.
+
+    orjson encodes straight to bytes and is several times faster than
+    json.dumps for the large pages of the list endpoints. Values orjson
+    does not encode natively (Decimals, dates, schemas) are encoded the
+    same as by the default JSONRenderer.
+    """
+
+    media_type = "application/json"
+
+    def render(self, request, data: Any, *, response_status: int) -> bytes:
+        return dumps(data)
+
+
+def dumps(data: Any) -> bytes:
+    """Encode an object as compact JSON, the same as
+    Schema.model_dump_json()."""
+    return orjson.dumps(data, default=encode_default, option=OPTIONS)
+
+
+def encode_default(value: Any) -> Any:
+    return NinjaJSONEncoder().default(value)
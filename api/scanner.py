@@ -0,0 +1,397 @@
+import itertools
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Iterable, TextIO
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from pydantic import ValidationError
+
+from api import library, models, probe, schema, signals, utilities as util
+
+FILE_FIELDS = ["file_size", "file_mtime", "file_inode"]
+UPDATE_FIELDS = [
+    "title",
+    "disc",
+    "track_number",
+    "length",
+    *probe.AUDIO_FIELDS,
+    *FILE_FIELDS,
+    "file_hash",
+]
+
+# Reading fewer files than this is faster than starting a process pool.
+POOL_THRESHOLD = 64
+
+
+class LibraryScanner:
+    """Synchronize the songs in the database with a music library.
+
+    Each Song stores the size, modification time, inode, and content
+    hash of its audio file. A scan compares the size and modification
+    time of every file in the library with the stored state, so only
+    the files that were added, changed, moved, or deleted since the
+    last scan are read and written:
+    - New files are read and their songs are created.
+    - Changed files are read again and their songs are updated in
+    place.
+    - Files that were moved or renamed are matched to their songs by
+    inode or by content hash and only the path of the song is updated,
+    so the song keeps its id and play count.
+    - The songs of deleted files are deleted, along with albums that no
+    longer have any songs.
+
+    Arguments:
+        root (str) -- The path of the root directory of the library.
+        workers (int) -- The number of processes reading tags, defaults
+        to the CPU count.
+        batch_size (int) -- The number of songs written to the database
+        per transaction.
+        stderr (TextIO) -- The stream errors are reported to.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        workers: int | None = None,
+        batch_size: int = 500,
+        stderr: TextIO = sys.stderr,
+    ):
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.stderr = stderr
+        self.counts = Counter()
+
+    def scan(self, paths: Iterable[str] | None = None, full: bool = False) -> Counter:
+        """Synchronize the database with the files in the library.
+
+        Arguments:
+            paths (iterable) -- The paths of the files and directories
+            to synchronize, defaults to the whole library. Songs whose
+            files are outside of these paths are left alone.
+            full (bool) -- Whether to read every file again, even if it
+            has not changed since the last scan.
+
+        Returns:
+            counts (Counter) -- The number of songs that were added,
+            updated, moved, deleted, and unchanged, and the number of
+            files that could not be read.
+        """
+        self.counts = Counter()
+        paths = None if paths is None else list(paths)
+        files = self.find_files(paths)
+        songs = self.find_songs(paths)
+
+        added, changed = [], []
+        for path, stat in files.items():
+            song = songs.pop(path, None)
+            if song is None:
+                added.append(path)
+            elif full or is_modified(song, stat):
+                changed.append((song, path))
+            else:
+                self.counts["unchanged"] += 1
+
+        # Whatever is left in songs no longer has a file at its path.
+        added = self.move_by_inode(added, files, songs)
+        records = self.read([*added, *(path for _, path in changed)], files)
+        added = self.move_by_hash(added, records, songs)
+
+        self.write(
+            self.update_songs,
+            [
+                dict(records[path], id=song["id"])
+                for song, path in changed
+                if records[path]
+            ],
+            "updated",
+        )
+        self.write(
+            util.import_songs,
+            [records[path] for path in added if records[path]],
+            "added",
+        )
+        self.delete_songs(list(songs.values()))
+
+        return self.counts
+
+    def find_files(self, paths: list[str] | None) -> dict[str, os.stat_result]:
+        """Find the audio files to synchronize and stat them.
+
+        Returns:
+            files (dict) -- A dictionary mapping song paths to the
+            results of os.stat on their files.
+        """
+        files = {}
+        for target in [self.root] if paths is None else paths:
+            if os.path.isdir(target):
+                candidates = library.find_audio_files(target)
+            elif os.path.splitext(target)[1].lower() in library.AUDIO_EXTENSIONS:
+                candidates = [target]
+            else:
+                candidates = []
+
+            for path in candidates:
+                try:
+                    files[library.get_song_path(self.root, path)] = os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+        return files
+
+    def find_songs(self, paths: list[str] | None) -> dict[str, dict[str, Any]]:
+        """Retrieve the file state of the songs to synchronize.
+
+        Returns:
+            songs (dict) -- A dictionary mapping song paths to the id,
+            album, and file state of the songs.
+        """
+        songs = models.Song.objects.order_by()
+        if paths is not None:
+            query = Q(pk__in=[])
+            for path in paths:
+                song_path = library.get_song_path(self.root, path).rstrip("/")
+                query |= Q(path=song_path) | Q(path__startswith=f"{song_path}/")
+            songs = songs.filter(query)
+
+        return {
+            song["path"]: song
+            for song in songs.values(
+                "id", "path", "album_id", *FILE_FIELDS, "file_hash"
+            )
+        }
+
+    def read(
+        self, paths: list[str], files: dict[str, os.stat_result]
+    ) -> dict[str, dict[str, Any] | None]:
+        """Read the tags and content hashes of audio files.
+
+        Files are read in a process pool unless there are only a few of
+        them.
+
+        Arguments:
+            paths (list) -- The song paths of the files to read.
+            files (dict) -- The results of os.stat on the files.
+
+        Returns:
+            records (dict) -- A dictionary mapping song paths to the
+            validated metadata of their songs including the stream
+            properties and file state, or None if the file could not be
+            read.
+        """
+        absolute_paths = [os.path.join(self.root, path.lstrip("/")) for path in paths]
+        read_file = partial(library.read_file, self.root)
+
+        if len(paths) < POOL_THRESHOLD:
+            results = list(map(read_file, absolute_paths))
+        else:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                results = list(executor.map(read_file, absolute_paths, chunksize=64))
+
+        records = {}
+        for path, (record, file_hash) in zip(paths, results):
+            song_data = self.validate(path, record)
+            records[path] = song_data and dict(
+                song_data,
+                file_hash=file_hash,
+                **{field: record.get(field) for field in probe.AUDIO_FIELDS},
+                **library.get_file_state(files[path]),
+            )
+
+        return records
+
+    def validate(self, path: str, record: dict[str, Any] | None) -> dict | None:
+        """Validate the metadata read from an audio file.
+
+        Arguments:
+            path (str) -- The song path of the audio file.
+            record (dict) -- The metadata returned by library.read_tags.
+
+        Returns:
+            song_data (dict) -- The validated metadata with extraneous
+            whitespace removed, or None if the metadata is invalid.
+        """
+        try:
+            song = schema.SongImportIn.model_validate(record)
+        except ValidationError:
+            self.counts["unreadable"] += 1
+            self.stderr.write(f"Could not read tags from {path}.\n")
+            return None
+        else:
+            return util.strip_whitespace(song.dict())
+
+    def move_by_inode(
+        self,
+        added: list[str],
+        files: dict[str, os.stat_result],
+        songs: dict[str, dict[str, Any]],
+    ) -> list[str]:
+        """Match new files to the songs of missing files by inode.
+
+        A file that was moved or renamed within the same filesystem
+        keeps its inode, size, and modification time.
+
+        Returns:
+            added (list) -- The song paths of the new files that did not
+            match a missing file.
+        """
+        missing = {
+            (song["file_inode"], song["file_size"], song["file_mtime"]): song
+            for song in songs.values()
+            if song["file_inode"] is not None
+        }
+        moves, remaining = [], []
+        for path in added:
+            stat = files[path]
+            song = missing.pop((stat.st_ino, stat.st_size, stat.st_mtime_ns), None)
+            if song:
+                del songs[song["path"]]
+                moves.append(
+                    models.Song(
+                        id=song["id"], path=path, **library.get_file_state(stat)
+                    )
+                )
+            else:
+                remaining.append(path)
+
+        self.move_songs(moves)
+        return remaining
+
+    def move_by_hash(
+        self,
+        added: list[str],
+        records: dict[str, dict[str, Any] | None],
+        songs: dict[str, dict[str, Any]],
+    ) -> list[str]:
+        """Match new files to the songs of missing files by content hash.
+
+        This catches files that were copied to their new location
+        rather than moved, e.g. across filesystems.
+
+        Returns:
+            added (list) -- The song paths of the new files that did not
+            match a missing file.
+        """
+        missing = {
+            song["file_hash"]: song for song in songs.values() if song["file_hash"]
+        }
+        moves, remaining = [], []
+        for path in added:
+            song = records[path] and missing.pop(records[path]["file_hash"], None)
+            if song:
+                del songs[song["path"]]
+                moves.append(
+                    models.Song(
+                        id=song["id"],
+                        path=path,
+                        **{field: records[path][field] for field in FILE_FIELDS},
+                    )
+                )
+            else:
+                remaining.append(path)
+
+        self.move_songs(moves)
+        return remaining
+
+    def move_songs(self, songs: list[models.Song]):
+        """Update the path and file state of songs whose files moved."""
+        models.Song.objects.bulk_update(
+            songs, ["path", *FILE_FIELDS], batch_size=self.batch_size
+        )
+        signals.catalog_changed.send(sender=models.Song)
+        self.counts["moved"] += len(songs)
+
+    def update_songs(self, song_data: list[dict[str, Any]]) -> list[models.Song]:
+        """Update songs in place with the metadata of their changed files.
+
+        The credits of the songs are replaced and albums left without
+        any songs are deleted.
+
+        Arguments:
+            song_data (list) -- A list of dictionaries containing the
+            metadata read from the files along with the id of the song.
+
+        Returns:
+            songs (list) -- A list of the updated Song objects.
+        """
+        ids = [data["id"] for data in song_data]
+        previous_albums = set(
+            models.Song.objects.filter(id__in=ids).values_list("album_id", flat=True)
+        )
+        albums = util.get_albums([data["album"] for data in song_data])
+        songs = [
+            models.Song(
+                id=data["id"],
+                album=album,
+                release_date=album.release_date,
+                **{field: data[field] for field in UPDATE_FIELDS},
+            )
+            for data, album in zip(song_data, albums)
+        ]
+
+        models.Song.objects.bulk_update(
+            songs, [*UPDATE_FIELDS, "album", "release_date"]
+        )
+        signals.catalog_changed.send(sender=models.Song)
+        models.SongArtist.objects.filter(song_id__in=ids).delete()
+        models.SongProducer.objects.filter(song_id__in=ids).delete()
+        util.bulk_create_credits(songs, song_data)
+        delete_empty_albums(previous_albums)
+
+        return songs
+
+    def delete_songs(self, songs: list[dict[str, Any]]):
+        """Delete the songs of files that no longer exist."""
+        for batch in itertools.batched(songs, self.batch_size):
+            with transaction.atomic():
+                models.Song.objects.filter(
+                    id__in=[song["id"] for song in batch]
+                ).delete()
+                delete_empty_albums({song["album_id"] for song in batch})
+            self.counts["deleted"] += len(batch)
+
+    def write(self, function: Callable, song_data: list[dict[str, Any]], count: str):
+        """Write songs to the database in batches.
+
+        Each batch is written in its own transaction. If a batch cannot
+        be written as a whole (e.g. because of a duplicate track number
+        or a value out of range for its column), each of its songs is
+        retried on its own so a single bad file does not hold back the
+        rest of the batch. Songs that still cannot be written are
+        reported and counted as failed.
+
+        Arguments:
+            function (callable) -- The function writing a list of songs
+            and returning the written Song objects.
+            song_data (list) -- A list of dictionaries containing the
+            metadata of the songs.
+            count (str) -- The name of the count of written songs.
+        """
+        for batch in itertools.batched(song_data, self.batch_size):
+            try:
+                with transaction.atomic():
+                    self.counts[count] += len(function(list(batch)))
+            except DatabaseError:
+                for data in batch:
+                    try:
+                        with transaction.atomic():
+                            self.counts[count] += len(function([data]))
+                    except DatabaseError as error:
+                        self.counts["failed"] += 1
+                        self.stderr.write(
+                            f"{data["path"]}: {error.__cause__ or error}\n"
+                        )
+
+
+def delete_empty_albums(album_ids: Iterable[int]):
+    """Delete the albums out of album_ids that have no songs left."""
+    models.Album.objects.filter(id__in=list(album_ids), song__isnull=True).delete()
+
+
+def is_modified(song: dict[str, Any], stat: os.stat_result) -> bool:
+    """Return whether a file changed since the state stored on its song."""
+    return (song["file_size"], song["file_mtime"]) != (stat.st_size, stat.st_mtime_ns)
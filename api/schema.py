@@ -1,8 +1,9 @@
 from datetime import date
-from typing import TypedDict
+from typing import Any, NotRequired, TypedDict
 
 from django.db.models import Sum
-from ninja import Schema
+from ninja import Field, Schema
+from pydantic import create_model
 
 
 class Error(Schema):
@@ -12,11 +13,15 @@ class Error(Schema):
 class Preview(TypedDict):
     count: int
     url: str
+    # Only present when the items are embedded with ?include=, along with
+    # the cursor of the next page of url if there are more items.
+    items: NotRequired[list[dict[str, Any]]]
+    next: NotRequired[str | None]
 
 
 class ArtistIn(Schema):
-    name: str
-    hometown: str = ""
+    name: str = Field(max_length=100)
+    hometown: str = Field("", max_length=100)
 
 
 class ArtistOutBasic(Schema):
@@ -34,6 +39,8 @@ class ArtistOutBasic(Schema):
 
 
 class ArtistOut(Schema):
+    # Artists retrieved with Artist.objects.with_previews() carry their
+    # preview counts, so they are serialized without further queries.
     id: str
     name: str
     hometown: str | None
@@ -54,28 +61,44 @@ class ArtistOut(Schema):
     @staticmethod
     def resolve_albums(obj, context):
         return {
-            "count": obj.album_artists.exclude(album_type="single").count(),
+            "count": (
+                obj.album_count
+                if hasattr(obj, "album_count")
+                else obj.album_artists.exclude(album_type="single").count()
+            ),
             "url": context["request"].build_absolute_uri(obj.get_albums_url()),
         }
 
     @staticmethod
     def resolve_singles(obj, context):
         return {
-            "count": obj.album_artists.filter(album_type="single").count(),
+            "count": (
+                obj.single_count
+                if hasattr(obj, "single_count")
+                else obj.album_artists.filter(album_type="single").count()
+            ),
             "url": context["request"].build_absolute_uri(obj.get_singles_url()),
         }
 
     @staticmethod
     def resolve_songs(obj, context):
         return {
-            "count": obj.song_artists.count(),
+            "count": (
+                obj.song_count
+                if hasattr(obj, "song_count")
+                else obj.song_artists.count()
+            ),
             "url": context["request"].build_absolute_uri(obj.get_songs_url()),
         }
 
     @staticmethod
     def resolve_songs_produced(obj, context):
         return {
-            "count": obj.song_producers.count(),
+            "count": (
+                obj.songs_produced_count
+                if hasattr(obj, "songs_produced_count")
+                else obj.song_producers.count()
+            ),
             "url": context["request"].build_absolute_uri(obj.get_songs_produced_url()),
         }
 
@@ -85,11 +108,11 @@ class ArtistOut(Schema):
 
 
 class AlbumIn(Schema):
-    title: str
+    title: str = Field(max_length=600)
     artists: list[ArtistIn]
     release_date: date
-    label: str = ""
-    album_type: str = "album"
+    label: str = Field("", max_length=100)
+    album_type: str = Field("album", max_length=10)
 
 
 class AlbumOutBasic(Schema):
@@ -129,32 +152,56 @@ class AlbumOut(Schema):
 
     @staticmethod
     def resolve_tracklist(obj, context):
+        # Albums retrieved with Album.objects.with_tracklist() carry the
+        # count and length of their songs, so no queries are needed.
+        if hasattr(obj, "song_count"):
+            count = obj.song_count
+        else:
+            count = obj.song_set.count()
         return {
-            "count": obj.song_set.count(),
+            "count": count,
             "url": context["request"].build_absolute_uri(obj.get_songs_url()),
         }
 
     @staticmethod
     def resolve_length(obj):
-        if obj.song_set.all():
-            return obj.song_set.aggregate(Sum("length"))["length__sum"]
+        if hasattr(obj, "song_length"):
+            return obj.song_length or 0
         else:
-            return 0
+            return obj.song_set.aggregate(Sum("length"))["length__sum"] or 0
 
     @staticmethod
     def resolve_url(obj, context):
         return context["request"].build_absolute_uri(obj.get_url())
 
 
+# The bounds match the columns of the models, so out-of-range values are
+# rejected when validated rather than by the database.
 class SongIn(Schema):
-    title: str
+    title: str = Field(max_length=600)
     artists: list[ArtistIn]
     group_members: list[ArtistIn] = []
     producers: list[ArtistIn] = []
-    disc: int = 1
-    track_number: int
-    length: int
-    path: str
+    disc: int = Field(1, le=32767)
+    track_number: int = Field(le=32767)
+    length: int = Field(le=32767)
+    path: str = Field(max_length=1000)
+
+
+class AlbumBulkIn(AlbumIn):
+    songs: list[SongIn] = []
+
+
+class SongImportIn(SongIn):
+    album: AlbumIn
+
+
+class SongPathsIn(Schema):
+    paths: list[str] = Field(max_length=10000)
+
+
+class SongIdsOut(Schema):
+    ids: list[str | None]
 
 
 class SongOut(Schema):
@@ -169,29 +216,114 @@ class SongOut(Schema):
     length: int
     path: str
     play_count: int
+    sample_rate: int | None
+    bit_depth: int | None
+    channels: int | None
+    bitrate: int | None
     url: str
 
     @staticmethod
     def resolve_id(obj):
         return str(obj.id)
 
+    # The credits are filtered in memory, so songs retrieved with the
+    # prefetches of models.song_prefetches are serialized without further
+    # queries.
     @staticmethod
     def resolve_artists(obj):
-        features = obj.songartist_set.filter(group=False)
-        return [feature.artist for feature in features]
+        credits = obj.songartist_set.all()
+        return [credit.artist for credit in credits if not credit.group]
 
     @staticmethod
     def resolve_group_members(obj):
-        affiliations = obj.songartist_set.filter(group=True)
-        if affiliations:
-            return [affiliation.artist for affiliation in affiliations]
-        else:
-            return None
+        credits = obj.songartist_set.all()
+        affiliations = [credit.artist for credit in credits if credit.group]
+        return affiliations if affiliations else None
 
     @staticmethod
     def resolve_producers(obj):
-        return obj.producers if obj.producers.all() else None
+        producers = list(obj.producers.all())
+        return producers if producers else None
 
     @staticmethod
     def resolve_url(obj, context):
         return context["request"].build_absolute_uri(obj.get_url())
+
+
+def partial(schema: type[Schema]) -> type[Schema]:
+    """Return a copy of an output schema in which every field is
+    optional, for the items of pages whose fields are selected with the
+    fields query parameter."""
+    return create_model(
+        f"{schema.__name__}Partial",
+        __base__=Schema,
+        **{
+            name: (field.annotation, None)
+            for name, field in schema.model_fields.items()
+        },
+    )
+
+
+class PageIn(Schema):
+    cursor: str | None = None
+    limit: int = Field(100, ge=1, le=1000)
+
+
+# The items of the list endpoints hold only the fields selected with
+# ?fields=, and are null in place of the ids no object has with ?ids=.
+class ArtistPage(Schema):
+    items: list[partial(ArtistOut) | None]
+    next: str | None
+
+
+class AlbumPage(Schema):
+    items: list[partial(AlbumOut) | None]
+    next: str | None
+
+
+class AlbumBasicPage(Schema):
+    items: list[partial(AlbumOutBasic)]
+    next: str | None
+
+
+class SongPage(Schema):
+    items: list[partial(SongOut) | None]
+    next: str | None
+
+
+class DiscOut(Schema):
+    disc: int
+    songs: list[SongOut]
+
+
+class TracklistOut(Schema):
+    album: AlbumOutBasic
+    discs: list[DiscOut]
+
+
+class SearchIn(Schema):
+    q: str = Field(min_length=1, max_length=200)
+    limit: int = Field(10, ge=1, le=50)
+
+
+class SearchOut(Schema):
+    artists: list[ArtistOut]
+    albums: list[AlbumOut]
+    songs: list[SongOut]
+
+
+class SuggestionsIn(Schema):
+    q: str = Field(max_length=200)
+    limit: int = Field(5, ge=1, le=20)
+
+
+class SuggestionOut(Schema):
+    id: str
+    title: str
+    url: str
+
+
+class SuggestionsOut(Schema):
+    artists: list[ArtistOutBasic]
+    albums: list[SuggestionOut]
+    songs: list[SuggestionOut]
@@ -0,0 +1,85 @@
+from typing import Any
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Ln
+from ninja import Query, Router
+from ninja.decorators import decorate_view
+
+from api import cache, models, schema, serializers
+
+router = Router()
+
+# The total play count of the songs of each kind of resource, which scales
+# how well the resources matching a query rank.
+POPULARITY = {
+    "artist": Subquery(
+        models.SongArtist.objects.filter(artist=OuterRef("pk"))
+        .order_by()
+        .values("artist")
+        .annotate(total=Sum("song__play_count"))
+        .values("total"),
+        output_field=IntegerField(),
+    ),
+    "album": Sum("song__play_count"),
+    "song": F("play_count"),
+}
+
+
+@router.get("", response={200: schema.SearchOut})
+@decorate_view(cache.cache_response(*cache.SONG_MODELS))
+def search(request, params: Query[schema.SearchIn]):
+    """To find the artists, albums, and songs matching a query, include
+    the following query parameters:
+    - **q** (*string*): The words to search for, with quotes around
+    phrases, "or" between alternatives, and a leading "-" before words
+    to exclude (e.g. "madvillain -remix") ***required***
+    - **limit** (*integer*): The number of results of each type,
+    defaults to 10 ***optional***
+
+    Artists are matched by name, albums by title and label, and songs by
+    title, regardless of case and of accents. The response includes the
+    matching **artists**, **albums**, and **songs**, each from the best
+    to the worst match, where resources whose songs are played more rank
+    higher.
+    """
+    query = SearchQuery(
+        models.unaccent(Value(params.q)), config="simple", search_type="websearch"
+    )
+    results = {
+        f"{kind}s": find(request, kind, query, params.limit)
+        for kind in ("artist", "album", "song")
+    }
+    return router.api.create_response(request, results, status=200)
+
+
+def find(request, kind: str, query: SearchQuery, limit: int) -> list[dict[str, Any]]:
+    """Retrieve and serialize the best matches of a query.
+
+    The matches are found with the GIN index of the search column of the
+    model and ranked by ts_rank scaled by 1 + ln(1 + their play count),
+    so popularity breaks near ties in relevance without letting a
+    popular but poor match outrank an exact one.
+
+    Arguments:
+        request (HttpRequest) -- The request the matches are serialized
+        for.
+        kind (str) -- The kind of resource to search ("artist",
+        "album", or "song").
+        query (SearchQuery) -- The parsed query.
+        limit (int) -- The maximum number of matches.
+
+    Returns:
+        matches (list) -- The serialized matches, best first.
+    """
+    model, fields, serialize, annotate = serializers.RESOURCES[kind]
+    popularity = Coalesce(POPULARITY[kind], 0)
+    rows = (
+        annotate(model.objects.filter(search=query))
+        .prefetch_related(None)
+        .annotate(rank=SearchRank(F("search"), query) * (Ln(popularity + 1) + 1))
+        .order_by("-rank", "id")
+        .values(*serializers.get_columns(fields, "id"))[:limit]
+    )
+
+    return serialize(request, list(rows), fields)
@@ -0,0 +1,636 @@
+import itertools
+from collections import defaultdict
+from operator import itemgetter
+from typing import Any, Callable, Collection, Iterable
+
+from django.db.models import F, Q, QuerySet, Window
+from django.db.models.functions import RowNumber
+from django.urls import reverse
+
+from api import models, probe, schema
+from api.pagination import encode_cursor, get_value, paginate_keyset
+
+# The fields of each kind of resource, in the order they are serialized, and
+# the columns and annotations of the rows they are serialized from.
+ARTIST_FIELDS = {
+    "id": ("id",),
+    "name": ("name",),
+    "hometown": ("hometown",),
+    "albums": ("album_count",),
+    "singles": ("single_count",),
+    "songs": ("song_count",),
+    "songs_produced": ("songs_produced_count",),
+    "url": ("id",),
+}
+ALBUM_FIELDS = {
+    "id": ("id",),
+    "title": ("title",),
+    "artists": ("id",),
+    "release_date": ("release_date",),
+    "label": ("label",),
+    "tracklist": ("id", "song_count"),
+    "length": ("song_length",),
+    "album_type": ("album_type",),
+    "url": ("id",),
+}
+ALBUM_BASIC_FIELDS = {
+    field: ALBUM_FIELDS[field]
+    for field in ("id", "title", "artists", "release_date", "url")
+}
+SONG_FIELDS = {
+    "id": ("id",),
+    "title": ("title",),
+    "artists": ("id",),
+    "group_members": ("id",),
+    "producers": ("id",),
+    "album": ("album_id", "album__title", "album__release_date"),
+    "disc": ("disc",),
+    "track_number": ("track_number",),
+    "length": ("length",),
+    "path": ("path",),
+    "play_count": ("play_count",),
+    **{field: (field,) for field in probe.AUDIO_FIELDS},
+    "url": ("id",),
+}
+
+# The fields of each kind of resource whose related resources can be
+# embedded with ?include=, and the kind of the related resources. References
+# to artists and albums are replaced with their full representations, and
+# previews get the items they count.
+INCLUDES = {
+    "artist": {
+        "albums": "album",
+        "singles": "album",
+        "songs": "song",
+        "songs_produced": "song",
+    },
+    "album": {"artists": "artist", "tracklist": "song"},
+    "song": {
+        "artists": "artist",
+        "group_members": "artist",
+        "producers": "artist",
+        "album": "album",
+    },
+}
+
+# An id no object will have, which is reversed into a URL once per request
+# and replaced with the ids of the serialized objects.
+URL_PLACEHOLDER = 9_999_999_999_999
+
+
+class URLTemplates:
+    """Build the API resource URLs of many objects without reversing and
+    absolutizing each of them.
+
+    Each URL is reversed and passed to request.build_absolute_uri once,
+    with a placeholder id, so the URL of an object is the same string
+    get_url() and friends would return.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.templates = {}
+
+    def __call__(self, name: str, id: int) -> str:
+        if name not in self.templates:
+            url = self.request.build_absolute_uri(
+                reverse(f"api:{name}", args=[URL_PLACEHOLDER])
+            )
+            self.templates[name] = url.split(str(URL_PLACEHOLDER))
+
+        prefix, suffix = self.templates[name]
+        return f"{prefix}{id}{suffix}"
+
+
+# The most objects that can be retrieved by id in one request.
+MAX_IDS = 500
+
+# The most levels of relations that can be embedded with ?include= (e.g.
+# "artists.albums"), and the most items embedded in each preview, which is
+# the default page size of the endpoints the previews link to.
+MAX_INCLUDE_DEPTH = 2
+PREVIEW_LIMIT = 100
+
+
+class InvalidFields(Exception):
+    pass
+
+
+class InvalidIds(Exception):
+    pass
+
+
+def select_fields(
+    selection: str | None,
+    fields: dict[str, tuple[str, ...]],
+    includes: dict[str, dict] | None = None,
+) -> dict[str, tuple[str, ...]]:
+    """Return the fields named in the fields query parameter.
+
+    Arguments:
+        selection (str) -- A comma-separated list of field names (e.g.
+        "id,name,url"), or None for every field.
+        fields (dict) -- The fields of the kind of resource (e.g.
+        ARTIST_FIELDS).
+        includes (dict) -- The relations to embed, as returned by
+        select_includes, whose fields are selected along with the id
+        they are retrieved by whether they are named or not [optional].
+
+    Returns:
+        fields (dict) -- The selected fields, in serialization order.
+
+    Raises:
+        InvalidFields -- If a name is not one of the fields.
+    """
+    if not selection:
+        return fields
+
+    names = {name.strip() for name in selection.split(",")}
+    if unknown := sorted(names - fields.keys()):
+        raise InvalidFields(
+            f"Unknown fields: {", ".join(unknown)}. "
+            f"Fields must be among: {", ".join(fields)}."
+        )
+
+    if includes:
+        names.update(["id", *includes])
+    return {field: columns for field, columns in fields.items() if field in names}
+
+
+def select_includes(selection: str | None, kind: str) -> dict[str, dict]:
+    """Return the relations named in the include query parameter.
+
+    Arguments:
+        selection (str) -- A comma-separated list of the relations to
+        embed, with the relations of embedded resources separated by
+        dots (e.g. "tracklist,artists.albums"), or None.
+        kind (str) -- The kind of resource (e.g. "album").
+
+    Returns:
+        includes (dict) -- The tree of the relations to embed (e.g.
+        {"tracklist": {}, "artists": {"albums": {}}}).
+
+    Raises:
+        InvalidFields -- If a relation cannot be embedded, or is nested
+        more than MAX_INCLUDE_DEPTH levels deep.
+    """
+    includes = {}
+    for path in filter(None, (path.strip() for path in (selection or "").split(","))):
+        names = path.split(".")
+        if len(names) > MAX_INCLUDE_DEPTH:
+            raise InvalidFields(
+                f"Include {path} is too deep. Relations can be embedded at most "
+                f"{MAX_INCLUDE_DEPTH} levels deep."
+            )
+
+        node, node_kind = includes, kind
+        for name in names:
+            if name not in INCLUDES[node_kind]:
+                raise InvalidFields(
+                    f"Unknown include: {path}. Relations of {node_kind}s "
+                    f"must be among: {", ".join(INCLUDES[node_kind])}."
+                )
+            node, node_kind = node.setdefault(name, {}), INCLUDES[node_kind][name]
+
+    return includes
+
+
+def select_ids(selection: str) -> list[int]:
+    """Return the ids named in the ids query parameter, in order.
+
+    Raises:
+        InvalidIds -- If the ids are not a comma-separated list of 1 to
+        MAX_IDS integers.
+    """
+    try:
+        ids = [int(id) for id in selection.split(",")]
+    except ValueError:
+        raise InvalidIds("Ids must be a comma-separated list of integers.")
+    if len(ids) > MAX_IDS:
+        raise InvalidIds(f"At most {MAX_IDS} ids can be retrieved at once.")
+
+    return ids
+
+
+def get_columns(fields: dict[str, tuple[str, ...]], *extra: str) -> list[str]:
+    """Return the columns the rows of fields are retrieved with."""
+    return list(dict.fromkeys([*extra, *itertools.chain(*fields.values())]))
+
+
+def paginate(
+    request,
+    queryset: QuerySet,
+    page: schema.PageIn,
+    fields: dict[str, tuple[str, ...]],
+    serialize: Callable,
+) -> dict[str, Any]:
+    """Retrieve a page of a queryset as rows and serialize it.
+
+    This utility is the fast path of the list endpoints. The page is
+    retrieved with paginate_keyset, ordered by the default ordering of
+    the model, but as dictionaries holding only the columns of the given
+    fields rather than as model instances, and is serialized by building
+    the dictionaries of the response directly instead of validating each
+    object against a schema.
+
+    Arguments:
+        request (HttpRequest) -- The request the page is serialized for.
+        queryset (QuerySet) -- The objects to paginate, with the
+        annotations the fields refer to.
+        page (PageIn) -- The cursor and limit query
+        parameters.
+        fields (dict) -- The fields to serialize, as returned by
+        select_fields.
+        serialize (function) -- The serializer of the rows (e.g.
+        serialize_artists).
+
+    Returns:
+        page (dict) -- A dictionary with the items and the cursor of the
+        next page, as in the page schemas (e.g. ArtistPage).
+    """
+    ordering = tuple(queryset.model._meta.ordering)
+    columns = get_columns(fields, *(key.lstrip("-") for key in ordering), "id")
+    rows, cursor = paginate_keyset(
+        queryset.prefetch_related(None).values(*columns),
+        ordering,
+        page.cursor,
+        page.limit,
+    )
+
+    return {"items": serialize(request, rows, fields), "next": cursor}
+
+
+def retrieve(
+    request,
+    queryset: QuerySet,
+    fields: dict[str, tuple[str, ...]],
+    serialize: Callable,
+) -> dict[str, Any]:
+    """Retrieve the one object of a queryset as a row and serialize it.
+
+    Raises:
+        DoesNotExist -- If the queryset is empty.
+    """
+    row = queryset.prefetch_related(None).values(*get_columns(fields, "id")).get()
+    return serialize(request, [row], fields)[0]
+
+
+def retrieve_many(
+    request,
+    queryset: QuerySet,
+    ids: list[int],
+    fields: dict[str, tuple[str, ...]],
+    serialize: Callable,
+) -> list[dict[str, Any] | None]:
+    """Retrieve the objects of a queryset with the given ids as rows and
+    serialize them.
+
+    Returns:
+        objects (list) -- The serialized objects in the order of ids,
+        with None in place of the ids no object has.
+    """
+    rows = list(
+        queryset.prefetch_related(None)
+        .filter(pk__in=ids)
+        .values(*get_columns(fields, "id"))
+    )
+    objects = dict(zip((row["id"] for row in rows), serialize(request, rows, fields)))
+
+    return [objects.get(id) for id in ids]
+
+
+def serialize(
+    rows: list[dict[str, Any]],
+    fields: Iterable[str],
+    values: dict[str, Callable[[dict[str, Any]], Any]],
+) -> list[dict[str, Any]]:
+    """Serialize rows with the functions returning the value of each
+    selected field."""
+    values = [(field, values[field]) for field in fields]
+    return [{field: value(row) for field, value in values} for row in rows]
+
+
+def serialize_albums(
+    request,
+    rows: list[dict[str, Any]],
+    fields: Collection[str] = ALBUM_FIELDS,
+) -> list[dict[str, Any]]:
+    """Serialize rows of the columns of ALBUM_FIELDS the same as
+    schema.AlbumOut, or the fields of ALBUM_BASIC_FIELDS the same as
+    schema.AlbumOutBasic."""
+    url = URLTemplates(request)
+    artists = {}
+    if "artists" in fields:
+        artists = get_album_artists([row["id"] for row in rows], url)
+
+    return serialize(
+        rows,
+        fields,
+        {
+            "id": lambda row: str(row["id"]),
+            "title": lambda row: row["title"],
+            "artists": lambda row: artists[row["id"]],
+            "release_date": lambda row: row["release_date"],
+            "label": lambda row: row["label"] if row["label"] else None,
+            "tracklist": lambda row: {
+                "count": row["song_count"],
+                "url": url("retrieve_album_songs", row["id"]),
+            },
+            "length": lambda row: row["song_length"] or 0,
+            "album_type": lambda row: row["album_type"],
+            "url": lambda row: url("retrieve_album", row["id"]),
+        },
+    )
+
+
+def serialize_artists(
+    request,
+    rows: list[dict[str, Any]],
+    fields: Collection[str] = ARTIST_FIELDS,
+) -> list[dict[str, Any]]:
+    """Serialize rows of the columns of ARTIST_FIELDS the same as
+    schema.ArtistOut."""
+    url = URLTemplates(request)
+
+    return serialize(
+        rows,
+        fields,
+        {
+            "id": lambda row: str(row["id"]),
+            "name": lambda row: row["name"],
+            "hometown": lambda row: row["hometown"] if row["hometown"] else None,
+            "albums": lambda row: {
+                "count": row["album_count"],
+                "url": url("retrieve_artist_albums", row["id"]),
+            },
+            "singles": lambda row: {
+                "count": row["single_count"],
+                "url": url("retrieve_artist_singles", row["id"]),
+            },
+            "songs": lambda row: {
+                "count": row["song_count"],
+                "url": url("retrieve_artist_songs", row["id"]),
+            },
+            "songs_produced": lambda row: {
+                "count": row["songs_produced_count"],
+                "url": url("retrieve_artist_songs_produced", row["id"]),
+            },
+            "url": lambda row: url("retrieve_artist", row["id"]),
+        },
+    )
+
+
+def serialize_songs(
+    request,
+    rows: list[dict[str, Any]],
+    fields: Collection[str] = SONG_FIELDS,
+    album: dict[str, Any] | None = None,
+) -> list[dict[str, Any]]:
+    """Serialize rows of the columns of SONG_FIELDS the same as
+    schema.SongOut.
+
+    The credits of all of the songs are retrieved with one query each
+    for song artists, producers, and album artists, unless none of the
+    fields they are serialized in are selected.
+
+    Arguments:
+        request (HttpRequest) -- The request the songs are serialized
+        for.
+        rows (list) -- The rows of the songs.
+        fields (list) -- The fields to serialize [optional].
+        album (dict) -- The serialized album of the songs if they all
+        belong to the same album, in which case its artists are not
+        retrieved again [optional].
+
+    Returns:
+        songs (list) -- The dictionaries of the songs.
+    """
+    url = URLTemplates(request)
+    song_ids = [row["id"] for row in rows]
+
+    artists, group_members = defaultdict(list), defaultdict(list)
+    if "artists" in fields or "group_members" in fields:
+        for song_id, group, artist_id, name in (
+            models.SongArtist.objects.filter(song_id__in=song_ids)
+            .order_by("id")
+            .values_list("song_id", "group", "artist_id", "artist__name")
+        ):
+            credits = group_members if group else artists
+            credits[song_id].append(serialize_artist(url, artist_id, name))
+
+    producers = defaultdict(list)
+    if "producers" in fields:
+        for song_id, artist_id, name in (
+            models.SongProducer.objects.filter(song_id__in=song_ids)
+            .order_by("producer__name")
+            .values_list("song_id", "producer_id", "producer__name")
+        ):
+            producers[song_id].append(serialize_artist(url, artist_id, name))
+
+    if album is None and "album" in fields:
+        album_artists = get_album_artists({row["album_id"] for row in rows}, url)
+
+    return serialize(
+        rows,
+        fields,
+        {
+            "id": lambda row: str(row["id"]),
+            "title": lambda row: row["title"],
+            "artists": lambda row: artists[row["id"]],
+            "group_members": lambda row: group_members.get(row["id"]),
+            "producers": lambda row: producers.get(row["id"]),
+            "album": lambda row: album
+            or {
+                "id": str(row["album_id"]),
+                "title": row["album__title"],
+                "artists": album_artists[row["album_id"]],
+                "release_date": row["album__release_date"],
+                "url": url("retrieve_album", row["album_id"]),
+            },
+            **{
+                field: itemgetter(field)
+                for field in (
+                    "disc",
+                    "track_number",
+                    "length",
+                    "path",
+                    "play_count",
+                    *probe.AUDIO_FIELDS,
+                )
+            },
+            "url": lambda row: url("retrieve_song", row["id"]),
+        },
+    )
+
+
+def embed(request, kind: str, objects: list[dict[str, Any]], includes: dict[str, dict]):
+    """Embed related resources in serialized objects.
+
+    The related resources of all of the objects are retrieved with one
+    query per relation (plus the queries of their own serializer), and
+    are serialized with all of their fields before their own relations
+    are embedded in turn.
+
+    Arguments:
+        request (HttpRequest) -- The request the objects are serialized
+        for.
+        kind (str) -- The kind of the objects (e.g. "album").
+        objects (list) -- The serialized objects, which are updated in
+        place. None (e.g. in place of a missing id) is skipped.
+        includes (dict) -- The relations to embed, as returned by
+        select_includes.
+    """
+    objects = [obj for obj in objects if obj is not None]
+    for field, nested in includes.items():
+        related_kind = INCLUDES[kind][field]
+        if (kind, field) in PREVIEWS:
+            embed_items(
+                request, objects, field, related_kind, nested, *PREVIEWS[(kind, field)]
+            )
+        else:
+            embed_references(request, objects, field, related_kind, nested)
+
+
+def embed_items(
+    request,
+    objects: list[dict[str, Any]],
+    field: str,
+    kind: str,
+    includes: dict[str, dict],
+    lookup: str,
+    condition: Q,
+    ordering: tuple[str, ...] | None,
+):
+    """Add the items of the previews of objects, e.g. the songs of the
+    tracklist of albums, in the same order as the endpoints the previews
+    link to.
+
+    Up to PREVIEW_LIMIT items are embedded in each preview, which are
+    numbered per object with a window function so that the items of
+    every object are still retrieved with one query. The preview of an
+    object with more items than that gets the cursor of the next page
+    of the endpoint it links to as its next, like a page of that
+    endpoint would, or None if there is no such page.
+    """
+    model, fields, serialize, annotate = RESOURCES[kind]
+    keys = [*(ordering or model._meta.ordering), "id"]
+    rows = list(
+        annotate(
+            model.objects.annotate(parent=F(lookup)).filter(
+                condition, parent__in=[int(obj["id"]) for obj in objects]
+            )
+        )
+        .prefetch_related(None)
+        .annotate(position=Window(RowNumber(), partition_by=F("parent"), order_by=keys))
+        .filter(position__lte=PREVIEW_LIMIT + 1)
+        .order_by("parent", *keys)
+        .values(
+            *get_columns(fields, *(key.lstrip("-") for key in keys)),
+            "parent",
+            "position",
+        )
+    )
+
+    # Only the previews in default order link to endpoints paged by it;
+    # the tracklist of an album is retrieved in full.
+    kept, cursors = [], {}
+    for row in rows:
+        if row["position"] <= PREVIEW_LIMIT:
+            kept.append(row)
+        elif ordering is None:
+            cursors[str(row["parent"])] = encode_cursor(
+                [get_value(kept[-1], key) for key in keys]
+            )
+
+    items = serialize(request, kept, fields)
+    embed(request, kind, items, includes)
+
+    grouped = defaultdict(list)
+    for row, item in zip(kept, items):
+        grouped[str(row["parent"])].append(item)
+    for obj in objects:
+        obj[field]["items"] = grouped[obj["id"]]
+        obj[field]["next"] = cursors.get(obj["id"])
+
+
+def embed_references(
+    request,
+    objects: list[dict[str, Any]],
+    field: str,
+    kind: str,
+    includes: dict[str, dict],
+):
+    """Replace the references of objects to other resources, e.g. the
+    artists of albums, with their full representations."""
+    model, fields, serialize, annotate = RESOURCES[kind]
+    references = [obj[field] for obj in objects if obj[field]]
+    ids = {
+        int(reference["id"])
+        for value in references
+        for reference in (value if isinstance(value, list) else [value])
+    }
+    rows = (
+        annotate(model.objects.filter(pk__in=ids))
+        .prefetch_related(None)
+        .values(*get_columns(fields, "id"))
+    )
+    resources = {
+        resource["id"]: resource for resource in serialize(request, rows, fields)
+    }
+    embed(request, kind, list(resources.values()), includes)
+
+    for obj in objects:
+        if isinstance(obj[field], list):
+            obj[field] = [resources[reference["id"]] for reference in obj[field]]
+        elif obj[field]:
+            obj[field] = resources[obj[field]["id"]]
+
+
+def get_album_artists(
+    album_ids: Iterable[int], url: URLTemplates
+) -> defaultdict[int, list[dict[str, str]]]:
+    """Retrieve the serialized artists of albums with one query, in the
+    same order as Album.artists (by name)."""
+    artists = defaultdict(list)
+    for album_id, artist_id, name in (
+        models.AlbumArtist.objects.filter(album_id__in=list(album_ids))
+        .order_by("artist__name")
+        .values_list("album_id", "artist_id", "artist__name")
+    ):
+        artists[album_id].append(serialize_artist(url, artist_id, name))
+
+    return artists
+
+
+def serialize_artist(url: URLTemplates, id: int, name: str) -> dict[str, str]:
+    """Serialize an artist the same as schema.ArtistOutBasic."""
+    return {"id": str(id), "name": name, "url": url("retrieve_artist", id)}
+
+
+# The model, fields, serializer, and annotations of each kind of resource.
+RESOURCES = {
+    "artist": (
+        models.Artist,
+        ARTIST_FIELDS,
+        serialize_artists,
+        models.ArtistQuerySet.with_previews,
+    ),
+    "album": (
+        models.Album,
+        ALBUM_FIELDS,
+        serialize_albums,
+        models.AlbumQuerySet.with_tracklist,
+    ),
+    "song": (models.Song, SONG_FIELDS, serialize_songs, lambda queryset: queryset),
+}
+
+# The lookup from the items of each preview to the resource it belongs to,
+# the condition the items meet, and their ordering if it is not the default
+# ordering of their model.
+PREVIEWS = {
+    ("artist", "albums"): ("artists", ~Q(album_type="single"), None),
+    ("artist", "singles"): ("artists", Q(album_type="single"), None),
+    ("artist", "songs"): ("artists", Q(), None),
+    ("artist", "songs_produced"): ("producers", Q(), None),
+    ("album", "tracklist"): ("album", Q(), ("disc", "track_number")),
+}
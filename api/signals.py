@@ -0,0 +1,64 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from api import cache, models
+
+CATALOG_MODELS = (
+    models.Artist,
+    models.Album,
+    models.Song,
+    models.SongArtist,
+    models.SongProducer,
+    models.AlbumArtist,
+)
+
+# Sent with the model as the sender after objects are written with bulk or
+# raw queries, which bypass post_save and post_delete.
+catalog_changed = Signal()
+
+
+@receiver(pre_save, sender=models.Song)
+def copy_release_date(sender, instance, update_fields=None, **kwargs):
+    """Copy the release date of a song's album onto the song."""
+    if update_fields is None or "release_date" in update_fields:
+        instance.release_date = instance.album.release_date
+
+
+@receiver(post_save, sender=models.Album)
+def update_release_dates(sender, instance, created, **kwargs):
+    """Keep the release date of the songs of an album in sync with it.
+
+    Bulk and raw updates of Album.release_date bypass this signal and
+    have to update the songs of the albums themselves.
+    """
+    if not created:
+        updated = (
+            models.Song.objects.filter(album=instance)
+            .exclude(release_date=instance.release_date)
+            .update(release_date=instance.release_date)
+        )
+        if updated:
+            catalog_changed.send(sender=models.Song)
+
+
+@receiver(catalog_changed)
+def invalidate_responses(sender, **kwargs):
+    """Stop serving the cached responses rendered from a changed model."""
+    cache.invalidate(sender)
+
+
+def invalidate_credits(sender, action, **kwargs):
+    """Stop serving the cached responses rendered from changed credits.
+
+    The sender of m2m_changed is the through model of the relation
+    (e.g. SongArtist for Song.artists).
+    """
+    if action.startswith("post_"):
+        cache.invalidate(sender)
+
+
+for model in CATALOG_MODELS:
+    post_save.connect(invalidate_responses, sender=model)
+    post_delete.connect(invalidate_responses, sender=model)
+for model in (models.AlbumArtist, models.SongArtist, models.SongProducer):
+    m2m_changed.connect(invalidate_credits, sender=model)
@@ -1,11 +1,241 @@
-# from django.db import IntegrityError
-from ninja import Router
+import json
+from typing import Any, Iterable, Iterator
 
-# from api import models, schema, utilities as util
+from django.db import DatabaseError, transaction
+from django.http import StreamingHttpResponse
+from ninja import Query, Router
+from ninja.decorators import decorate_view
+from ninja.responses import codes_4xx
+from pydantic import ValidationError
+
+from api import cache, models, schema, serializers, utilities as util
 
 router = Router()
 
 
-@router.get("{int:id}")
-def retrieve_song(request, id: int):
-    pass
+@router.post("ingest", response={400: schema.Error, 415: schema.Error})
+def ingest_songs(request, batch_size: int = 500):
+    """To add a large number of songs in a single request, send them as
+    newline-delimited JSON with the content type application/x-ndjson.
+    Each line is an object with the same fields as when creating a
+    single song, plus the following field:
+    - **album** (*dict*): The album the song belongs to, with the same
+    fields as when creating an album ***required***
+
+    The body is read and validated one line at a time and the songs are
+    written in batches of **batch_size** songs, each in its own
+    transaction, so the body can be sent with chunked transfer encoding
+    and is never held in memory as a whole. Albums are created as
+    needed and songs whose path is already in the database are skipped,
+    so an interrupted import can be resumed by sending the same lines
+    again.
+
+    The response is streamed as newline-delimited JSON with one object
+    per line that could not be validated:
+    - **line** (*integer*): The line number
+    - **error** (*string*): The validation error
+
+    and one object per batch:
+    - **batch** (*integer*): The batch number
+    - **lines** (*list[integer]*): The first and last line of the batch
+    - **created** (*integer*): The number of songs added
+    - **skipped** (*integer*): The number of songs already in the
+    database
+    - **error** (*string*): Why the batch was rolled back, if it was
+    """
+    if request.content_type != "application/x-ndjson":
+        return 415, {"error": "Content type must be application/x-ndjson."}
+    if batch_size < 1:
+        return 400, {"error": "Batch size must be a positive integer."}
+
+    return StreamingHttpResponse(
+        ingest(read_lines(request), batch_size), content_type="application/x-ndjson"
+    )
+
+
+def read_lines(request) -> Iterator[bytes]:
+    """Read the lines of a request body without buffering the body.
+
+    Django only reads up to the Content-Length of a request, which is
+    missing when the body is sent with chunked transfer encoding, so
+    chunked bodies are read from the WSGI input stream directly.
+    """
+    stream = request
+    if request.META.get("HTTP_TRANSFER_ENCODING", "").lower() == "chunked":
+        stream = request.META.get("wsgi.input", request)
+
+    return iter(stream.readline, b"")
+
+
+def ingest(lines: Iterable[bytes], batch_size: int) -> Iterator[bytes]:
+    """Validate and write songs in batches, reporting on each batch.
+
+    Arguments:
+        lines (iterable) -- The lines of the request body.
+        batch_size (int) -- The number of songs written per transaction.
+
+    Returns:
+        progress (iterator) -- An iterator over the lines of the
+        response.
+    """
+    batch, batch_number, first_line = [], 0, 1
+    for number, line in enumerate(lines, 1):
+        if not batch:
+            first_line = number
+        if not line.strip():
+            continue
+
+        try:
+            song = schema.SongImportIn.model_validate_json(line)
+        except ValidationError as error:
+            yield encode({"line": number, "error": format_errors(error)})
+            continue
+
+        batch.append(util.strip_whitespace(song.dict()))
+        if len(batch) == batch_size:
+            batch_number += 1
+            yield encode(write_batch(batch, batch_number, [first_line, number]))
+            batch = []
+
+    if batch:
+        yield encode(write_batch(batch, batch_number + 1, [first_line, number]))
+
+
+def write_batch(
+    batch: list[dict[str, Any]], number: int, lines: list[int]
+) -> dict[str, Any]:
+    """Write a batch of songs to the database in one transaction."""
+    progress = {"batch": number, "lines": lines, "created": 0, "skipped": 0}
+    try:
+        with transaction.atomic():
+            created = len(util.import_songs(batch))
+
+    except DatabaseError as error:
+        progress["error"] = str(error.__cause__ or error)
+
+    else:
+        progress["created"], progress["skipped"] = created, len(batch) - created
+
+    return progress
+
+
+def encode(data: dict[str, Any]) -> bytes:
+    """Encode an object as a line of newline-delimited JSON."""
+    return json.dumps(data).encode() + b"\n"
+
+
+def format_errors(error: ValidationError) -> str:
+    """Summarize a validation error on one line."""
+    return "; ".join(
+        f"{".".join(str(part) for part in detail["loc"]) or "line"}: {detail["msg"]}"
+        for detail in error.errors()
+    )
+
+
+@router.post("resolve", response={200: schema.SongIdsOut})
+def resolve_songs(request, data: schema.SongPathsIn):
+    """To match files to songs, send up to 10,000 **paths** at a time,
+    either relative to the root of the library or absolute. Paths are
+    matched case insensitively, regardless of path separators and of
+    Unicode normalization.
+
+    The response includes the **ids** of the songs in the same order as
+    the paths, with null in place of the paths no song has.
+    """
+    ids = util.resolve_paths(data.paths)
+    return {"ids": [str(id) if id is not None else None for id in ids]}
+
+
+@router.get("", response={200: schema.SongPage, 400: schema.Error})
+@decorate_view(cache.cache_response(*cache.SONG_MODELS))
+@decorate_view(cache.conditional_response())
+def list_songs(
+    request,
+    pagination: Query[schema.PageIn],
+    fields: str | None = None,
+    include: str | None = None,
+    ids: str | None = None,
+):
+    """To browse the songs from most to least played, page through the
+    list with the following query parameters:
+    - **cursor** (*string*): The **next** cursor of the previous page,
+    omitted for the first page ***optional***
+    - **limit** (*integer*): The number of songs per page, defaults to
+    100 ***optional***
+    - **fields** (*string*): A comma-separated list of the fields to
+    include in each song (e.g. id,title,url), all of them by default
+    ***optional***
+    - **include** (*string*): A comma-separated list of the related
+    resources to embed in each song, with the relations of embedded
+    resources separated by dots, up to two levels deep (e.g.
+    album.tracklist) ***optional***
+    - **ids** (*string*): A comma-separated list of up to 500 ids of
+    songs to retrieve instead of a page ***optional***
+
+    Songs with the same play count are listed from the most recent
+    album to the oldest, in tracklist order. The response includes the
+    **items** on the page and the **next** cursor, which is null on the
+    last page. The credits and album of the songs are only retrieved if
+    their fields are requested.
+
+    With **ids**, the **items** are the songs in the same order as
+    the ids, with null in place of the ids no song has, and **next** is
+    null.
+    """
+    includes = serializers.select_includes(include, "song")
+    fields = serializers.select_fields(fields, serializers.SONG_FIELDS, includes)
+    queryset = models.Song.objects.all()
+    if ids is None:
+        page = serializers.paginate(
+            request, queryset, pagination, fields, serializers.serialize_songs
+        )
+    else:
+        items = serializers.retrieve_many(
+            request,
+            queryset,
+            serializers.select_ids(ids),
+            fields,
+            serializers.serialize_songs,
+        )
+        page = {"items": items, "next": None}
+    serializers.embed(request, "song", page["items"], includes)
+    return router.api.create_response(request, page, status=200)
+
+
+@router.get("{int:id}", response={200: schema.SongOut, codes_4xx: schema.Error})
+@decorate_view(cache.cache_response(*cache.SONG_MODELS))
+@decorate_view(
+    cache.conditional_response(
+        lambda id: models.Song.objects.filter(pk=id),
+        "album",
+        "album__albumartist",
+        "album__artists",
+        "songartist",
+        "artists",
+        "songproducer",
+        "producers",
+    )
+)
+def retrieve_song(
+    request, id: int, fields: str | None = None, include: str | None = None
+):
+    """The fields of the song can be selected, and its related resources
+    embedded, with the same **fields** and **include** query parameters
+    as the list of songs.
+    """
+    includes = serializers.select_includes(include, "song")
+    fields = serializers.select_fields(fields, serializers.SONG_FIELDS, includes)
+    try:
+        song = serializers.retrieve(
+            request,
+            models.Song.objects.filter(pk=id),
+            fields,
+            serializers.serialize_songs,
+        )
+
+    except models.Song.DoesNotExist:
+        return 404, {"error": f"Song with id = {id} does not exist."}
+
+    else:
+        serializers.embed(request, "song", [song], includes)
+        return router.api.create_response(request, song, status=200)
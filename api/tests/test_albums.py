@@ -1,9 +1,18 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
 from typing import Any
 
-from django.test import TestCase, Client
+from django.db import connection
+from django.test import TestCase, Client, override_settings
 from django.http import HttpResponse
 from django.urls import reverse
 
+from api import models, utilities as util
+from api.tests.test_library import create_flac
+
 
 class CreateAlbumTestCase(TestCase):
     @classmethod
@@ -142,6 +151,311 @@ class CreateAlbumTestCase(TestCase):
         self.assertEqual(response.status_code, 422)
 
 
+class CreateAlbumsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        self.metadata = [
+            {
+                "title": "Life After Death",
+                "artists": [
+                    {"name": "The Notorious B.I.G.", "hometown": "New York, NY"}
+                ],
+                "release_date": "1997-03-25",
+                "label": "Bad Boy Records",
+                "album_type": "multidisc",
+                "songs": [
+                    {
+                        "title": "Hypnotize",
+                        "artists": [{"name": "The Notorious B.I.G."}],
+                        "producers": [
+                            {"name": "Puff Daddy"},
+                            {"name": "Deric Angelettie"},
+                        ],
+                        "disc": 1,
+                        "track_number": 9,
+                        "length": 229,
+                        "path": "/the-notorious-big/life-after-death/1-09_hypnotize.flac",
+                    },
+                    {
+                        "title": "Notorious Thugs",
+                        "artists": [
+                            {"name": "The Notorious B.I.G."},
+                            {"name": "Bone Thugs-N-Harmony"},
+                        ],
+                        "group_members": [{"name": "Krayzie Bone"}],
+                        "producers": [{"name": "Stevie J"}],
+                        "disc": 2,
+                        "track_number": 5,
+                        "length": 367,
+                        "path": "/the-notorious-big/life-after-death/2-05_notorious_thugs.flac",
+                    },
+                ],
+            },
+            {
+                "title": "No Way Out",
+                "artists": [{"name": "Puff Daddy", "hometown": "New York, NY"}],
+                "release_date": "1997-07-22",
+                "label": "Bad Boy Records",
+            },
+        ]
+
+    def send_post_request(self, data: list[dict[str, Any]]) -> HttpResponse:
+        """Send POST request to API endpoint that creates Album objects in
+        bulk.
+
+        Arguments:
+            data (list) -- A list of dictionaries that contain the
+            metadata for the albums to be added to the database.
+
+        Returns:
+            HttpResponse object with the results of the POST request.
+        """
+        return self.client.post(
+            reverse("api:create_albums"),
+            data=data,
+            content_type="application/json",
+        )
+
+    def test_create_albums_status_code(self):
+        response = self.send_post_request(self.metadata)
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_create_albums_json_response(self):
+        response = self.send_post_request(self.metadata).json()
+
+        self.assertEqual(len(response), 2)
+        self.assertEqual(response[0]["title"], self.metadata[0]["title"])
+        self.assertEqual(response[0]["artists"][0]["name"], "The Notorious B.I.G.")
+        self.assertEqual(response[1]["title"], self.metadata[1]["title"])
+        self.assertTrue(response[1]["url"].endswith(f"api/albums/{response[1]["id"]}"))
+
+    def test_create_albums_creates_tracklists(self):
+        response = self.send_post_request(self.metadata).json()
+        songs = models.Song.objects.filter(album=response[0]["id"])
+
+        self.assertEqual(songs.count(), 2)
+        self.assertEqual(models.Song.objects.filter(album=response[1]["id"]).count(), 0)
+
+    def test_create_albums_creates_song_credits(self):
+        self.send_post_request(self.metadata)
+        notorious_thugs = models.Song.objects.get(title="Notorious Thugs")
+        features = notorious_thugs.songartist_set.filter(group=False)
+        affiliations = notorious_thugs.songartist_set.filter(group=True)
+
+        self.assertEqual(
+            [feature.artist.name for feature in features],
+            ["The Notorious B.I.G.", "Bone Thugs-N-Harmony"],
+        )
+        self.assertEqual(
+            [affiliation.artist.name for affiliation in affiliations], ["Krayzie Bone"]
+        )
+        self.assertEqual(
+            [producer.name for producer in notorious_thugs.producers.all()],
+            ["Stevie J"],
+        )
+
+    def test_create_albums_reuses_artists(self):
+        self.send_post_request(self.metadata)
+
+        self.assertEqual(models.Artist.objects.filter(name="Puff Daddy").count(), 1)
+        self.assertEqual(
+            models.Artist.objects.get(name="Puff Daddy").hometown, "New York, NY"
+        )
+
+    def test_create_albums_with_extraneous_whitespace(self):
+        self.metadata[0]["songs"][0]["title"] = "  Hypnotize   "
+        response = self.send_post_request(self.metadata)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(models.Song.objects.filter(title="Hypnotize").exists())
+
+    def test_create_duplicate_albums(self):
+        self.send_post_request(self.metadata[1:])
+        response = self.send_post_request(self.metadata)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["error"], "Album already exists in database.")
+        self.assertFalse(models.Album.objects.filter(title="Life After Death").exists())
+
+    def test_create_albums_with_duplicate_track_number(self):
+        self.metadata[0]["songs"][1]["disc"] = 1
+        self.metadata[0]["songs"][1]["track_number"] = 9
+        response = self.send_post_request(self.metadata)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(
+            response.json()["error"], "Album already has a song with that track number."
+        )
+        self.assertEqual(models.Album.objects.count(), 0)
+        self.assertEqual(models.Song.objects.count(), 0)
+
+    def test_create_albums_with_invalid_track_number(self):
+        self.metadata[0]["songs"][0]["track_number"] = 0
+        response = self.send_post_request(self.metadata)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json()["error"],
+            "Track number must be a positive integer greater than 0.",
+        )
+
+    def test_create_albums_with_missing_required_fields(self):
+        del self.metadata[0]["songs"][0]["path"]
+        response = self.send_post_request(self.metadata)
+
+        self.assertEqual(response.status_code, 422)
+
+
+class UpsertAlbumTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        self.metadata = {
+            "title": "Capital Punishment",
+            "artists": [{"name": "Big Pun", "hometown": "New York, NY"}],
+            "release_date": "1998-04-28",
+            "label": "Loud Records",
+        }
+
+    def send_put_request(self, data: dict[str, Any]) -> HttpResponse:
+        """Send PUT request to API endpoint that creates or updates an
+        Album object.
+
+        Arguments:
+            data (dict) -- A dictionary that contains the metadata for
+            the album to be added to or updated in the database.
+
+        Returns:
+            HttpResponse object with the results of the PUT request.
+        """
+        return self.client.put(
+            reverse("api:create_album"),
+            data=data,
+            content_type="application/json",
+        )
+
+    def test_upsert_album_creates_album(self):
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["title"], self.metadata["title"])
+        self.assertEqual(response.json()["artists"][0]["name"], "Big Pun")
+
+    def test_upsert_album_updates_existing_album(self):
+        created = self.send_put_request(self.metadata).json()
+        self.metadata["title"] = "capital punishment"
+        self.metadata["label"] = "Terror Squad"
+        self.metadata["artists"].append({"name": "Fat Joe"})
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], created["id"])
+        self.assertEqual(response.json()["title"], "Capital Punishment")
+        self.assertEqual(response.json()["label"], "Terror Squad")
+        self.assertEqual(
+            [artist["name"] for artist in response.json()["artists"]],
+            ["Big Pun", "Fat Joe"],
+        )
+
+    def test_upsert_album_with_different_release_date_creates_album(self):
+        self.send_put_request(self.metadata)
+        self.metadata["release_date"] = "2000-04-04"
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(models.Album.objects.count(), 2)
+
+
+class UpsertSongTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        self.album = self.client.post(
+            reverse("api:create_album"),
+            data={
+                "title": "Capital Punishment",
+                "artists": [{"name": "Big Pun"}],
+                "release_date": "1998-04-28",
+            },
+            content_type="application/json",
+        ).json()
+        self.metadata = {
+            "title": "Still Not A Player",
+            "artists": [{"name": "Big Pun"}, {"name": "Joe"}],
+            "producers": [{"name": "Knobody"}],
+            "track_number": 12,
+            "length": 236,
+            "path": "/big-pun/capital-punishment/12_still_not_a_player.flac",
+        }
+
+    def send_put_request(self, data: dict[str, Any], id: str = "") -> HttpResponse:
+        """Send PUT request to API endpoint that creates or updates a Song
+        object.
+
+        Arguments:
+            data (dict) -- A dictionary that contains the metadata for
+            the song to be added to or updated in the database.
+            id (str) -- The primary key of the album of the song,
+            defaults to Capital Punishment.
+
+        Returns:
+            HttpResponse object with the results of the PUT request.
+        """
+        return self.client.put(
+            reverse("api:create_song", kwargs={"id": id or self.album["id"]}),
+            data=data,
+            content_type="application/json",
+        )
+
+    def test_upsert_song_creates_song(self):
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["title"], self.metadata["title"])
+        self.assertEqual(
+            [artist["name"] for artist in response.json()["artists"]],
+            ["Big Pun", "Joe"],
+        )
+
+    def test_upsert_song_updates_existing_song(self):
+        created = self.send_put_request(self.metadata).json()
+        models.Song.objects.filter(pk=created["id"]).update(play_count=9)
+        self.metadata["path"] = self.metadata["path"].upper()
+        self.metadata["length"] = 237
+        self.metadata["artists"] = [{"name": "Big Punisher"}]
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], created["id"])
+        self.assertEqual(response.json()["length"], 237)
+        self.assertEqual(response.json()["play_count"], 9)
+        self.assertEqual(
+            [artist["name"] for artist in response.json()["artists"]], ["Big Punisher"]
+        )
+
+    def test_upsert_song_with_duplicate_track_number(self):
+        self.send_put_request(self.metadata)
+        self.metadata["path"] = "/big-pun/capital-punishment/12_still_not_a_playa.flac"
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(models.Song.objects.count(), 1)
+
+    def test_upsert_song_with_album_that_does_not_exist(self):
+        album_id = str(int(self.album["id"]) + 100)
+        response = self.send_put_request(self.metadata, album_id)
+
+        self.assertEqual(response.status_code, 404)
+
+
 class CreateSongTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -395,3 +709,342 @@ class CreateSongTestCase(TestCase):
         response = self.send_post_request(self.metadata)
 
         self.assertEqual(response.status_code, 422)
+
+    def test_create_song_probes_file_in_library(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        create_flac(os.path.join(root, self.metadata["path"].lstrip("/")), 310)
+
+        with override_settings(LIBRARY_ROOT=root):
+            response = self.send_post_request(self.metadata).json()
+
+        self.assertEqual(response["length"], 310)
+        self.assertEqual(response["sample_rate"], 44100)
+        self.assertEqual(response["bit_depth"], 16)
+        self.assertEqual(response["channels"], 2)
+
+    def test_create_song_without_file_in_library(self):
+        with override_settings(LIBRARY_ROOT=tempfile.gettempdir()):
+            response = self.send_post_request(self.metadata).json()
+
+        self.assertEqual(response["length"], self.metadata["length"])
+        self.assertIsNone(response["sample_rate"])
+
+
+class RetrieveAlbumTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        self.the_infamous = self.client.post(
+            reverse("api:create_album"),
+            data={
+                "title": "The Infamous",
+                "artists": [{"name": "Prodigy"}, {"name": "Havoc"}],
+                "release_date": "1995-04-25",
+                "label": "Loud Records",
+            },
+            content_type="application/json",
+        ).json()
+        for track_number, title, length in [
+            (3, "Survival Of The Fittest", 224),
+            (4, "Eye For A Eye", 258),
+            (13, "Shook Ones Pt. II", 325),
+        ]:
+            self.client.post(
+                reverse("api:create_song", kwargs={"id": self.the_infamous["id"]}),
+                data={
+                    "title": title,
+                    "artists": [{"name": "Mobb Deep"}],
+                    "track_number": track_number,
+                    "length": length,
+                    "path": f"/mobb-deep/the-infamous/{track_number:02}.flac",
+                },
+                content_type="application/json",
+            )
+
+    def send_get_request(self, id: str) -> HttpResponse:
+        """Send GET request to API endpoint that retrieves an Album object.
+
+        Arguments:
+            id (str) -- The primary key of the album to retrieve.
+
+        Returns:
+            HttpResponse object with the results of the GET request.
+        """
+        return self.client.get(reverse("api:retrieve_album", kwargs={"id": id}))
+
+    def test_retrieve_album_status_code(self):
+        response = self.send_get_request(self.the_infamous["id"])
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_album_json_response_title(self):
+        response = self.send_get_request(self.the_infamous["id"]).json()
+
+        self.assertEqual(response["title"], "The Infamous")
+        self.assertEqual(response["label"], "Loud Records")
+
+    def test_retrieve_album_json_response_artists(self):
+        response = self.send_get_request(self.the_infamous["id"]).json()
+
+        self.assertEqual(
+            [artist["name"] for artist in response["artists"]], ["Havoc", "Prodigy"]
+        )
+
+    def test_retrieve_album_json_response_tracklist(self):
+        response = self.send_get_request(self.the_infamous["id"]).json()
+        tracklist = response["tracklist"]
+
+        self.assertEqual(tracklist["count"], 3)
+        self.assertTrue(
+            tracklist["url"].endswith(f"/api/albums/{self.the_infamous["id"]}/songs")
+        )
+
+    def test_retrieve_album_json_response_length(self):
+        response = self.send_get_request(self.the_infamous["id"]).json()
+
+        self.assertEqual(response["length"], 807)
+
+    def test_retrieve_album_without_songs(self):
+        models.Song.objects.all().delete()
+        response = self.send_get_request(self.the_infamous["id"]).json()
+
+        self.assertEqual(response["tracklist"]["count"], 0)
+        self.assertEqual(response["length"], 0)
+
+    def test_retrieve_album_number_of_queries_does_not_grow(self):
+        album = models.Album.objects.get(pk=self.the_infamous["id"])
+        album.artists.add(models.Artist.objects.get(name="Mobb Deep"))
+
+        with self.assertNumQueries(3):
+            self.send_get_request(self.the_infamous["id"])
+
+    def test_retrieve_album_with_selected_fields(self):
+        response = self.client.get(
+            reverse("api:retrieve_album", kwargs={"id": self.the_infamous["id"]}),
+            {"fields": "title,length"},
+        ).json()
+
+        self.assertEqual(response, {"title": "The Infamous", "length": 807})
+
+    def test_retrieve_album_with_embedded_tracklist(self):
+        response = self.client.get(
+            reverse("api:retrieve_album", kwargs={"id": self.the_infamous["id"]}),
+            {"include": "tracklist"},
+        ).json()
+
+        self.assertEqual(response["tracklist"]["count"], 3)
+        self.assertEqual(
+            [song["title"] for song in response["tracklist"]["items"]],
+            ["Survival Of The Fittest", "Eye For A Eye", "Shook Ones Pt. II"],
+        )
+        self.assertEqual(
+            response["tracklist"]["items"][0]["artists"][0]["name"], "Mobb Deep"
+        )
+
+    def test_retrieve_album_with_nested_embedded_relations(self):
+        response = self.client.get(
+            reverse("api:retrieve_album", kwargs={"id": self.the_infamous["id"]}),
+            {"include": "artists.albums", "fields": "title"},
+        ).json()
+
+        self.assertEqual(list(response), ["id", "title", "artists"])
+        self.assertEqual(response["artists"][0]["name"], "Havoc")
+        self.assertEqual(response["artists"][0]["albums"]["count"], 1)
+        self.assertEqual(
+            [album["title"] for album in response["artists"][0]["albums"]["items"]],
+            ["The Infamous"],
+        )
+
+    def test_retrieve_album_with_unknown_include(self):
+        response = self.client.get(
+            reverse("api:retrieve_album", kwargs={"id": self.the_infamous["id"]}),
+            {"include": "artists.tracklist"},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(
+            response.json()["error"].startswith("Unknown include: artists.tracklist.")
+        )
+
+    def test_retrieve_album_that_does_not_exist(self):
+        id = str(int(self.the_infamous["id"]) + 100)
+        response = self.send_get_request(id)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            response.json()["error"], f"Album with id = {id} does not exist."
+        )
+
+
+class ListAlbumsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        for title, release_date in [
+            ("Hell On Earth", "1996-11-19"),
+            ("The Infamous", "1995-04-25"),
+            ("Juvenile Hell", "1993-04-20"),
+        ]:
+            self.client.post(
+                reverse("api:create_album"),
+                data={
+                    "title": title,
+                    "artists": [{"name": "Mobb Deep"}],
+                    "release_date": release_date,
+                },
+                content_type="application/json",
+            )
+
+    def send_get_request(self, **params: int | str) -> HttpResponse:
+        """Send GET request to API endpoint that lists Album objects.
+
+        Arguments:
+            params -- The pagination query parameters.
+
+        Returns:
+            HttpResponse object with the results of the GET request.
+        """
+        return self.client.get(reverse("api:list_albums"), params)
+
+    def test_list_albums_in_order_of_release(self):
+        first_page = self.send_get_request(limit=2).json()
+        second_page = self.send_get_request(limit=2, cursor=first_page["next"]).json()
+
+        self.assertEqual(
+            [album["title"] for album in first_page["items"]],
+            ["Juvenile Hell", "The Infamous"],
+        )
+        self.assertEqual(
+            [album["title"] for album in second_page["items"]], ["Hell On Earth"]
+        )
+        self.assertIsNone(second_page["next"])
+
+    def test_list_albums_number_of_queries(self):
+        with self.assertNumQueries(2):
+            self.send_get_request()
+
+    def test_list_albums_with_selected_fields(self):
+        with self.assertNumQueries(1):
+            response = self.send_get_request(fields="title,release_date").json()
+
+        self.assertEqual(
+            response["items"][0],
+            {"title": "Juvenile Hell", "release_date": "1993-04-20"},
+        )
+
+
+class RetrieveAlbumSongsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        self.album = util.bulk_create_albums(
+            [
+                {
+                    "title": "All Eyez On Me",
+                    "artists": [{"name": "2Pac"}],
+                    "release_date": datetime.date(1996, 2, 13),
+                    "album_type": "multidisc",
+                    "songs": [
+                        {
+                            "title": title,
+                            "artists": [{"name": "2Pac"}],
+                            "producers": [{"name": producer}],
+                            "disc": disc,
+                            "track_number": track_number,
+                            "length": 240,
+                            "path": f"/2pac/all-eyez-on-me/{disc}-{track_number:02}.flac",
+                        }
+                        for disc, track_number, title, producer in [
+                            (2, 1, "Life Goes On", "Johnny J"),
+                            (1, 2, "All About U", "Johnny J"),
+                            (1, 1, "Ambitionz Az A Ridah", "Daz Dillinger"),
+                            (2, 10, "Heartz Of Men", "DJ Pooh"),
+                        ]
+                    ],
+                }
+            ]
+        )[0]
+
+    def send_get_request(self, id: int) -> HttpResponse:
+        """Send GET request to API endpoint that retrieves the tracklist
+        of an Album object.
+
+        Arguments:
+            id (int) -- The primary key of the album.
+
+        Returns:
+            HttpResponse object with the results of the GET request.
+        """
+        return self.client.get(reverse("api:retrieve_album_songs", kwargs={"id": id}))
+
+    def get_tracklist(self, id: int) -> dict[str, Any]:
+        """Return the decoded tracklist streamed for an album."""
+        response = self.send_get_request(id)
+        self.assertEqual(response.status_code, 200)
+
+        return json.loads(b"".join(response.streaming_content))
+
+    def test_retrieve_album_songs_grouped_by_disc_in_track_order(self):
+        tracklist = self.get_tracklist(self.album.id)
+
+        self.assertEqual(
+            [
+                (disc["disc"], [song["title"] for song in disc["songs"]])
+                for disc in tracklist["discs"]
+            ],
+            [
+                (1, ["Ambitionz Az A Ridah", "All About U"]),
+                (2, ["Life Goes On", "Heartz Of Men"]),
+            ],
+        )
+
+    def test_retrieve_album_songs_json_response_album_and_credits(self):
+        tracklist = self.get_tracklist(self.album.id)
+        song = tracklist["discs"][0]["songs"][0]
+
+        self.assertEqual(tracklist["album"]["title"], "All Eyez On Me")
+        self.assertEqual(song["album"]["title"], "All Eyez On Me")
+        self.assertEqual([artist["name"] for artist in song["artists"]], ["2Pac"])
+        self.assertEqual(
+            [producer["name"] for producer in song["producers"]], ["Daz Dillinger"]
+        )
+
+    def test_retrieve_album_songs_without_songs(self):
+        models.Song.objects.all().delete()
+        tracklist = self.get_tracklist(self.album.id)
+
+        self.assertEqual(tracklist["discs"], [])
+
+    def test_retrieve_album_songs_number_of_queries(self):
+        # The album, its artists, and one chunk of songs with their
+        # credits and producers.
+        with self.assertNumQueries(6):
+            self.get_tracklist(self.album.id)
+
+    def test_retrieve_album_songs_uses_track_number_index(self):
+        songs = models.Song.objects.filter(album=self.album).order_by(
+            "disc", "track_number"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(f"EXPLAIN {songs.query}")
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+
+        self.assertIn("duplicate_track_number", plan)
+        self.assertNotIn("Sort", plan)
+
+    def test_retrieve_album_songs_of_album_that_does_not_exist(self):
+        id = self.album.id + 100
+        response = self.send_get_request(id)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            response.json()["error"], f"Album with id = {id} does not exist."
+        )
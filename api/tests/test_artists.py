@@ -1,9 +1,15 @@
+import datetime
 from typing import Any
+from unittest import mock
 
+from django.db import connection
 from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
 from django.http import HttpResponse
 from django.urls import reverse
 
+from api import models, serializers, utilities as util
+
 
 class CreateArtistTestCase(TestCase):
     @classmethod
@@ -126,6 +132,73 @@ class CreateArtistTestCase(TestCase):
         self.assertEqual(response.status_code, 422)
 
 
+class UpsertArtistTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        self.metadata = {"name": "Big Pun", "hometown": "New York, NY"}
+
+    def send_put_request(self, data: dict[str, Any]) -> HttpResponse:
+        """Send PUT request to API endpoint that creates or updates an
+        Artist object.
+
+        Arguments:
+            data (dict) -- A dictionary that contains the metadata for
+            the artist to be added to or updated in the database.
+
+        Returns:
+            HttpResponse object with the results of the PUT request.
+        """
+        return self.client.put(
+            reverse("api:create_artist"),
+            data=data,
+            content_type="application/json",
+        )
+
+    def test_upsert_artist_creates_artist(self):
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["name"], self.metadata["name"])
+        self.assertEqual(response.json()["hometown"], self.metadata["hometown"])
+
+    def test_upsert_artist_updates_existing_artist(self):
+        created = self.send_put_request({"name": "Big Pun"}).json()
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], created["id"])
+        self.assertEqual(response.json()["hometown"], self.metadata["hometown"])
+
+    def test_upsert_artist_matches_name_case_insensitively(self):
+        created = self.send_put_request(self.metadata).json()
+        response = self.send_put_request({"name": "BIG PUN"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], created["id"])
+        self.assertEqual(response.json()["name"], "Big Pun")
+
+    def test_upsert_artist_keeps_hometown_if_not_submitted(self):
+        self.send_put_request(self.metadata)
+        response = self.send_put_request({"name": "Big Pun"})
+
+        self.assertEqual(response.json()["hometown"], self.metadata["hometown"])
+
+    def test_upsert_artist_runs_one_statement(self):
+        self.send_put_request(self.metadata)
+
+        with self.assertNumQueries(1):
+            util.upsert_artist(self.metadata)
+
+    def test_upsert_artist_with_missing_required_fields(self):
+        del self.metadata["name"]
+        response = self.send_put_request(self.metadata)
+
+        self.assertEqual(response.status_code, 422)
+
+
 class RetrieveArtistTestCase(TestCase):
     @classmethod
     def setUpTestData(cls):
@@ -218,3 +291,286 @@ class RetrieveArtistTestCase(TestCase):
             response.json()["error"],
             f"Artist with id = {unknown_artist} does not exist.",
         )
+
+
+class ListArtistsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        util.bulk_create_albums(
+            [
+                {
+                    "title": "Enter The Wu-Tang (36 Chambers)",
+                    "artists": [{"name": "Wu-Tang Clan"}],
+                    "release_date": datetime.date(1993, 11, 9),
+                    "songs": [
+                        {
+                            "title": "Protect Ya Neck",
+                            "artists": [{"name": "Wu-Tang Clan"}],
+                            "producers": [{"name": "RZA"}],
+                            "track_number": 10,
+                            "length": 292,
+                            "path": "/wu-tang-clan/36-chambers/10.flac",
+                        },
+                        {
+                            "title": "Method Man",
+                            "artists": [{"name": "Method Man"}],
+                            "producers": [{"name": "RZA"}, {"name": "Method Man"}],
+                            "track_number": 12,
+                            "length": 330,
+                            "path": "/wu-tang-clan/36-chambers/12.flac",
+                        },
+                    ],
+                },
+                {
+                    "title": "Protect Ya Neck",
+                    "artists": [{"name": "Wu-Tang Clan"}],
+                    "release_date": datetime.date(1992, 12, 1),
+                    "album_type": "single",
+                },
+                {
+                    "title": "Tical",
+                    "artists": [{"name": "Method Man"}],
+                    "release_date": datetime.date(1994, 11, 15),
+                },
+            ]
+        )
+
+    def send_get_request(self, **params: int | str) -> HttpResponse:
+        """Send GET request to API endpoint that lists Artist objects.
+
+        Arguments:
+            params -- The pagination query parameters.
+
+        Returns:
+            HttpResponse object with the results of the GET request.
+        """
+        return self.client.get(reverse("api:list_artists"), params)
+
+    def test_list_artists_in_alphabetical_order(self):
+        response = self.send_get_request().json()
+
+        self.assertIsNone(response["next"])
+        self.assertEqual(
+            [artist["name"] for artist in response["items"]],
+            ["Method Man", "RZA", "Wu-Tang Clan"],
+        )
+
+    def test_list_artists_preview_counts(self):
+        artists = {
+            artist["name"]: artist for artist in self.send_get_request().json()["items"]
+        }
+
+        self.assertEqual(artists["Wu-Tang Clan"]["albums"]["count"], 1)
+        self.assertEqual(artists["Wu-Tang Clan"]["singles"]["count"], 1)
+        self.assertEqual(artists["Wu-Tang Clan"]["songs"]["count"], 1)
+        self.assertEqual(artists["Wu-Tang Clan"]["songs_produced"]["count"], 0)
+        self.assertEqual(artists["Method Man"]["albums"]["count"], 1)
+        self.assertEqual(artists["Method Man"]["songs"]["count"], 1)
+        self.assertEqual(artists["Method Man"]["songs_produced"]["count"], 1)
+        self.assertEqual(artists["RZA"]["songs_produced"]["count"], 2)
+
+    def test_list_artists_pagination(self):
+        first_page = self.send_get_request(limit=2).json()
+        second_page = self.send_get_request(limit=2, cursor=first_page["next"]).json()
+
+        self.assertEqual(
+            [artist["name"] for artist in first_page["items"]], ["Method Man", "RZA"]
+        )
+        self.assertEqual(
+            [artist["name"] for artist in second_page["items"]], ["Wu-Tang Clan"]
+        )
+        self.assertIsNone(second_page["next"])
+
+    def test_list_artists_with_invalid_cursor(self):
+        response = self.send_get_request(cursor="not-a-cursor")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "Cursor is invalid.")
+
+    def test_list_artists_number_of_queries_does_not_grow(self):
+        with self.assertNumQueries(1):
+            self.send_get_request()
+
+    def test_list_artists_with_selected_fields(self):
+        response = self.send_get_request(fields="name,url").json()
+
+        self.assertEqual(list(response["items"][0]), ["name", "url"])
+        self.assertEqual(response["items"][0]["name"], "Method Man")
+
+    def test_list_artists_with_selected_fields_skips_previews(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.send_get_request(fields="id,name")
+
+        self.assertNotIn("api_albumartist", queries[-1]["sql"])
+        self.assertNotIn("api_songartist", queries[-1]["sql"])
+
+    def test_list_artists_by_ids(self):
+        rza = models.Artist.objects.get(name="RZA")
+        response = self.send_get_request(ids=f"{rza.id + 100},{rza.id}").json()
+
+        self.assertIsNone(response["items"][0])
+        self.assertEqual(response["items"][1]["name"], "RZA")
+        self.assertEqual(response["items"][1]["songs_produced"]["count"], 2)
+
+    def test_list_artists_with_unknown_field(self):
+        response = self.send_get_request(fields="name,length")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.json()["error"].startswith("Unknown fields: length."))
+
+
+class ArtistDiscographyTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        util.bulk_create_albums(
+            [
+                {
+                    "title": "Illmatic",
+                    "artists": [{"name": "Nas"}],
+                    "release_date": datetime.date(1994, 4, 19),
+                    "songs": [
+                        {
+                            "title": title,
+                            "artists": [{"name": "Nas"}],
+                            "producers": [{"name": producer}],
+                            "track_number": track_number,
+                            "length": 240,
+                            "path": f"/nas/illmatic/{track_number:02}.flac",
+                        }
+                        for track_number, title, producer in [
+                            (2, "N.Y. State Of Mind", "DJ Premier"),
+                            (5, "The World Is Yours", "Pete Rock"),
+                            (9, "Represent", "DJ Premier"),
+                        ]
+                    ],
+                },
+                {
+                    "title": "It Was Written",
+                    "artists": [{"name": "Nas"}],
+                    "release_date": datetime.date(1996, 7, 2),
+                },
+                {
+                    "title": "Halftime",
+                    "artists": [{"name": "Nas"}],
+                    "release_date": datetime.date(1992, 10, 13),
+                    "album_type": "single",
+                },
+            ]
+        )
+        self.nas = models.Artist.objects.get(name="Nas")
+        self.premier = models.Artist.objects.get(name="DJ Premier")
+
+    def send_get_request(
+        self, url_name: str, id: int, **params: int | str
+    ) -> HttpResponse:
+        """Send GET request to an API endpoint that lists the albums,
+        singles, songs, or production credits of an artist.
+
+        Arguments:
+            url_name (str) -- The name of the endpoint.
+            id (int) -- The primary key of the artist.
+            params -- The pagination query parameters.
+
+        Returns:
+            HttpResponse object with the results of the GET request.
+        """
+        return self.client.get(reverse(f"api:{url_name}", kwargs={"id": id}), params)
+
+    def get_titles(self, url_name: str, id: int, **params: int | str) -> list[str]:
+        """Return the titles of the items on a page of an endpoint."""
+        response = self.send_get_request(url_name, id, **params).json()
+        return [item["title"] for item in response["items"]]
+
+    def test_retrieve_artist_albums_excludes_singles(self):
+        titles = self.get_titles("retrieve_artist_albums", self.nas.id)
+
+        self.assertEqual(titles, ["Illmatic", "It Was Written"])
+
+    def test_retrieve_artist_singles(self):
+        titles = self.get_titles("retrieve_artist_singles", self.nas.id)
+
+        self.assertEqual(titles, ["Halftime"])
+
+    def test_retrieve_artist_songs(self):
+        titles = self.get_titles("retrieve_artist_songs", self.nas.id)
+
+        self.assertEqual(
+            titles, ["N.Y. State Of Mind", "The World Is Yours", "Represent"]
+        )
+
+    def test_retrieve_artist_songs_produced(self):
+        titles = self.get_titles("retrieve_artist_songs_produced", self.premier.id)
+
+        self.assertEqual(titles, ["N.Y. State Of Mind", "Represent"])
+
+    def test_retrieve_artist_songs_pagination(self):
+        first_page = self.send_get_request(
+            "retrieve_artist_songs", self.nas.id, limit=2
+        ).json()
+        titles = self.get_titles(
+            "retrieve_artist_songs", self.nas.id, limit=2, cursor=first_page["next"]
+        )
+
+        self.assertEqual(len(first_page["items"]), 2)
+        self.assertEqual(titles, ["Represent"])
+
+    def test_embedded_previews_are_capped_with_next_cursor(self):
+        with mock.patch.object(serializers, "PREVIEW_LIMIT", 2):
+            response = self.client.get(
+                reverse("api:retrieve_artist", kwargs={"id": self.nas.id}),
+                {"include": "songs,albums"},
+            ).json()
+        titles = self.get_titles(
+            "retrieve_artist_songs", self.nas.id, cursor=response["songs"]["next"]
+        )
+
+        self.assertEqual(response["songs"]["count"], 3)
+        self.assertEqual(len(response["songs"]["items"]), 2)
+        self.assertEqual(titles, ["Represent"])
+        self.assertEqual(len(response["albums"]["items"]), 2)
+        self.assertIsNone(response["albums"]["next"])
+
+    def test_include_deeper_than_limit(self):
+        response = self.client.get(
+            reverse("api:retrieve_artist", kwargs={"id": self.nas.id}),
+            {"include": "songs.album.tracklist"},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(
+            response.json()["error"].startswith(
+                "Include songs.album.tracklist is too deep."
+            )
+        )
+
+    def test_retrieve_artist_albums_number_of_queries(self):
+        # The artist, the page, and the artists of the albums on the page.
+        with self.assertNumQueries(3):
+            self.send_get_request("retrieve_artist_albums", self.nas.id)
+
+    def test_retrieve_artist_songs_number_of_queries(self):
+        # The artist, the page, and the credits, producers, and album
+        # artists of the songs on the page.
+        with self.assertNumQueries(5):
+            self.send_get_request("retrieve_artist_songs", self.nas.id)
+
+    def test_retrieve_discography_of_artist_that_does_not_exist(self):
+        id = self.nas.id + 100
+        for url_name in [
+            "retrieve_artist_albums",
+            "retrieve_artist_singles",
+            "retrieve_artist_songs",
+            "retrieve_artist_songs_produced",
+        ]:
+            response = self.send_get_request(url_name, id)
+
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(
+                response.json()["error"], f"Artist with id = {id} does not exist."
+            )
@@ -0,0 +1,351 @@
+import datetime
+import threading
+import time
+
+from django.core.cache import cache as django_cache
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    override_settings,
+)
+from django.urls import reverse
+from django.utils.http import http_date
+
+from api import cache, models, signals, utilities as util
+
+
+@override_settings(RESPONSE_CACHE=True)
+class ResponseCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        django_cache.clear()
+        self.album = util.bulk_create_albums(
+            [
+                {
+                    "title": "Illmatic",
+                    "artists": [{"name": "Nas"}],
+                    "release_date": datetime.date(1994, 4, 19),
+                    "songs": [
+                        {
+                            "title": "N.Y. State Of Mind",
+                            "artists": [{"name": "Nas"}],
+                            "producers": [{"name": "DJ Premier"}],
+                            "track_number": 2,
+                            "length": 294,
+                            "path": "/nas/illmatic/02.flac",
+                        }
+                    ],
+                }
+            ]
+        )[0]
+        self.artist = models.Artist.objects.get(name="Nas")
+        self.song = self.album.song_set.get()
+
+    def test_repeat_request_skips_database(self):
+        first = self.client.get(reverse("api:list_artists"))
+
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse("api:list_artists"))
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+
+    @override_settings(RESPONSE_CACHE=False)
+    def test_responses_are_not_cached_without_shared_backend(self):
+        self.client.get(reverse("api:list_artists"))
+
+        with self.assertNumQueries(1):
+            self.client.get(reverse("api:list_artists"))
+
+    def test_query_parameters_are_part_of_key(self):
+        self.client.get(reverse("api:list_artists"), {"limit": 1})
+        response = self.client.get(reverse("api:list_artists"), {"limit": 2})
+
+        self.assertEqual(len(response.json()["items"]), 2)
+
+    def test_save_invalidates_response(self):
+        url = reverse("api:retrieve_artist", kwargs={"id": self.artist.id})
+        self.client.get(url)
+        self.artist.hometown = "Queens, NY"
+        self.artist.save()
+
+        self.assertEqual(self.client.get(url).json()["hometown"], "Queens, NY")
+
+    def test_delete_invalidates_response(self):
+        self.client.get(reverse("api:list_songs"))
+        self.song.delete()
+
+        self.assertEqual(self.client.get(reverse("api:list_songs")).json()["items"], [])
+
+    def test_m2m_change_invalidates_response(self):
+        url = reverse("api:retrieve_album", kwargs={"id": self.album.id})
+        self.client.get(url)
+        self.album.artists.add(models.Artist.objects.get(name="DJ Premier"))
+
+        self.assertEqual(
+            [artist["name"] for artist in self.client.get(url).json()["artists"]],
+            ["DJ Premier", "Nas"],
+        )
+
+    def test_bulk_create_invalidates_response(self):
+        url = reverse("api:retrieve_album", kwargs={"id": self.album.id})
+        self.client.get(url)
+        util.bulk_create_songs(
+            [
+                {
+                    "title": "Life's A Bitch",
+                    "artists": [{"name": "Nas"}, {"name": "AZ"}],
+                    "track_number": 3,
+                    "length": 210,
+                    "path": "/nas/illmatic/03.flac",
+                    "album": self.album,
+                }
+            ]
+        )
+
+        self.assertEqual(self.client.get(url).json()["tracklist"]["count"], 2)
+
+    def test_unrelated_change_keeps_response(self):
+        url = reverse("api:retrieve_artist", kwargs={"id": self.artist.id})
+        self.client.get(url)
+        self.song.play_count = 10
+        self.song.save()
+
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_streamed_response_is_cached_once_sent(self):
+        url = reverse("api:retrieve_album_songs", kwargs={"id": self.album.id})
+        first = b"".join(self.client.get(url).streaming_content)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+
+        self.assertEqual(second.content, first)
+
+    @override_settings(RESPONSE_CACHE_MAX_STREAM_SIZE=10)
+    def test_large_streamed_response_is_not_cached(self):
+        url = reverse("api:retrieve_album_songs", kwargs={"id": self.album.id})
+        first = b"".join(self.client.get(url).streaming_content)
+        second = self.client.get(url)
+
+        self.assertTrue(second.streaming)
+        self.assertEqual(b"".join(second.streaming_content), first)
+
+    @override_settings(ALLOWED_HOSTS=["internal", "api.example.com"])
+    def test_host_is_part_of_key(self):
+        url = reverse("api:retrieve_artist", kwargs={"id": self.artist.id})
+        self.client.get(url, headers={"Host": "internal:8000"})
+        response = self.client.get(
+            url, headers={"Host": "api.example.com"}, secure=True
+        )
+
+        self.assertEqual(
+            response.json()["url"], f"https://api.example.com{self.artist.get_url()}"
+        )
+
+    def test_song_change_invalidates_embedding_response(self):
+        url = reverse("api:retrieve_artist", kwargs={"id": self.artist.id})
+        self.client.get(url, {"include": "songs"})
+        self.song.title = "N.Y. State Of Mind (Remastered)"
+        self.song.save()
+        response = self.client.get(url, {"include": "songs"})
+
+        self.assertEqual(
+            response.json()["songs"]["items"][0]["title"],
+            "N.Y. State Of Mind (Remastered)",
+        )
+
+    def test_error_response_is_not_cached(self):
+        url = reverse("api:retrieve_song", kwargs={"id": self.song.id + 100})
+        self.client.get(url)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(RESPONSE_CACHE=True)
+class CacheStampedeTestCase(SimpleTestCase):
+    def setUp(self):
+        django_cache.clear()
+
+    def test_concurrent_misses_render_once(self):
+        calls = []
+
+        @cache.cache_response(models.Artist)
+        def view(request):
+            calls.append(request)
+            time.sleep(0.2)
+            return HttpResponse(b"[]", content_type="application/json")
+
+        responses = []
+        threads = [
+            threading.Thread(
+                target=lambda: responses.append(view(RequestFactory().get("/artists")))
+            )
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.content for response in responses], [b"[]"] * 5)
+
+    def test_waiting_request_renders_after_failed_render(self):
+        @cache.cache_response(models.Artist)
+        def view(request):
+            return HttpResponse(b"{}", content_type="application/json", status=404)
+
+        request = RequestFactory().get("/artists")
+        key = cache.get_response_key(request, (models.Artist,))
+        django_cache.add(f"avalon:lock:{key}", True)
+        threading.Timer(0.1, django_cache.delete, [f"avalon:lock:{key}"]).start()
+
+        self.assertEqual(view(request).status_code, 404)
+
+
+@override_settings(RESPONSE_CACHE=True)
+class ConditionalResponseTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        django_cache.clear()
+        self.album = util.bulk_create_albums(
+            [
+                {
+                    "title": "The Low End Theory",
+                    "artists": [{"name": "A Tribe Called Quest"}],
+                    "release_date": datetime.date(1991, 9, 24),
+                    "songs": [
+                        {
+                            "title": "Check The Rhime",
+                            "artists": [{"name": "A Tribe Called Quest"}],
+                            "track_number": 7,
+                            "length": 216,
+                            "path": "/atcq/the-low-end-theory/07.flac",
+                        }
+                    ],
+                }
+            ]
+        )[0]
+        self.song = self.album.song_set.get()
+        self.url = reverse("api:retrieve_song", kwargs={"id": self.song.id})
+
+    def test_response_has_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertTrue(response.has_header("ETag"))
+        self.assertFalse(response.has_header("Last-Modified"))
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_cached_response_is_revalidated_without_queries(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_uncached_response_is_revalidated_without_rendering(self):
+        etag = self.client.get(self.url)["ETag"]
+        django_cache.clear()
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_is_ignored(self):
+        self.client.get(self.url)
+        self.song.producers.add(models.Artist.objects.create(name="Q-Tip"))
+        response = self.client.get(
+            self.url, headers={"If-Modified-Since": http_date(time.time())}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b"Q-Tip", response.content)
+
+    def test_new_credit_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        self.song.producers.add(models.Artist.objects.create(name="Q-Tip"))
+        response = self.client.get(self.url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_artist_rename_changes_etag_of_songs(self):
+        etag = self.client.get(self.url)["ETag"]
+        artist = models.Artist.objects.get(name="A Tribe Called Quest")
+        artist.name = "Tribe Called Quest"
+        artist.save()
+
+        self.assertNotEqual(self.client.get(self.url)["ETag"], etag)
+
+    def test_embedded_song_change_changes_etag(self):
+        url = reverse("api:retrieve_album", kwargs={"id": self.album.id})
+        etag = self.client.get(url, {"include": "artists.songs"})["ETag"]
+        self.song.play_count = 10
+        self.song.save()
+
+        self.assertNotEqual(
+            self.client.get(url, {"include": "artists.songs"})["ETag"], etag
+        )
+
+    def test_list_etag_changes_when_song_is_deleted(self):
+        url = reverse("api:list_albums")
+        etag = self.client.get(url)["ETag"]
+        self.song.delete()
+
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+    def test_album_etag_changes_when_song_is_deleted(self):
+        url = reverse("api:retrieve_album", kwargs={"id": self.album.id})
+        etag = self.client.get(url)["ETag"]
+        self.song.delete()
+
+        self.assertNotEqual(self.client.get(url)["ETag"], etag)
+
+    def test_artist_etag_changes_with_credits_and_album_type(self):
+        artist = models.Artist.objects.create(name="Q-Tip")
+        url = reverse("api:retrieve_artist", kwargs={"id": artist.id})
+        etags = [self.client.get(url)["ETag"]]
+        self.song.producers.add(artist)
+        etags.append(self.client.get(url)["ETag"])
+        self.album.artists.add(artist)
+        etags.append(self.client.get(url)["ETag"])
+        models.Album.objects.filter(pk=self.album.pk).update(album_type="single")
+        signals.catalog_changed.send(sender=models.Album)
+        etags.append(self.client.get(url)["ETag"])
+
+        self.assertEqual(len(set(etags)), 4)
+
+    def test_list_is_validated_by_content(self):
+        url = reverse("api:list_songs")
+        etag = self.client.get(url)["ETag"]
+        django_cache.clear()
+
+        with self.assertNumQueries(4):
+            response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
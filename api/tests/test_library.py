@@ -0,0 +1,430 @@
+import datetime
+import os
+import shutil
+import tempfile
+from collections import Counter
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DataError, OperationalError
+from django.test import TestCase
+from mutagen.flac import FLAC
+
+from api import library, models, utilities as util
+from api.scanner import LibraryScanner
+from api.watcher import LibraryWatcher
+
+
+def create_flac(path: str, seconds: int = 240, **tags: str | list[str]) -> str:
+    """Create a FLAC file with no audio frames and the given tags.
+
+    Arguments:
+        path (str) -- The path of the file to create.
+        seconds (int) -- The duration recorded in the STREAMINFO block.
+        tags -- The Vorbis comments to write to the file.
+
+    Returns:
+        path (str) -- The path of the created file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sample_rate, channels, bit_depth = 44100, 2, 16
+    info = (
+        sample_rate << 44
+        | (channels - 1) << 41
+        | (bit_depth - 1) << 36
+        | sample_rate * seconds
+    )
+    with open(path, "wb") as file:
+        file.write(b"fLaC" + b"\x80" + (34).to_bytes(3, "big"))
+        file.write((4096).to_bytes(2, "big") * 2 + bytes(6))
+        file.write(info.to_bytes(8, "big") + bytes(16))
+
+    audio = FLAC(path)
+    audio.add_tags()
+    for key, value in tags.items():
+        audio[key] = value
+    audio.save()
+
+    return path
+
+
+class ReadTagsTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.path = create_flac(
+            os.path.join(self.root, "outkast", "aquemini", "02_return_of_the_g.flac"),
+            seconds=291,
+            title="Return Of The 'G'",
+            artist="OutKast",
+            album="Aquemini",
+            date="1998-09-29",
+            label="LaFace Records",
+            tracknumber="2/16",
+            producer=["Organized Noize", "OutKast"],
+        )
+
+    def test_read_tags_song_metadata(self):
+        song_data = library.read_tags(self.root, self.path)
+
+        self.assertEqual(song_data["title"], "Return Of The 'G'")
+        self.assertEqual(song_data["artists"], [{"name": "OutKast", "hometown": ""}])
+        self.assertEqual(
+            [producer["name"] for producer in song_data["producers"]],
+            ["Organized Noize", "OutKast"],
+        )
+        self.assertEqual(song_data["disc"], 1)
+        self.assertEqual(song_data["track_number"], 2)
+        self.assertEqual(song_data["length"], 291)
+
+    def test_read_tags_path_is_relative_to_library_root(self):
+        song_data = library.read_tags(self.root, self.path)
+
+        self.assertEqual(song_data["path"], "/outkast/aquemini/02_return_of_the_g.flac")
+
+    def test_read_tags_album_metadata(self):
+        album = library.read_tags(self.root, self.path)["album"]
+
+        self.assertEqual(album["title"], "Aquemini")
+        self.assertEqual(album["artists"], [{"name": "OutKast", "hometown": ""}])
+        self.assertEqual(album["release_date"], datetime.date(1998, 9, 29))
+        self.assertEqual(album["label"], "LaFace Records")
+        self.assertEqual(album["album_type"], "album")
+
+    def test_read_tags_multidisc_album(self):
+        audio = FLAC(self.path)
+        audio["discnumber"] = "2/2"
+        audio.save()
+        song_data = library.read_tags(self.root, self.path)
+
+        self.assertEqual(song_data["disc"], 2)
+        self.assertEqual(song_data["album"]["album_type"], "multidisc")
+
+    def test_read_tags_year_only_release_date(self):
+        audio = FLAC(self.path)
+        audio["date"] = "1998"
+        audio.save()
+        album = library.read_tags(self.root, self.path)["album"]
+
+        self.assertEqual(album["release_date"], datetime.date(1998, 1, 1))
+
+    def test_read_tags_without_required_tags(self):
+        audio = FLAC(self.path)
+        del audio["tracknumber"]
+        audio.save()
+
+        self.assertIsNone(library.read_tags(self.root, self.path))
+
+    def test_read_tags_from_file_that_is_not_audio(self):
+        path = os.path.join(self.root, "cover.flac")
+        with open(path, "wb") as file:
+            file.write(b"not a flac file")
+
+        self.assertIsNone(library.read_tags(self.root, path))
+
+    def test_read_file_that_fails_to_parse(self):
+        with mock.patch.object(library.probe, "probe_file", side_effect=IndexError):
+            self.assertEqual(library.read_file(self.root, self.path), (None, ""))
+
+
+class ScanLibraryTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        album = {
+            "artist": "OutKast",
+            "album": "ATLiens",
+            "date": "1996-08-27",
+            "label": "LaFace Records",
+        }
+        for track_number, title in enumerate(["You May Die", "Two Dope Boyz"], 1):
+            create_flac(
+                os.path.join(self.root, "outkast", "atliens", f"{track_number}.flac"),
+                title=title,
+                tracknumber=str(track_number),
+                **album,
+            )
+        create_flac(
+            os.path.join(self.root, "outkast", "atliens", "cover.jpg"), title="Cover"
+        )
+
+    def scan_library(self) -> str:
+        """Run the scan_library management command on the test library.
+
+        Returns:
+            output (str) -- The output of the command.
+        """
+        output = StringIO()
+        call_command("scan_library", self.root, workers=1, stdout=output)
+        return output.getvalue()
+
+    def test_scan_library_creates_album(self):
+        self.scan_library()
+        album = models.Album.objects.get(title="ATLiens")
+
+        self.assertEqual(album.release_date, datetime.date(1996, 8, 27))
+        self.assertEqual([artist.name for artist in album.artists.all()], ["OutKast"])
+
+    def test_scan_library_creates_songs(self):
+        self.scan_library()
+        songs = models.Song.objects.order_by("track_number")
+
+        self.assertEqual(
+            [song.title for song in songs], ["You May Die", "Two Dope Boyz"]
+        )
+        self.assertEqual(songs[0].path, "/outkast/atliens/1.flac")
+
+    def test_scan_library_skips_songs_already_in_database(self):
+        self.scan_library()
+        output = self.scan_library()
+
+        self.assertEqual(models.Song.objects.count(), 2)
+        self.assertIn("Added 0 songs", output)
+        self.assertIn("left 2 unchanged", output)
+
+    def test_scan_library_adds_songs_to_existing_album(self):
+        self.scan_library()
+        create_flac(
+            os.path.join(self.root, "outkast", "atliens", "3.flac"),
+            title="Babylon",
+            artist="OutKast",
+            album="atliens",
+            date="1996-08-27",
+            tracknumber="3",
+        )
+        self.scan_library()
+
+        self.assertEqual(models.Album.objects.count(), 1)
+        self.assertEqual(models.Song.objects.count(), 3)
+
+
+class LibraryScannerTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.directory = os.path.join(self.root, "ugk", "ridin-dirty")
+        self.tags = {
+            "artist": "UGK",
+            "album": "Ridin' Dirty",
+            "date": "1996-07-30",
+        }
+        for track_number, title in enumerate(["Intro", "One Day", "Murder"], 1):
+            create_flac(
+                os.path.join(self.directory, f"{track_number}.flac"),
+                title=title,
+                tracknumber=str(track_number),
+                **self.tags,
+            )
+        self.scanner = LibraryScanner(self.root, stderr=StringIO())
+        self.scanner.scan()
+
+    def test_scan_stores_file_state(self):
+        song = models.Song.objects.get(title="One Day")
+        stat = os.stat(os.path.join(self.directory, "2.flac"))
+
+        self.assertEqual(song.file_size, stat.st_size)
+        self.assertEqual(song.file_mtime, stat.st_mtime_ns)
+        self.assertEqual(song.file_inode, stat.st_ino)
+        self.assertEqual(song.file_hash, library.hash_file(song_path(self.root, song)))
+
+    def test_scan_stores_stream_properties(self):
+        song = models.Song.objects.get(title="One Day")
+
+        self.assertEqual(song.length, 240)
+        self.assertEqual(song.sample_rate, 44100)
+        self.assertEqual(song.bit_depth, 16)
+        self.assertEqual(song.channels, 2)
+
+    def test_rescan_does_not_read_unchanged_files(self):
+        with mock.patch.object(library, "read_file") as read_file:
+            counts = self.scanner.scan()
+
+        read_file.assert_not_called()
+        self.assertEqual(counts["unchanged"], 3)
+
+    def test_rescan_updates_changed_file_in_place(self):
+        song = models.Song.objects.get(title="Murder")
+        song.play_count = 5
+        song.save()
+        audio = FLAC(os.path.join(self.directory, "3.flac"))
+        audio["title"] = "Murder (Remix)"
+        audio["artist"] = ["UGK", "Big Mike"]
+        audio.save()
+        counts = self.scanner.scan()
+        song = models.Song.objects.get(pk=song.id)
+
+        self.assertEqual(counts["updated"], 1)
+        self.assertEqual(song.title, "Murder (Remix)")
+        self.assertEqual(song.play_count, 5)
+        self.assertEqual(
+            [feature.artist.name for feature in song.songartist_set.all()],
+            ["UGK", "Big Mike"],
+        )
+
+    def test_rescan_moves_renamed_file_in_place(self):
+        song = models.Song.objects.get(title="One Day")
+        song.play_count = 12
+        song.save()
+        os.rename(
+            os.path.join(self.directory, "2.flac"),
+            os.path.join(self.directory, "02_one_day.flac"),
+        )
+        counts = self.scanner.scan()
+        song = models.Song.objects.get(pk=song.id)
+
+        self.assertEqual(counts["moved"], 1)
+        self.assertEqual(counts["deleted"], 0)
+        self.assertEqual(song.path, "/ugk/ridin-dirty/02_one_day.flac")
+        self.assertEqual(song.play_count, 12)
+
+    def test_rescan_moves_copied_file_by_content_hash(self):
+        song = models.Song.objects.get(title="One Day")
+        source = os.path.join(self.directory, "2.flac")
+        shutil.copy(source, os.path.join(self.directory, "02_one_day.flac"))
+        os.remove(source)
+        counts = self.scanner.scan()
+
+        self.assertEqual(counts["moved"], 1)
+        self.assertEqual(
+            models.Song.objects.get(pk=song.id).path, "/ugk/ridin-dirty/02_one_day.flac"
+        )
+
+    def test_rescan_deletes_songs_of_deleted_files(self):
+        shutil.rmtree(self.directory)
+        os.makedirs(os.path.join(self.root, "ugk"), exist_ok=True)
+        counts = self.scanner.scan()
+
+        self.assertEqual(counts["deleted"], 3)
+        self.assertEqual(models.Song.objects.count(), 0)
+        self.assertEqual(models.Album.objects.count(), 0)
+
+    def test_rescan_of_paths_leaves_other_songs_alone(self):
+        os.remove(os.path.join(self.directory, "1.flac"))
+        counts = self.scanner.scan([os.path.join(self.directory, "2.flac")])
+
+        self.assertEqual(counts["deleted"], 0)
+        self.assertEqual(counts["unchanged"], 1)
+        self.assertEqual(models.Song.objects.count(), 3)
+
+    def test_full_rescan_reads_every_file(self):
+        counts = self.scanner.scan(full=True)
+
+        self.assertEqual(counts["updated"], 3)
+
+    def test_scan_skips_songs_that_cannot_be_written(self):
+        for track_number, title in [(4, "Diamonds & Wood"), (5, "Hi-Life")]:
+            create_flac(
+                os.path.join(self.directory, f"{track_number}.flac"),
+                title=title,
+                tracknumber=str(track_number),
+                **self.tags,
+            )
+        import_songs = util.import_songs
+
+        def fail_on_track_4(song_data):
+            if any(data["track_number"] == 4 for data in song_data):
+                raise DataError("value out of range")
+            return import_songs(song_data)
+
+        with mock.patch.object(util, "import_songs", side_effect=fail_on_track_4):
+            counts = self.scanner.scan()
+
+        self.assertEqual(counts["failed"], 1)
+        self.assertEqual(counts["added"], 1)
+        self.assertTrue(models.Song.objects.filter(title="Hi-Life").exists())
+        self.assertIn("4.flac: value out of range", self.scanner.stderr.getvalue())
+
+
+class LibraryWatcherTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.directory = os.path.join(self.root, "three-6-mafia", "mystic-stylez")
+        os.makedirs(self.directory)
+        self.watcher = LibraryWatcher(
+            LibraryScanner(self.root, stderr=StringIO()), debounce=0.05, max_delay=0.5
+        )
+        self.addCleanup(self.watcher.close)
+
+    def create_song(self, track_number: int, title: str) -> str:
+        """Create an audio file for a song on Mystic Stylez.
+
+        Returns:
+            path (str) -- The path of the created file.
+        """
+        return create_flac(
+            os.path.join(self.directory, f"{track_number}.flac"),
+            title=title,
+            artist="Three 6 Mafia",
+            album="Mystic Stylez",
+            date="1995-05-30",
+            tracknumber=str(track_number),
+        )
+
+    def wait_for_scan(self) -> Counter:
+        """Poll the watcher until it synchronizes pending changes.
+
+        Returns:
+            counts (Counter) -- The counts returned by the scan.
+        """
+        for _ in range(50):
+            counts = self.watcher.poll()
+            if counts is not None:
+                return counts
+        self.fail("The watcher did not synchronize any changes.")
+
+    def test_watcher_coalesces_new_files_into_one_scan(self):
+        self.create_song(1, "Da Summa")
+        self.create_song(2, "Tear Da Club Up")
+        counts = self.wait_for_scan()
+
+        self.assertEqual(counts["added"], 2)
+        self.assertEqual(models.Album.objects.get().title, "Mystic Stylez")
+
+    def test_watcher_moves_renamed_file(self):
+        path = self.create_song(1, "Da Summa")
+        self.wait_for_scan()
+        song = models.Song.objects.get(title="Da Summa")
+        os.rename(path, os.path.join(self.directory, "01_da_summa.flac"))
+        counts = self.wait_for_scan()
+
+        self.assertEqual(counts["moved"], 1)
+        self.assertEqual(
+            models.Song.objects.get(pk=song.id).path,
+            "/three-6-mafia/mystic-stylez/01_da_summa.flac",
+        )
+
+    def test_watcher_deletes_songs_of_deleted_directory(self):
+        self.create_song(1, "Da Summa")
+        self.wait_for_scan()
+        shutil.rmtree(self.directory)
+        counts = self.wait_for_scan()
+
+        self.assertEqual(counts["deleted"], 1)
+        self.assertEqual(models.Album.objects.count(), 0)
+
+    def test_watcher_watches_new_directories(self):
+        self.directory = os.path.join(self.root, "three-6-mafia", "chapter-1")
+        os.makedirs(self.directory)
+        self.wait_for_scan()
+        self.create_song(1, "Da Summa")
+        counts = self.wait_for_scan()
+
+        self.assertEqual(counts["added"], 1)
+
+    def test_watcher_retries_changes_after_database_error(self):
+        self.create_song(1, "Da Summa")
+        with mock.patch.object(
+            self.watcher.scanner, "find_songs", side_effect=OperationalError
+        ):
+            with self.assertRaises(OperationalError):
+                self.wait_for_scan()
+        counts = self.wait_for_scan()
+
+        self.assertEqual(counts["added"], 1)
+
+
+def song_path(root: str, song: models.Song) -> str:
+    """Return the path of the audio file of a song in a test library."""
+    return os.path.join(root, song.path.lstrip("/"))
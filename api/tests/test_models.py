@@ -1,7 +1,7 @@
 import datetime
 
 from django.test import TestCase
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
 
 from api import models
 
@@ -292,6 +292,27 @@ class SongModelTestCase(TestCase):
     def test_song_creation_successful_length(self):
         self.assertEqual(self.regulate.length, 251)
 
+    def test_song_creation_copies_album_release_date(self):
+        self.assertEqual(self.regulate.release_date, self.above_the_rim.release_date)
+
+    def test_album_release_date_change_updates_songs(self):
+        self.above_the_rim.release_date = datetime.date(1994, 3, 1)
+        self.above_the_rim.save()
+        self.regulate.refresh_from_db()
+
+        self.assertEqual(self.regulate.release_date, datetime.date(1994, 3, 1))
+
+    def test_songs_default_ordering_uses_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            cursor.execute(
+                f"EXPLAIN {models.Song.objects.order_by(*models.Song._meta.ordering, "id")[:10].query}"
+            )
+            plan = "\n".join(row[0] for row in cursor.fetchall())
+
+        self.assertIn("song_default_ordering", plan)
+        self.assertNotIn("Sort", plan)
+
     def test_song_creation_successful_path(self):
         self.assertEqual(
             self.regulate.path,
@@ -581,3 +602,32 @@ class SongProducerModelTestCase(TestCase):
         ]
 
         self.assertEqual(song_producers, expected_song_producer_order)
+
+
+class TimestampTestCase(TestCase):
+    def setUp(self):
+        self.artist = models.Artist.objects.create(name="Mobb Deep")
+        self.album = models.Album.objects.create(
+            title="The Infamous", release_date=datetime.date(1995, 4, 25)
+        )
+        self.album.artists.add(self.artist)
+        self.song = models.Song.objects.create(
+            title="Shook Ones, Pt. II",
+            album=self.album,
+            track_number=15,
+            length=325,
+            path="/mobb-deep/the-infamous/15_shook_ones_pt_ii.flac",
+        )
+
+    def get_updated_at(self, instance: models.models.Model) -> datetime.datetime:
+        return (
+            type(instance)
+            .objects.values_list("updated_at", flat=True)
+            .get(pk=instance.pk)
+        )
+
+    def test_bulk_update_sets_updated_at(self):
+        updated_at = self.get_updated_at(self.song)
+        models.Song.objects.filter(pk=self.song.pk).update(play_count=1)
+
+        self.assertGreater(self.get_updated_at(self.song), updated_at)
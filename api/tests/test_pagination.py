@@ -0,0 +1,118 @@
+import datetime
+
+from django.db import connection
+from django.test import TestCase
+
+from api import models
+from api.pagination import (
+    InvalidCursor,
+    decode_cursor,
+    encode_cursor,
+    paginate_keyset,
+    seek,
+)
+
+
+class PaginateKeysetTestCase(TestCase):
+    def setUp(self):
+        self.ordering = tuple(models.Song._meta.ordering)
+        albums = [
+            models.Album.objects.create(title=title, release_date=release_date)
+            for title, release_date in [
+                ("Supreme Clientele", datetime.date(2000, 2, 8)),
+                ("Ironman", datetime.date(1996, 10, 29)),
+            ]
+        ]
+        for album in albums:
+            for disc, track_number, play_count in [(1, 1, 3), (1, 2, 0), (2, 1, 0)]:
+                models.Song.objects.create(
+                    title=f"{album.title} {disc}-{track_number}",
+                    album=album,
+                    disc=disc,
+                    track_number=track_number,
+                    length=200,
+                    play_count=play_count,
+                    path=f"/ghostface/{album.id}/{disc}-{track_number}.flac",
+                )
+
+    def paginate(self, limit: int) -> list[list[str]]:
+        """Return the titles of the songs on every page."""
+        pages, cursor = [], None
+        while True:
+            items, cursor = paginate_keyset(
+                models.Song.objects.all(), self.ordering, cursor, limit
+            )
+            pages.append([song.title for song in items])
+            if cursor is None:
+                return pages
+
+    def test_pages_follow_ordering(self):
+        pages = self.paginate(limit=2)
+
+        self.assertEqual(
+            pages,
+            [
+                ["Supreme Clientele 1-1", "Ironman 1-1"],
+                ["Supreme Clientele 1-2", "Supreme Clientele 2-1"],
+                ["Ironman 1-2", "Ironman 2-1"],
+            ],
+        )
+
+    def test_pages_match_offset_pagination_for_every_limit(self):
+        songs = [song.title for song in models.Song.objects.order_by(*self.ordering)]
+
+        for limit in range(1, 8):
+            pages = self.paginate(limit)
+            self.assertEqual([title for page in pages for title in page], songs)
+
+    def test_ties_are_broken_by_id(self):
+        models.Song.objects.update(play_count=0, release_date=datetime.date(2000, 2, 8))
+        songs = list(models.Song.objects.order_by(*self.ordering, "id"))
+
+        pages = self.paginate(limit=1)
+
+        self.assertEqual([page[0] for page in pages], [song.title for song in songs])
+
+    def test_songs_added_before_cursor_are_not_repeated(self):
+        first_page, cursor = paginate_keyset(
+            models.Song.objects.all(), self.ordering, None, 2
+        )
+        models.Song.objects.filter(title="Ironman 2-1").update(play_count=5)
+        second_page, _ = paginate_keyset(
+            models.Song.objects.all(), self.ordering, cursor, 2
+        )
+
+        self.assertNotIn("Ironman 2-1", [song.title for song in second_page])
+        self.assertFalse(set(first_page) & set(second_page))
+
+    def test_cursor_bounds_index_scan(self):
+        _, cursor = paginate_keyset(models.Song.objects.all(), self.ordering, None, 2)
+        # Plan the query as for a large table, which is read in order from
+        # the index rather than sorted.
+        with connection.cursor() as db:
+            db.execute("SET enable_seqscan = off; SET enable_bitmapscan = off")
+        self.addCleanup(
+            lambda: connection.cursor().execute(
+                "RESET enable_seqscan; RESET enable_bitmapscan"
+            )
+        )
+
+        plan = (
+            models.Song.objects.filter(
+                seek([*self.ordering, "id"], decode_cursor(cursor, 5))
+            )
+            .order_by(*self.ordering, "id")
+            .explain()
+        )
+
+        self.assertIn("Index Scan using song_default_ordering", plan)
+        self.assertIn("Index Cond: (play_count <=", plan)
+
+    def test_invalid_cursors(self):
+        for cursor in [
+            "not-a-cursor",
+            encode_cursor([1, 2]),
+            encode_cursor(["three", "2000-02-08", 1, 1, 1]),
+        ]:
+            with self.assertRaises(InvalidCursor):
+                paginate_keyset(models.Song.objects.all(), self.ordering, cursor, 2)
@@ -0,0 +1,269 @@
+import os
+import shutil
+import struct
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api import models, probe
+from api.tests.test_library import create_flac
+
+
+def create_mp3(path: str, frames: int, vbr: bool = False) -> str:
+    """Create an MPEG-1 Layer III file of silent 128 kbps frames.
+
+    Arguments:
+        path (str) -- The path of the file to create.
+        frames (int) -- The number of audio frames.
+        vbr (bool) -- Whether to start the stream with a Xing header
+        holding the frame count.
+
+    Returns:
+        path (str) -- The path of the created file.
+    """
+    header = bytes([0xFF, 0xFB, 0x90, 0x40])  # 128 kbps, 44.1 kHz, stereo
+    frame = header + bytes(144 * 128000 // 44100 - 4)
+    with open(path, "wb") as file:
+        file.write(b"ID3\x03\x00\x00\x00\x00\x00\x0a" + bytes(10))
+        if vbr:
+            xing = b"Xing" + struct.pack(">III", 3, frames, frames * len(frame))
+            file.write(header + bytes(32) + xing + bytes(len(frame) - 52))
+        file.write(frame * frames)
+
+    return path
+
+
+def create_mp4(path: str, seconds: int, codec: bytes = b"mp4a") -> str:
+    """Create an MP4 file with one audio track and an empty mdat box.
+
+    Arguments:
+        path (str) -- The path of the file to create.
+        seconds (int) -- The duration recorded in the mvhd box.
+        codec (bytes) -- The format of the audio sample entry.
+
+    Returns:
+        path (str) -- The path of the created file.
+    """
+
+    def box(kind: bytes, payload: bytes) -> bytes:
+        return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+    mvhd = box(b"mvhd", bytes(12) + struct.pack(">II", 1000, seconds * 1000))
+    entry = box(
+        codec,
+        bytes(6)
+        + struct.pack(">H", 1)
+        + bytes(8)
+        + struct.pack(">HHHHI", 2, 16, 0, 0, 44100 << 16),
+    )
+    stsd = box(b"stsd", struct.pack(">II", 0, 1) + entry)
+    hdlr = box(b"hdlr", bytes(8) + b"soun" + bytes(12))
+    minf = box(b"minf", box(b"stbl", stsd))
+    trak = box(b"trak", box(b"mdia", hdlr + minf))
+    with open(path, "wb") as file:
+        file.write(box(b"ftyp", b"M4A \x00\x00\x00\x00M4A "))
+        file.write(box(b"moov", mvhd + trak))
+        file.write(box(b"mdat", bytes(seconds * 32000)))
+
+    return path
+
+
+def create_opus(path: str, seconds: int) -> str:
+    """Create an Ogg Opus file with a header page and one audio page.
+
+    Arguments:
+        path (str) -- The path of the file to create.
+        seconds (int) -- The duration recorded in the last granule
+        position.
+
+    Returns:
+        path (str) -- The path of the created file.
+    """
+
+    def page(packet: bytes, granule: int, sequence: int) -> bytes:
+        header = struct.pack("<qIII", granule, 1, sequence, 0)
+        return b"OggS\x00\x00" + header + bytes([1, len(packet)]) + packet
+
+    head = b"OpusHead\x01\x02" + struct.pack("<HIhB", 312, 44100, 0, 0)
+    with open(path, "wb") as file:
+        file.write(page(head, 0, 0))
+        file.write(page(bytes(100), seconds * 48000 + 312, 1))
+
+    return path
+
+
+class ProbeFileTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def test_probe_flac(self):
+        path = create_flac(os.path.join(self.root, "a.flac"), seconds=291)
+
+        self.assertEqual(
+            probe.probe_file(path),
+            {
+                "length": 291,
+                "sample_rate": 44100,
+                "bit_depth": 16,
+                "channels": 2,
+                "bitrate": 0,
+            },
+        )
+
+    def test_probe_cbr_mp3(self):
+        path = create_mp3(os.path.join(self.root, "a.mp3"), frames=1000)
+
+        self.assertEqual(
+            probe.probe_file(path),
+            {
+                "length": 26,
+                "sample_rate": 44100,
+                "bit_depth": None,
+                "channels": 2,
+                "bitrate": 128,
+            },
+        )
+
+    def test_probe_vbr_mp3_reads_frame_count_from_xing_header(self):
+        path = create_mp3(os.path.join(self.root, "a.mp3"), frames=10000, vbr=True)
+        with open(path, "r+b") as file:
+            file.truncate(50000)  # The size must not matter.
+
+        self.assertEqual(probe.probe_file(path)["length"], 261)
+
+    def test_probe_mp4(self):
+        path = create_mp4(os.path.join(self.root, "a.m4a"), seconds=200)
+
+        self.assertEqual(
+            probe.probe_file(path),
+            {
+                "length": 200,
+                "sample_rate": 44100,
+                "bit_depth": None,
+                "channels": 2,
+                "bitrate": 256,
+            },
+        )
+
+    def test_probe_lossless_mp4_has_bit_depth(self):
+        path = create_mp4(os.path.join(self.root, "a.m4a"), 200, codec=b"alac")
+
+        self.assertEqual(probe.probe_file(path)["bit_depth"], 16)
+
+    def test_probe_opus(self):
+        path = create_opus(os.path.join(self.root, "a.opus"), seconds=180)
+        properties = probe.probe_file(path)
+
+        self.assertEqual(properties["length"], 180)
+        self.assertEqual(properties["sample_rate"], 48000)
+        self.assertEqual(properties["channels"], 2)
+
+    def test_probe_headers_with_zero_rate(self):
+        mp4 = create_mp4(os.path.join(self.root, "a.m4a"), seconds=200)
+        with open(mp4, "r+b") as file:
+            offset = file.read().index(b"mvhd")
+            file.seek(offset + 16)
+            file.write(bytes(4))
+        vorbis = os.path.join(self.root, "a.ogg")
+        packet = b"\x01vorbis" + bytes(4) + b"\x02" + bytes(4) + bytes(16)
+        with open(vorbis, "wb") as file:
+            header = struct.pack("<qIII", 48000, 1, 0, 0)
+            file.write(b"OggS\x00\x02" + header + bytes([1, len(packet)]) + packet)
+
+        self.assertIsNone(probe.probe_file(mp4))
+        self.assertIsNone(probe.probe_file(vorbis))
+
+    def test_probe_file_that_is_not_audio(self):
+        path = os.path.join(self.root, "cover.flac")
+        with open(path, "wb") as file:
+            file.write(b"not audio" * 100)
+
+        self.assertIsNone(probe.probe_file(path))
+
+    def test_probe_truncated_and_empty_files(self):
+        path = create_flac(os.path.join(self.root, "a.flac"))
+        with open(path, "r+b") as file:
+            file.truncate(20)
+        open(os.path.join(self.root, "b.flac"), "wb").close()
+
+        self.assertIsNone(probe.probe_file(path))
+        self.assertIsNone(probe.probe_file(os.path.join(self.root, "b.flac")))
+
+    def test_probe_file_that_does_not_exist(self):
+        self.assertIsNone(probe.probe_file(os.path.join(self.root, "a.flac")))
+
+    def test_probe_file_out_of_range(self):
+        path = create_flac(os.path.join(self.root, "a.flac"), seconds=40000)
+
+        self.assertIsNone(probe.probe_file(path))
+
+
+class ProbeLibraryTestCase(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        album = models.Album.objects.create(title="Illmatic", release_date="1994-04-19")
+        for track_number, title in enumerate(["The Genesis", "N.Y. State Of Mind"], 1):
+            models.Song.objects.create(
+                title=title,
+                album=album,
+                track_number=track_number,
+                length=1,
+                path=f"/nas/illmatic/{track_number:02}.flac",
+            )
+        create_flac(os.path.join(self.root, "nas", "illmatic", "01.flac"), 105)
+        create_flac(os.path.join(self.root, "nas", "illmatic", "02.flac"), 294)
+
+    def call_command(self, *args: str) -> str:
+        stdout = StringIO()
+        call_command(
+            "probe_library", self.root, *args, stdout=stdout, stderr=StringIO()
+        )
+        return stdout.getvalue()
+
+    def test_probe_library_fills_length_and_stream_properties(self):
+        self.call_command()
+        song = models.Song.objects.get(title="N.Y. State Of Mind")
+
+        self.assertEqual(song.length, 294)
+        self.assertEqual(song.sample_rate, 44100)
+        self.assertEqual(song.bit_depth, 16)
+        self.assertEqual(song.channels, 2)
+
+    def test_probe_library_skips_songs_already_probed(self):
+        self.call_command()
+        models.Song.objects.update(length=1)
+        self.call_command()
+
+        self.assertEqual(models.Song.objects.filter(length=1).count(), 2)
+
+    def test_probe_library_all_probes_songs_again(self):
+        self.call_command()
+        models.Song.objects.update(length=1)
+        self.call_command("--all")
+
+        self.assertFalse(models.Song.objects.filter(length=1).exists())
+
+    def test_probe_library_reports_missing_files(self):
+        os.remove(os.path.join(self.root, "nas", "illmatic", "01.flac"))
+        output = self.call_command()
+
+        self.assertIn("Probed 1 songs. Could not probe 1 files.", output)
+
+    def test_probe_library_reports_batches_it_cannot_write(self):
+        properties = {
+            "length": 40000,
+            "sample_rate": 44100,
+            "bit_depth": 16,
+            "channels": 2,
+            "bitrate": 0,
+        }
+        with mock.patch.object(probe, "probe_file", return_value=properties):
+            output = self.call_command("--batch-size", "1")
+
+        self.assertIn("Probed 0 songs. Could not probe 2 files.", output)
+        self.assertFalse(models.Song.objects.exclude(length=1).exists())
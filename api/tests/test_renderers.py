@@ -0,0 +1,38 @@
+import datetime
+import decimal
+import json
+
+from django.test import RequestFactory, SimpleTestCase
+from ninja.renderers import JSONRenderer
+
+from api import schema
+from api.renderers import ORJSONRenderer
+
+
+class ORJSONRendererTestCase(SimpleTestCase):
+    def render(self, renderer, data) -> object:
+        request = RequestFactory().get("/")
+        return json.loads(renderer.render(request, data, response_status=200))
+
+    def test_values_match_default_renderer(self):
+        data = {
+            "release_date": datetime.date(1998, 9, 29),
+            "updated_at": datetime.datetime(2024, 11, 5, 12, 30, tzinfo=datetime.UTC),
+            "length": decimal.Decimal("251.5"),
+            "error": schema.Error(error="Album with id = 1 does not exist."),
+            "title": "Aquemini",
+        }
+
+        self.assertEqual(
+            self.render(ORJSONRenderer(), data), self.render(JSONRenderer(), data)
+        )
+
+    def test_output_is_compact_utf8(self):
+        request = RequestFactory().get("/")
+
+        self.assertEqual(
+            ORJSONRenderer().render(
+                request, {"name": "Beyoncé", "ids": [1, 2]}, response_status=200
+            ),
+            '{"name":"Beyoncé","ids":[1,2]}'.encode(),
+        )
@@ -0,0 +1,110 @@
+import datetime
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from api import models, signals, utilities as util
+
+
+class SearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+        util.bulk_create_albums(
+            [
+                {
+                    "title": "Lemonade",
+                    "artists": [{"name": "Beyoncé"}],
+                    "release_date": datetime.date(2016, 4, 23),
+                    "label": "Parkwood Entertainment",
+                    "songs": [
+                        {
+                            "title": "Formation",
+                            "artists": [{"name": "Beyoncé"}],
+                            "track_number": 12,
+                            "length": 206,
+                            "path": "/beyonce/lemonade/12.flac",
+                        },
+                        {
+                            "title": "Hold Up",
+                            "artists": [{"name": "Beyoncé"}],
+                            "track_number": 2,
+                            "length": 221,
+                            "path": "/beyonce/lemonade/02.flac",
+                        },
+                    ],
+                },
+                {
+                    "title": "Hold On, We're Going Home",
+                    "artists": [{"name": "Drake"}],
+                    "release_date": datetime.date(2013, 8, 7),
+                    "label": "OVO Sound",
+                    "album_type": "single",
+                    "songs": [
+                        {
+                            "title": "Hold On, We're Going Home",
+                            "artists": [{"name": "Drake"}],
+                            "track_number": 1,
+                            "length": 228,
+                            "path": "/drake/hold-on/01.flac",
+                        },
+                    ],
+                },
+            ]
+        )
+
+    def search(self, **params) -> dict:
+        response = self.client.get(reverse("api:search"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_results_grouped_by_type(self):
+        results = self.search(q="lemonade")
+
+        self.assertEqual(list(results), ["artists", "albums", "songs"])
+        self.assertEqual([album["title"] for album in results["albums"]], ["Lemonade"])
+        self.assertEqual(results["artists"], [])
+        self.assertEqual(results["songs"], [])
+
+    def test_match_regardless_of_case_and_accents(self):
+        results = self.search(q="BEYONCE")
+
+        self.assertEqual([artist["name"] for artist in results["artists"]], ["Beyoncé"])
+        self.assertEqual(results["artists"][0]["songs"]["count"], 2)
+
+    def test_match_album_label(self):
+        results = self.search(q="parkwood")
+
+        self.assertEqual([album["title"] for album in results["albums"]], ["Lemonade"])
+
+    def test_websearch_syntax(self):
+        results = self.search(q="hold -home")
+
+        self.assertEqual([song["title"] for song in results["songs"]], ["Hold Up"])
+
+    def test_rank_weighted_by_play_count(self):
+        # Both titles match "hold" equally well, so the more played song,
+        # added after the other, ranks first.
+        models.Song.objects.filter(title__startswith="Hold On").update(play_count=50)
+        signals.catalog_changed.send(sender=models.Song)
+
+        self.assertEqual(
+            [song["title"] for song in self.search(q="hold")["songs"]],
+            ["Hold On, We're Going Home", "Hold Up"],
+        )
+
+    def test_limit_per_type(self):
+        results = self.search(q="hold", limit=1)
+
+        self.assertEqual(len(results["songs"]), 1)
+        self.assertEqual(len(results["albums"]), 1)
+
+    def test_fixed_number_of_queries(self):
+        with self.assertNumQueries(7):
+            self.client.get(reverse("api:search"), {"q": "home"})
+
+    def test_invalid_parameters(self):
+        for params in ({}, {"q": ""}, {"q": "hold", "limit": 51}):
+            response = self.client.get(reverse("api:search"), params)
+
+            self.assertEqual(response.status_code, 422)
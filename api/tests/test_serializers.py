@@ -0,0 +1,166 @@
+import datetime
+import json
+
+from django.test import RequestFactory, TestCase
+from ninja.responses import NinjaJSONEncoder
+
+from api import models, renderers, schema, serializers, utilities as util
+from api.serializers import InvalidFields
+
+
+class SerializerTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        util.bulk_create_albums(
+            [
+                {
+                    "title": "Mm..Food",
+                    "artists": [{"name": "MF DOOM"}],
+                    "release_date": datetime.date(2004, 11, 16),
+                    "label": "Rhymesayers Entertainment",
+                    "songs": [
+                        {
+                            "title": "Beef Rapp",
+                            "artists": [{"name": "MF DOOM"}],
+                            "producers": [{"name": "MF DOOM"}],
+                            "track_number": 1,
+                            "length": 279,
+                            "path": "/mf-doom/mm-food/01.flac",
+                        },
+                        {
+                            "title": "Rapp Snitch Knishes",
+                            "artists": [
+                                {"name": "MF DOOM"},
+                                {"name": "Mr. Fantastik"},
+                            ],
+                            "producers": [{"name": "MF DOOM"}],
+                            "track_number": 12,
+                            "length": 172,
+                            "path": "/mf-doom/mm-food/12.flac",
+                        },
+                    ],
+                },
+                {
+                    "title": "Madvillainy",
+                    "artists": [{"name": "Madlib"}, {"name": "MF DOOM"}],
+                    "release_date": datetime.date(2004, 3, 23),
+                    "songs": [
+                        {
+                            "title": "Accordion",
+                            "artists": [{"name": "Madvillain"}],
+                            "group_members": [{"name": "Madlib"}, {"name": "MF DOOM"}],
+                            "producers": [{"name": "Madlib"}],
+                            "track_number": 2,
+                            "length": 119,
+                            "path": "/madvillain/madvillainy/02.flac",
+                        }
+                    ],
+                },
+            ]
+        )
+
+    def setUp(self):
+        self.request = RequestFactory().get("/")
+
+    def assertSameJSON(self, rows, serialize, objects, schema_class):
+        """Assert that the fast path renders rows to the same bytes as the
+        schema renders the model instances."""
+        context = {"request": self.request}
+        expected = [
+            schema_class.from_orm(obj, context=context).model_dump() for obj in objects
+        ]
+
+        self.assertEqual(
+            json.dumps(serialize(self.request, list(rows)), cls=NinjaJSONEncoder),
+            json.dumps(expected, cls=NinjaJSONEncoder),
+        )
+
+    def test_serialize_artists(self):
+        artists = models.Artist.objects.with_previews()
+
+        self.assertSameJSON(
+            artists.values(*serializers.get_columns(serializers.ARTIST_FIELDS)),
+            serializers.serialize_artists,
+            artists,
+            schema.ArtistOut,
+        )
+
+    def test_serialize_albums(self):
+        albums = models.Album.objects.with_tracklist()
+
+        self.assertSameJSON(
+            albums.prefetch_related(None).values(
+                *serializers.get_columns(serializers.ALBUM_FIELDS)
+            ),
+            serializers.serialize_albums,
+            albums,
+            schema.AlbumOut,
+        )
+
+    def test_serialize_basic_albums(self):
+        albums = models.Album.objects.prefetch_related("artists")
+
+        self.assertSameJSON(
+            albums.values(*serializers.get_columns(serializers.ALBUM_BASIC_FIELDS)),
+            lambda request, rows: serializers.serialize_albums(
+                request, rows, serializers.ALBUM_BASIC_FIELDS
+            ),
+            albums,
+            schema.AlbumOutBasic,
+        )
+
+    def test_serialize_songs(self):
+        songs = models.Song.objects.prefetch_related(
+            "album__artists", "artists", "producers", "songartist_set__artist"
+        )
+
+        self.assertSameJSON(
+            models.Song.objects.values(
+                *serializers.get_columns(serializers.SONG_FIELDS)
+            ),
+            serializers.serialize_songs,
+            songs,
+            schema.SongOut,
+        )
+
+    def test_dumps_matches_model_dump_json(self):
+        album = models.Album.objects.prefetch_related("artists").get(
+            title="Madvillainy"
+        )
+        row = models.Album.objects.values(
+            *serializers.get_columns(serializers.ALBUM_BASIC_FIELDS)
+        ).get(pk=album.id)
+
+        self.assertEqual(
+            renderers.dumps(
+                serializers.serialize_albums(
+                    self.request, [row], serializers.ALBUM_BASIC_FIELDS
+                )[0]
+            ),
+            schema.AlbumOutBasic.from_orm(album, context={"request": self.request})
+            .model_dump_json()
+            .encode(),
+        )
+
+    def test_serialize_songs_runs_fixed_number_of_queries(self):
+        rows = list(
+            models.Song.objects.values(
+                *serializers.get_columns(serializers.SONG_FIELDS)
+            )
+        )
+
+        with self.assertNumQueries(3):
+            serializers.serialize_songs(self.request, rows)
+
+    def test_serialize_selected_fields_in_schema_order(self):
+        fields = serializers.select_fields("url,title", serializers.SONG_FIELDS)
+        rows = list(models.Song.objects.values(*serializers.get_columns(fields)))
+
+        with self.assertNumQueries(0):
+            songs = serializers.serialize_songs(self.request, rows, fields)
+
+        self.assertEqual(list(songs[0]), ["title", "url"])
+
+    def test_select_unknown_field(self):
+        with self.assertRaises(InvalidFields):
+            serializers.select_fields("name,length", serializers.ARTIST_FIELDS)
@@ -0,0 +1,446 @@
+import datetime
+import json
+from typing import Any
+from unittest import mock
+
+from django.db import DataError
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from api import models, schema, utilities as util
+
+
+class IngestSongsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        album = {
+            "title": "Ready To Die",
+            "artists": [{"name": "The Notorious B.I.G.", "hometown": "New York, NY"}],
+            "release_date": "1994-09-13",
+            "label": "Bad Boy Records",
+        }
+        self.metadata = [
+            {
+                "title": title,
+                "artists": [{"name": "The Notorious B.I.G."}],
+                "producers": [{"name": producer}],
+                "track_number": track_number,
+                "length": length,
+                "path": f"/the-notorious-big/ready-to-die/{track_number:02}.flac",
+                "album": album,
+            }
+            for track_number, title, producer, length in [
+                (4, "Gimme The Loot", "Easy Mo Bee", 304),
+                (6, "Warning", "DJ Premier", 220),
+                (12, "Juicy", "Pete Rock", 302),
+            ]
+        ]
+
+    def send_post_request(
+        self, lines: list[Any], batch_size: int = 2
+    ) -> list[dict[str, Any]]:
+        """Send POST request to API endpoint that ingests songs.
+
+        Arguments:
+            lines (list) -- The lines of the request body. Dictionaries
+            are encoded as JSON and strings are sent as is.
+            batch_size (int) -- The number of songs per batch.
+
+        Returns:
+            The decoded lines of the streamed response.
+        """
+        body = "\n".join(
+            line if isinstance(line, str) else json.dumps(line) for line in lines
+        )
+        response = self.client.post(
+            f"{reverse("api:ingest_songs")}?batch_size={batch_size}",
+            data=body,
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        return [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+
+    def test_ingest_songs_creates_songs_and_album(self):
+        self.send_post_request(self.metadata)
+        album = models.Album.objects.get(title="Ready To Die")
+
+        self.assertEqual(album.song_set.count(), 3)
+        self.assertEqual(
+            [artist.name for artist in album.artists.all()], ["The Notorious B.I.G."]
+        )
+
+    def test_ingest_songs_reports_progress_per_batch(self):
+        progress = self.send_post_request(self.metadata)
+
+        self.assertEqual(
+            progress,
+            [
+                {"batch": 1, "lines": [1, 2], "created": 2, "skipped": 0},
+                {"batch": 2, "lines": [3, 3], "created": 1, "skipped": 0},
+            ],
+        )
+
+    def test_ingest_songs_reports_invalid_lines(self):
+        del self.metadata[1]["length"]
+        progress = self.send_post_request([*self.metadata, "{not json"])
+
+        self.assertEqual(progress[0]["line"], 2)
+        self.assertIn("length", progress[0]["error"])
+        self.assertEqual(progress[1]["created"], 2)
+        self.assertEqual(progress[2]["line"], 4)
+        self.assertEqual(models.Song.objects.count(), 2)
+
+    def test_ingest_songs_can_be_resumed(self):
+        self.send_post_request(self.metadata[:2])
+        progress = self.send_post_request(self.metadata)
+
+        self.assertEqual(progress[0]["skipped"], 2)
+        self.assertEqual(progress[1]["created"], 1)
+        self.assertEqual(models.Song.objects.count(), 3)
+
+    def test_ingest_songs_rolls_back_failed_batch(self):
+        self.metadata[1]["track_number"] = 4
+        progress = self.send_post_request(self.metadata)
+
+        self.assertIn("duplicate_track_number", progress[0]["error"])
+        self.assertEqual(progress[1]["created"], 1)
+        self.assertEqual(
+            list(models.Song.objects.values_list("title", flat=True)), ["Juicy"]
+        )
+
+    def test_ingest_songs_rejects_values_out_of_range(self):
+        self.metadata[0]["track_number"] = 32768
+        self.metadata[1]["path"] = "/" + "x" * 1000
+        progress = self.send_post_request(self.metadata)
+
+        self.assertIn("track_number", progress[0]["error"])
+        self.assertIn("path", progress[1]["error"])
+        self.assertEqual(progress[2]["created"], 1)
+
+    def test_ingest_songs_reports_database_errors(self):
+        with mock.patch.object(
+            util, "import_songs", side_effect=DataError("value out of range")
+        ):
+            progress = self.send_post_request(self.metadata)
+
+        self.assertEqual(progress[0]["error"], "value out of range")
+        self.assertEqual(progress[1]["batch"], 2)
+
+    def test_ingest_songs_with_wrong_content_type(self):
+        response = self.client.post(
+            reverse("api:ingest_songs"),
+            data=self.metadata,
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(
+            response.json()["error"], "Content type must be application/x-ndjson."
+        )
+
+    def test_ingest_songs_with_invalid_batch_size(self):
+        response = self.client.post(
+            f"{reverse("api:ingest_songs")}?batch_size=0",
+            data=json.dumps(self.metadata[0]),
+            content_type="application/x-ndjson",
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+
+class RetrieveSongTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        self.album = util.bulk_create_albums(
+            [
+                {
+                    "title": "Only Built 4 Cuban Linx...",
+                    "artists": [{"name": "Raekwon"}],
+                    "release_date": datetime.date(1995, 8, 1),
+                    "songs": [
+                        {
+                            "title": f"Track {track_number}",
+                            "artists": [{"name": "Raekwon"}, {"name": "Ghostface"}],
+                            "group_members": [{"name": "Wu-Tang Clan"}],
+                            "producers": [{"name": "RZA"}],
+                            "track_number": track_number,
+                            "length": 240,
+                            "path": f"/raekwon/obfcl/{track_number:02}.flac",
+                        }
+                        for track_number in range(1, 11)
+                    ],
+                }
+            ]
+        )[0]
+        self.song = self.album.song_set.get(track_number=1)
+
+    def send_get_request(self, id: int) -> HttpResponse:
+        """Send GET request to API endpoint that retrieves a Song object.
+
+        Arguments:
+            id (int) -- The primary key of the song to retrieve.
+
+        Returns:
+            HttpResponse object with the results of the GET request.
+        """
+        return self.client.get(reverse("api:retrieve_song", kwargs={"id": id}))
+
+    def test_retrieve_song_status_code(self):
+        response = self.send_get_request(self.song.id)
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve_song_json_response_credits(self):
+        response = self.send_get_request(self.song.id).json()
+
+        self.assertEqual(
+            [artist["name"] for artist in response["artists"]],
+            ["Raekwon", "Ghostface"],
+        )
+        self.assertEqual(
+            [artist["name"] for artist in response["group_members"]], ["Wu-Tang Clan"]
+        )
+        self.assertEqual(
+            [producer["name"] for producer in response["producers"]], ["RZA"]
+        )
+
+    def test_retrieve_song_json_response_album(self):
+        album = self.send_get_request(self.song.id).json()["album"]
+
+        self.assertEqual(album["title"], "Only Built 4 Cuban Linx...")
+        self.assertEqual([artist["name"] for artist in album["artists"]], ["Raekwon"])
+
+    def test_retrieve_song_without_group_members_or_producers(self):
+        models.SongArtist.objects.filter(group=True).delete()
+        models.SongProducer.objects.all().delete()
+        response = self.send_get_request(self.song.id).json()
+
+        self.assertIsNone(response["group_members"])
+        self.assertIsNone(response["producers"])
+
+    def test_retrieve_song_number_of_queries(self):
+        with self.assertNumQueries(5):
+            self.send_get_request(self.song.id)
+
+    def test_retrieve_song_with_selected_fields(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("api:retrieve_song", kwargs={"id": self.song.id}),
+                {"fields": "title,producers"},
+            ).json()
+
+        self.assertEqual(list(response), ["title", "producers"])
+        self.assertEqual(
+            [producer["name"] for producer in response["producers"]], ["RZA"]
+        )
+
+    def test_retrieve_song_with_embedded_album_tracklist(self):
+        response = self.client.get(
+            reverse("api:retrieve_song", kwargs={"id": self.song.id}),
+            {"include": "album.tracklist"},
+        ).json()
+
+        self.assertEqual(response["album"]["tracklist"]["count"], 10)
+        self.assertIn(
+            response["id"],
+            [song["id"] for song in response["album"]["tracklist"]["items"]],
+        )
+
+    def test_serialize_songs_number_of_queries_does_not_grow(self):
+        request = RequestFactory().get("/")
+        queryset = models.Song.objects.select_related("album").prefetch_related(
+            *models.song_prefetches()
+        )
+
+        with self.assertNumQueries(4):
+            songs = [
+                schema.SongOut.from_orm(song, context={"request": request})
+                for song in queryset
+            ]
+
+        self.assertEqual(len(songs), 10)
+
+    def test_retrieve_song_that_does_not_exist(self):
+        id = self.song.id + 100
+        response = self.send_get_request(id)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(
+            response.json()["error"], f"Song with id = {id} does not exist."
+        )
+
+
+class ListSongsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        util.bulk_create_albums(
+            [
+                {
+                    "title": "Liquid Swords",
+                    "artists": [{"name": "GZA"}],
+                    "release_date": datetime.date(1995, 11, 7),
+                    "songs": [
+                        {
+                            "title": title,
+                            "artists": [{"name": "GZA"}],
+                            "producers": [{"name": "RZA"}],
+                            "track_number": track_number,
+                            "length": 240,
+                            "path": f"/gza/liquid-swords/{track_number:02}.flac",
+                        }
+                        for track_number, title in enumerate(
+                            [
+                                "Liquid Swords",
+                                "Duel Of The Iron Mic",
+                                "Living In The World Today",
+                            ],
+                            1,
+                        )
+                    ],
+                }
+            ]
+        )
+        models.Song.objects.filter(track_number=3).update(play_count=7)
+
+    def send_get_request(self, **params: int | str) -> HttpResponse:
+        """Send GET request to API endpoint that lists Song objects.
+
+        Arguments:
+            params -- The pagination query parameters.
+
+        Returns:
+            HttpResponse object with the results of the GET request.
+        """
+        return self.client.get(reverse("api:list_songs"), params)
+
+    def test_list_songs_from_most_played(self):
+        first_page = self.send_get_request(limit=2).json()
+        second_page = self.send_get_request(limit=2, cursor=first_page["next"]).json()
+
+        self.assertEqual(
+            [song["title"] for song in first_page["items"]],
+            ["Living In The World Today", "Liquid Swords"],
+        )
+        self.assertEqual(
+            [song["title"] for song in second_page["items"]], ["Duel Of The Iron Mic"]
+        )
+
+    def test_list_songs_number_of_queries(self):
+        with self.assertNumQueries(4):
+            self.send_get_request()
+
+    def test_list_songs_by_ids_in_request_order(self):
+        songs = {song.track_number: song.id for song in models.Song.objects.all()}
+        missing = max(songs.values()) + 100
+        ids = [songs[2], missing, songs[1], songs[2]]
+
+        with self.assertNumQueries(4):
+            response = self.send_get_request(ids=",".join(str(id) for id in ids)).json()
+
+        self.assertIsNone(response["next"])
+        self.assertEqual(
+            [song and song["title"] for song in response["items"]],
+            ["Duel Of The Iron Mic", None, "Liquid Swords", "Duel Of The Iron Mic"],
+        )
+
+    def test_page_schema_allows_missing_and_partial_items(self):
+        page = schema.SongPage.model_validate(
+            {"items": [{"id": "1", "title": "Liquid Swords"}, None], "next": None}
+        )
+
+        self.assertEqual(page.items[0].title, "Liquid Swords")
+        self.assertIsNone(page.items[1])
+
+    def test_list_songs_by_invalid_ids(self):
+        for ids in ["1,two", ",".join(["1"] * 501)]:
+            with self.subTest(ids=ids[:10]):
+                self.assertEqual(self.send_get_request(ids=ids).status_code, 400)
+
+
+class ResolveSongsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+
+    def setUp(self):
+        album = util.bulk_create_albums(
+            [
+                {
+                    "title": "Fishscale",
+                    "artists": [{"name": "Ghostface Killah"}],
+                    "release_date": datetime.date(2006, 3, 28),
+                    "songs": [
+                        {
+                            "title": title,
+                            "artists": [{"name": "Ghostface Killah"}],
+                            "track_number": track_number,
+                            "length": 200,
+                            "path": path,
+                        }
+                        for track_number, title, path in [
+                            (2, "Shakey Dog", "/ghostface/fishscale/02.flac"),
+                            (5, "Beauty Jackson", "/ghostface/fishscale/Beauté.flac"),
+                        ]
+                    ],
+                }
+            ]
+        )[0]
+        self.songs = {song.track_number: song.id for song in album.song_set.all()}
+
+    def send_post_request(self, paths: list[str]) -> HttpResponse:
+        """Send POST request to API endpoint that resolves song paths.
+
+        Arguments:
+            paths (list) -- The paths to resolve.
+
+        Returns:
+            HttpResponse object with the results of the POST request.
+        """
+        return self.client.post(
+            reverse("api:resolve_songs"),
+            data={"paths": paths},
+            content_type="application/json",
+        )
+
+    def test_resolve_songs_in_request_order(self):
+        with self.assertNumQueries(1):
+            response = self.send_post_request(
+                [
+                    "ghostface\\Fishscale\\02.FLAC",
+                    "/ghostface/fishscale/99.flac",
+                    "/ghostface/fishscale/Beaute\u0301.flac",
+                ]
+            )
+
+        self.assertEqual(
+            response.json()["ids"], [str(self.songs[2]), None, str(self.songs[5])]
+        )
+
+    def test_resolve_same_path_in_both_unicode_forms(self):
+        response = self.send_post_request(
+            [
+                "/ghostface/fishscale/Beaut\u00e9.flac",
+                "/GHOSTFACE/fishscale/Beaute\u0301.flac",
+            ]
+        )
+
+        self.assertEqual(response.json()["ids"], [str(self.songs[5])] * 2)
+
+    def test_resolve_too_many_songs(self):
+        response = self.send_post_request(["/ghostface/fishscale/02.flac"] * 10001)
+
+        self.assertEqual(response.status_code, 422)
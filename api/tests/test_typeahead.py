@@ -0,0 +1,219 @@
+import datetime
+from unittest import mock
+
+from django.db.models import F
+from django.test import Client, SimpleTestCase, TestCase
+from django.urls import reverse
+
+from api import cache, models, typeahead, utilities as util
+
+
+class PrefixIndexTestCase(SimpleTestCase):
+    def setUp(self):
+        self.index = typeahead.PrefixIndex()
+        self.index.build(
+            [(1, "MF DOOM"), (2, "Madvillain"), (3, "Mr. Fantastik"), (4, "Doomstarks")]
+        )
+
+    def test_match_start_of_any_word(self):
+        self.assertEqual(
+            self.index.search("doom", 10), [(1, "MF DOOM"), (4, "Doomstarks")]
+        )
+        self.assertEqual(self.index.search("mf d", 10), [(1, "MF DOOM")])
+        self.assertEqual(self.index.search("oom", 10), [])
+
+    def test_match_once_per_object(self):
+        self.index.add(5, "Doom Doom Doom")
+
+        self.assertEqual([id for id, label in self.index.search("doom", 10)], [1, 5, 4])
+
+    def test_limit(self):
+        self.assertEqual(self.index.search("m", 2), [(2, "Madvillain"), (1, "MF DOOM")])
+
+    def test_add_replace_and_remove(self):
+        self.index.add(6, "Viktor Vaughn")
+        self.index.add(2, "Madvillainy")
+        self.index.remove(1)
+        self.index.remove(7)
+
+        self.assertEqual(self.index.search("v", 10), [(6, "Viktor Vaughn")])
+        self.assertEqual(self.index.search("madvillain", 10), [(2, "Madvillainy")])
+        self.assertEqual(self.index.search("doom", 10), [(4, "Doomstarks")])
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(len(self.index.keys), len(self.index.ids))
+
+    def test_prefix_longer_than_keys(self):
+        title = "All Caps (Instrumental) (Remastered Deluxe Edition)"
+        self.index.add(8, title)
+        self.index.add(9, "All Caps (Instrumental) (Remastered Deluxe Version)")
+
+        self.assertEqual(
+            self.index.search(typeahead.normalize(title), 10), [(8, title)]
+        )
+
+    def test_apply_returns_new_index(self):
+        index = self.index.apply({2: "Madvillainy", 5: "Viktor Vaughn"}, {1, 7})
+
+        self.assertEqual(index.search("v", 10), [(5, "Viktor Vaughn")])
+        self.assertEqual(index.search("doom", 10), [(4, "Doomstarks")])
+        self.assertEqual(
+            self.index.search("doom", 10), [(1, "MF DOOM"), (4, "Doomstarks")]
+        )
+        self.assertIs(self.index.apply({2: "Madvillain"}, {7}), self.index)
+
+    def test_apply_merges_many_changes(self):
+        changes = {2: "Madvillainy", 5: "Viktor Vaughn", 6: "King Geedorah"}
+        with mock.patch.object(typeahead, "MERGE_THRESHOLD", 1):
+            merged = self.index.apply(changes, {1})
+        applied = self.index.apply(changes, {1})
+
+        self.assertEqual(merged.keys, applied.keys)
+        self.assertEqual(merged.ids, applied.ids)
+        self.assertEqual(merged.labels, applied.labels)
+
+    def test_normalize(self):
+        self.assertEqual(
+            typeahead.normalize("  Beyoncé — N.Y. State_Of  Mind "),
+            "beyonce n y state of mind",
+        )
+
+
+class SuggestTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.client = Client()
+        util.bulk_create_albums(
+            [
+                {
+                    "title": "Lemonade",
+                    "artists": [{"name": "Beyoncé"}],
+                    "release_date": datetime.date(2016, 4, 23),
+                    "songs": [
+                        {
+                            "title": "Formation",
+                            "artists": [{"name": "Beyoncé"}],
+                            "track_number": 12,
+                            "length": 206,
+                            "path": "/beyonce/lemonade/12.flac",
+                        },
+                    ],
+                },
+            ]
+        )
+
+    def setUp(self):
+        patcher = mock.patch.object(typeahead, "index", typeahead.Typeahead())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        typeahead.index.refresh()
+
+    def suggest(self, **params) -> dict:
+        response = self.client.get(reverse("api:suggest"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_suggestions_grouped_by_type(self):
+        artist = models.Artist.objects.get(name="Beyoncé")
+        suggestions = self.suggest(q="BEYON")
+
+        self.assertEqual(
+            suggestions,
+            {
+                "artists": [
+                    {
+                        "id": str(artist.id),
+                        "name": "Beyoncé",
+                        "url": f"http://testserver{artist.get_url()}",
+                    }
+                ],
+                "albums": [],
+                "songs": [],
+            },
+        )
+
+    def test_lookups_do_not_query_database(self):
+        self.suggest(q="l")
+
+        with self.assertNumQueries(0):
+            suggestions = self.suggest(q="lem")
+
+        self.assertEqual(
+            [album["title"] for album in suggestions["albums"]], ["Lemonade"]
+        )
+
+    def test_lookups_do_not_wait_for_index(self):
+        index = typeahead.Typeahead()
+
+        with self.assertNumQueries(0):
+            suggestions = index.lookup("lem", 5)
+
+        self.assertEqual(suggestions, {"artist": [], "album": [], "song": []})
+
+    def test_lookups_do_not_read_cache(self):
+        with mock.patch.object(cache, "get_versions") as get_versions:
+            self.suggest(q="lem")
+
+        get_versions.assert_not_called()
+
+    def test_new_version_makes_index_stale(self):
+        self.assertFalse(typeahead.index.is_stale())
+
+        models.Artist.objects.create(name="Solange")
+
+        self.assertEqual(self.suggest(q="sol")["artists"], [])
+        self.assertTrue(typeahead.index.is_stale())
+        typeahead.index.refresh()
+        self.assertFalse(typeahead.index.is_stale())
+        self.assertEqual(self.suggest(q="sol")["artists"][0]["name"], "Solange")
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.suggest(q="form")["songs"][0]["title"], "Formation")
+
+        song = models.Song.objects.get(title="Formation")
+        song.title = "Formation (Live)"
+        song.save()
+        models.Album.objects.create(
+            title="Renaissance", release_date=datetime.date(2022, 7, 29)
+        )
+        typeahead.index.refresh()
+
+        self.assertEqual(
+            self.suggest(q="live")["songs"][0]["title"], "Formation (Live)"
+        )
+        self.assertEqual(self.suggest(q="ren")["albums"][0]["title"], "Renaissance")
+
+    def test_index_follows_deletes(self):
+        self.suggest(q="form")
+
+        models.Album.objects.filter(title="Lemonade").delete()
+        with self.assertNumQueries(5):
+            typeahead.index.refresh()
+
+        self.assertEqual(self.suggest(q="form")["songs"], [])
+        self.assertEqual(self.suggest(q="lem")["albums"], [])
+
+    def test_index_rebuilt_after_deletion_log_expires(self):
+        retention = typeahead.DELETION_LOG_RETENTION
+        models.Song.objects.filter(title="Formation").delete()
+        models.Deletion.objects.update(deleted_at=F("deleted_at") - retention * 2)
+        typeahead.index.read_at -= retention * 2
+
+        typeahead.index.refresh()
+
+        self.assertEqual(self.suggest(q="form")["songs"], [])
+        self.assertFalse(models.Deletion.objects.exists())
+
+    def test_update_prunes_deletion_log(self):
+        retention = typeahead.DELETION_LOG_RETENTION
+        models.Song.objects.filter(title="Formation").delete()
+        models.Deletion.objects.update(deleted_at=F("deleted_at") - retention * 2)
+
+        typeahead.index.refresh()
+
+        self.assertFalse(models.Deletion.objects.exists())
+
+    def test_invalid_parameters(self):
+        for params in ({}, {"q": "x" * 201}, {"q": "b", "limit": 21}):
+            response = self.client.get(reverse("api:suggest"), params)
+
+            self.assertEqual(response.status_code, 422)
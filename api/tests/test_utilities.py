@@ -1,6 +1,12 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.test import TestCase, override_settings
 
 from api import models, utilities as util
+from api.tests.test_library import create_flac
 
 
 class GetArtistsTestCase(TestCase):
@@ -39,6 +45,140 @@ class GetArtistsTestCase(TestCase):
 
         self.assertEqual(big_tymers.hometown, "New Orleans, LA")
 
+    def test_get_artist_case_insensitive_match(self):
+        lil_wayne = models.Artist.objects.create(name="Lil Wayne")
+        album_artists = [{"name": "lil wayne", "hometown": ""}]
+        artists = util.get_artists(album_artists)
+
+        self.assertEqual(artists[0], lil_wayne)
+        self.assertEqual(models.Artist.objects.count(), 1)
+
+    def test_get_artists_returns_artists_in_submitted_order(self):
+        juvenile = models.Artist.objects.create(name="Juvenile")
+        song_artists = [
+            {"name": "B.G.", "hometown": ""},
+            {"name": "Juvenile", "hometown": ""},
+            {"name": "Turk", "hometown": ""},
+        ]
+        artists = util.get_artists(song_artists)
+
+        self.assertEqual(
+            [artist.name for artist in artists], ["B.G.", "Juvenile", "Turk"]
+        )
+        self.assertEqual(artists[1], juvenile)
+
+    def test_get_artists_with_duplicate_names_creates_one_artist(self):
+        song_artists = [
+            {"name": "Hot Boys", "hometown": ""},
+            {"name": "HOT BOYS", "hometown": "New Orleans, LA"},
+        ]
+        artists = util.get_artists(song_artists)
+
+        self.assertEqual(artists[0], artists[1])
+        self.assertEqual(models.Artist.objects.count(), 1)
+        self.assertEqual(
+            models.Artist.objects.get(pk=artists[0].id).hometown, "New Orleans, LA"
+        )
+
+    def test_get_artists_query_count_is_constant(self):
+        models.Artist.objects.create(name="Mannie Fresh")
+        models.Artist.objects.create(name="Birdman")
+        song_artists = [
+            {"name": "Mannie Fresh", "hometown": "New Orleans, LA"},
+            {"name": "Birdman", "hometown": "New Orleans, LA"},
+            {"name": "Lil Wayne", "hometown": ""},
+            {"name": "Juvenile", "hometown": ""},
+            {"name": "Turk", "hometown": ""},
+        ]
+
+        # Lookup, insert, lookup of inserted artists, and hometown update.
+        with self.assertNumQueries(4):
+            util.get_artists(song_artists)
+
+    def test_get_artists_skips_artist_created_concurrently(self):
+        birdman = models.Artist.objects.create(name="Birdman")
+        lookup_artists = util.lookup_artists
+
+        # The first lookup misses the artist, as if another request had
+        # created it between the lookup and the insert.
+        with mock.patch.object(
+            util, "lookup_artists", side_effect=[{}, lookup_artists(["birdman"])]
+        ):
+            artists = util.get_artists([{"name": "Birdman", "hometown": ""}])
+
+        self.assertEqual(artists[0], birdman)
+        self.assertEqual(models.Artist.objects.count(), 1)
+
+
+class BulkCreateAlbumsTestCase(TestCase):
+    def test_artists_are_resolved_in_one_pass(self):
+        album_data = [
+            {
+                "title": "400 Degreez",
+                "artists": [{"name": "Juvenile"}],
+                "release_date": "1998-11-03",
+                "songs": [
+                    {
+                        "title": "Back That Azz Up",
+                        "artists": [{"name": "Juvenile"}, {"name": "Lil Wayne"}],
+                        "producers": [{"name": "Mannie Fresh"}],
+                        "track_number": 12,
+                        "length": 265,
+                        "path": "/juvenile/400-degreez/12.flac",
+                    }
+                ],
+            }
+        ]
+        with mock.patch.object(
+            util, "get_artists", wraps=util.get_artists
+        ) as get_artists:
+            album = util.bulk_create_albums(album_data)[0]
+
+        get_artists.assert_called_once()
+        self.assertEqual(
+            list(album.song_set.get().producers.values_list("name", flat=True)),
+            ["Mannie Fresh"],
+        )
+
+
+class NormalizePathTestCase(TestCase):
+    def test_relative_path_gets_leading_slash(self):
+        self.assertEqual(
+            util.normalize_path("juvenile/400-degreez/03.flac"),
+            "/juvenile/400-degreez/03.flac",
+        )
+
+    def test_windows_separators_and_duplicate_slashes(self):
+        self.assertEqual(
+            util.normalize_path("\\juvenile\\400-degreez//./03.flac"),
+            "/juvenile/400-degreez/03.flac",
+        )
+
+    @override_settings(LIBRARY_ROOT="/mnt/music/")
+    def test_library_root_is_stripped(self):
+        self.assertEqual(
+            util.normalize_path("/mnt/music/juvenile/400-degreez/03.flac"),
+            "/juvenile/400-degreez/03.flac",
+        )
+
+
+class ProbeSongTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.root = os.path.join(self.directory, "music")
+        create_flac(os.path.join(self.root, "juvenile", "03.flac"), seconds=259)
+        create_flac(os.path.join(self.directory, "outside.flac"))
+
+    def test_probe_song_under_library_root(self):
+        with self.settings(LIBRARY_ROOT=self.root):
+            self.assertEqual(util.probe_song("/juvenile/03.flac")["length"], 259)
+
+    def test_probe_song_outside_library_root(self):
+        with self.settings(LIBRARY_ROOT=self.root):
+            self.assertEqual(util.probe_song("/../outside.flac"), {})
+            self.assertEqual(util.probe_song("juvenile/../../outside.flac"), {})
+
 
 class StripWhitespaceTestCase(TestCase):
     def test_extraneous_whitespace_is_stripped(self):
@@ -0,0 +1,366 @@
+import bisect
+import datetime
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from typing import Any, Iterable
+
+from django.db import close_old_connections
+from django.utils import timezone
+from ninja import Query, Router
+
+from api import cache, models, schema, serializers
+
+logger = logging.getLogger(__name__)
+router = Router()
+
+# Keys are cut to this many characters to keep the index small. Longer
+# queries are looked up by their first KEY_LENGTH characters and checked
+# against the whole name or title.
+KEY_LENGTH = 32
+
+# Rows changed this long before the last one read are read again on the
+# next refresh, in case a transaction that started earlier committed later.
+SYNC_OVERLAP = datetime.timedelta(minutes=1)
+
+# The indexes are refreshed at least this often (in seconds), to pick up the
+# changes made by other processes when the response cache is not shared.
+REFRESH_INTERVAL = 10
+
+# The versions of the models in the response cache are checked this often (in
+# seconds) for changes made through the API, so lookups never read the cache.
+VERSION_CHECK_INTERVAL = 1
+
+# Deletions are logged for this long. An index that was last refreshed
+# before then is rebuilt, as deletions may be missing from the log.
+DELETION_LOG_RETENTION = datetime.timedelta(days=1)
+
+# Up to this many objects changed at once are added to or removed from a
+# copy of an index one by one, and any more are merged into a new index.
+MERGE_THRESHOLD = 100
+
+# The model and the indexed field of each kind of suggestion.
+SOURCES = {
+    "artist": (models.Artist, "name"),
+    "album": (models.Album, "title"),
+    "song": (models.Song, "title"),
+}
+
+
+def normalize(text: str) -> str:
+    """Return text in the form it is indexed and looked up in: without
+    accents, case folded, and with runs of punctuation and whitespace
+    replaced by a single space (e.g. "n y state of mind" for "N.Y.
+    State Of Mind")."""
+    if not text.isascii():
+        text = "".join(
+            character
+            for character in unicodedata.normalize("NFKD", text)
+            if not unicodedata.combining(character)
+        )
+    return " ".join(re.split(r"[\W_]+", text.casefold())).strip()
+
+
+def get_keys(label: str) -> set[str]:
+    """Return the keys of a name or title, which are its normalized text
+    from the start of each word, so that e.g. "MF DOOM" is found by both
+    "mf d" and "doom"."""
+    return {suffix[:KEY_LENGTH] for suffix in get_suffixes(label)}
+
+
+def get_suffixes(label: str) -> list[str]:
+    words = normalize(label).split()
+    return [" ".join(words[start:]) for start in range(len(words))]
+
+
+class PrefixIndex:
+    """Find names or titles by the prefix of any of their words.
+
+    The keys of every object are kept in one sorted list, alongside an
+    array of the ids of the objects they belong to, so a lookup is a
+    binary search for the first key starting with the prefix followed by
+    a scan of the keys up to the limit. Keys that start with the same
+    prefix are sorted alphabetically, which puts the closest completions
+    (e.g. "drake" before "drake and josh") first.
+    """
+
+    def __init__(self):
+        self.keys: list[str] = []
+        self.ids = array("q")
+        self.labels: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def build(self, rows: Iterable[tuple[int, str]]):
+        """Replace the contents of the index with rows of ids and names
+        or titles, sorting the keys once."""
+        self.labels = dict(rows)
+        entries = sorted(
+            (key, id) for id, label in self.labels.items() for key in get_keys(label)
+        )
+        self.keys = [key for key, id in entries]
+        self.ids = array("q", (id for key, id in entries))
+
+    def add(self, id: int, label: str):
+        """Add an object to the index, or replace its name or title."""
+        if self.labels.get(id) == label:
+            return
+
+        self.remove(id)
+        self.labels[id] = label
+        for key in get_keys(label):
+            position = bisect.bisect_right(self.keys, key)
+            self.keys.insert(position, key)
+            self.ids.insert(position, id)
+
+    def remove(self, id: int):
+        """Remove an object from the index, if it is in it."""
+        label = self.labels.pop(id, None)
+        if label is None:
+            return
+
+        for key in get_keys(label):
+            position = bisect.bisect_left(self.keys, key)
+            while self.ids[position] != id:
+                position += 1
+            del self.keys[position]
+            del self.ids[position]
+
+    def apply(self, labels: dict[int, str], removed: set[int]) -> "PrefixIndex":
+        """Return the index with objects added or renamed and objects
+        removed, which is this index if nothing changed and a new index
+        otherwise.
+
+        A few changes are applied to a copy of the index one by one.
+        Each costs a move of the keys after it, so more than
+        MERGE_THRESHOLD changes are merged into a new index instead.
+        """
+        labels = {
+            id: label
+            for id, label in labels.items()
+            if id not in removed and self.labels.get(id) != label
+        }
+        removed = {id for id in removed if id in self.labels}
+        if not labels and not removed:
+            return self
+
+        if len(labels) + len(removed) > MERGE_THRESHOLD:
+            return self.merge(labels, removed)
+
+        index = PrefixIndex()
+        index.keys, index.ids, index.labels = (
+            self.keys.copy(),
+            array("q", self.ids),
+            self.labels.copy(),
+        )
+        for id in removed:
+            index.remove(id)
+        for id, label in labels.items():
+            index.add(id, label)
+        return index
+
+    def merge(self, labels: dict[int, str], removed: set[int]) -> "PrefixIndex":
+        """Return a new index with the objects changed in one pass over
+        this index, merging its keys with the sorted keys of the added
+        or renamed objects."""
+        changed = labels.keys() | removed
+        index = PrefixIndex()
+        index.labels = {
+            id: label for id, label in self.labels.items() if id not in changed
+        } | labels
+        for key, id in heapq.merge(
+            ((key, id) for key, id in zip(self.keys, self.ids) if id not in changed),
+            sorted(
+                (key, id) for id, label in labels.items() for key in get_keys(label)
+            ),
+        ):
+            index.keys.append(key)
+            index.ids.append(id)
+
+        return index
+
+    def search(self, prefix: str, limit: int) -> list[tuple[int, str]]:
+        """Return the ids and names or titles of up to limit objects
+        with a word starting with a normalized prefix."""
+        key = prefix[:KEY_LENGTH]
+        results, seen = [], set()
+        for position in range(bisect.bisect_left(self.keys, key), len(self.keys)):
+            if not self.keys[position].startswith(key) or len(results) == limit:
+                break
+
+            id = self.ids[position]
+            if id in seen:
+                continue
+            seen.add(id)
+            label = self.labels[id]
+            if len(prefix) > KEY_LENGTH and not any(
+                suffix.startswith(prefix) for suffix in get_suffixes(label)
+            ):
+                continue
+            results.append((id, label))
+
+        return results
+
+
+class Typeahead:
+    """The prefix indexes of the artists, albums, and songs, kept in the
+    memory of each process.
+
+    The indexes are built and kept up to date by a background thread,
+    started along with each worker process (see avalon.wsgi), so lookups
+    never wait for the database: they search the indexes as they were
+    last refreshed, with no suggestions until they are first built.
+
+    Every REFRESH_INTERVAL, or within VERSION_CHECK_INTERVAL of a model
+    getting a new version in the response cache (see cache.invalidate),
+    the thread reads the rows updated since the last refresh and the ids of
+    the rows deleted since then from the deletion log written by
+    database triggers (see models.Deletion), with one indexed query on a
+    timestamp each. The changes are applied to a copy of the index of
+    the model, which then replaces it in a single assignment, so
+    lookups never see an index halfway through a change.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.indexes = {kind: PrefixIndex() for kind in SOURCES}
+        self.versions: list[str] | None = None
+        self.synced_at: dict[str, datetime.datetime | None] = dict.fromkeys(SOURCES)
+        self.read_at: datetime.datetime | None = None
+
+    def start(self):
+        """Start the thread that builds and refreshes the indexes, once
+        per process."""
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name="typeahead", daemon=True
+                )
+                self.thread.start()
+
+    def run(self):
+        attempted_at = None
+        while True:
+            delay = VERSION_CHECK_INTERVAL
+            try:
+                if (
+                    attempted_at is None
+                    or time.monotonic() - attempted_at >= REFRESH_INTERVAL
+                    or self.is_stale()
+                ):
+                    attempted_at = time.monotonic()
+                    self.refresh()
+            except Exception:
+                # The indexes are left as they were and refreshed on the
+                # next attempt, e.g. once the database is reachable again.
+                logger.exception("Could not refresh the typeahead indexes.")
+                delay = REFRESH_INTERVAL
+            finally:
+                close_old_connections()
+            time.sleep(delay)
+
+    def lookup(self, query: str, limit: int) -> dict[str, list[tuple[int, str]]]:
+        """Return the ids and names or titles of up to limit objects of
+        each kind with a word starting with query."""
+        prefix, indexes = normalize(query), self.indexes
+        return {
+            kind: indexes[kind].search(prefix, limit) if prefix else []
+            for kind in SOURCES
+        }
+
+    def get_versions(self) -> list[str]:
+        return cache.get_versions(tuple(model for model, field in SOURCES.values()))
+
+    def is_stale(self) -> bool:
+        """Return whether a model has a new version in the response cache
+        since the last refresh."""
+        return self.get_versions() != self.versions
+
+    def refresh(self):
+        """Build the indexes the first time, and apply the changes made
+        since the last refresh afterwards. Deletions logged before
+        DELETION_LOG_RETENTION are then pruned from the log."""
+        with self.lock:
+            versions, read_at = self.get_versions(), timezone.now()
+            if self.read_at is None or self.read_at < read_at - DELETION_LOG_RETENTION:
+                self.build()
+            else:
+                self.update()
+            models.Deletion.objects.filter(
+                deleted_at__lt=read_at - DELETION_LOG_RETENTION
+            ).delete()
+            self.versions, self.read_at = versions, read_at
+
+    def build(self):
+        """Read every row of every model into new indexes."""
+        indexes = {}
+        for kind, (model, field) in SOURCES.items():
+            rows = list(model.objects.order_by().values_list("id", field, "updated_at"))
+            indexes[kind] = PrefixIndex()
+            indexes[kind].build((id, label) for id, label, updated_at in rows)
+            self.synced_at[kind] = max((row[2] for row in rows), default=None)
+
+        self.indexes = indexes
+
+    def update(self):
+        """Read the rows updated and deleted since the last refresh, and
+        replace the indexes they change."""
+        # The log is read from the time of the last refresh by the clock of
+        # this process, which SYNC_OVERLAP also allows to be a little off.
+        removed: dict[str, set[int]] = {kind: set() for kind in SOURCES}
+        for kind, object_id in models.Deletion.objects.filter(
+            deleted_at__gte=self.read_at - SYNC_OVERLAP
+        ).values_list("kind", "object_id"):
+            removed[kind].add(object_id)
+
+        for kind, (model, field) in SOURCES.items():
+            queryset = model.objects.order_by()
+            if self.synced_at[kind] is not None:
+                queryset = queryset.filter(
+                    updated_at__gte=self.synced_at[kind] - SYNC_OVERLAP
+                )
+            rows = list(queryset.values_list("id", field, "updated_at"))
+            index = self.indexes[kind].apply(
+                {id: label for id, label, updated_at in rows}, removed[kind]
+            )
+            if index is not self.indexes[kind]:
+                self.indexes = {**self.indexes, kind: index}
+            self.synced_at[kind] = max(
+                (row[2] for row in rows), default=self.synced_at[kind]
+            )
+
+
+index = Typeahead()
+
+
+@router.get("", response={200: schema.SuggestionsOut})
+def suggest(request, params: Query[schema.SuggestionsIn]):
+    """To suggest artists, albums, and songs as a query is typed, send
+    the text typed so far with the following query parameters:
+    - **q** (*string*): The beginning of a name or title, or of any of
+    its words (e.g. "mf d" or "doom" for "MF DOOM") ***required***
+    - **limit** (*integer*): The number of suggestions of each type,
+    defaults to 5 ***optional***
+
+    Suggestions are matched regardless of case, accents, and
+    punctuation, and are looked up in memory rather than in the
+    database, so they are fast enough to send a request per keystroke.
+    The response includes the **artists**, **albums**, and **songs**
+    whose names or titles match, closest completions first.
+    """
+    url = serializers.URLTemplates(request)
+    suggestions: dict[str, Any] = {}
+    for kind, matches in index.lookup(params.q, params.limit).items():
+        field = SOURCES[kind][1]
+        suggestions[f"{kind}s"] = [
+            {"id": str(id), field: label, "url": url(f"retrieve_{kind}", id)}
+            for id, label in matches
+        ]
+
+    return router.api.create_response(request, suggestions, status=200)
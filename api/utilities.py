@@ -1,6 +1,264 @@
-from typing import Any
+import os
+import posixpath
+import unicodedata
+from typing import Any, Iterable
 
-from api import models
+from django.conf import settings
+from django.db import connection
+from django.db.models import Model
+from django.db.models.functions import Lower
+
+from api import models, probe, signals
+
+BULK_BATCH_SIZE = 1000
+CREDIT_FIELDS = ("artists", "group_members", "producers")
+
+
+def bulk_create_albums(album_data: list[dict[str, Any]]) -> list[models.Album]:
+    """Create Album objects and their tracklists with set-based inserts.
+
+    This utility accepts a list of dictionaries containing album
+    metadata. The albums, their artist credits, and the songs in their
+    tracklists are each written with a single bulk insert (split into
+    batches of BULK_BATCH_SIZE rows), rather than one insert per object.
+    The artists attributed to the albums and credited on their songs
+    are retrieved or created together with a single get_artists call.
+    This utility should be called inside a transaction so a failing
+    insert leaves no partial import behind.
+
+    Arguments:
+        album_data (list) -- A list of dictionaries where each
+        dictionary contains the metadata for one album. Each dictionary
+        should have the fields of the AlbumIn schema, plus the
+        following field:
+            songs (list) - A list of dictionaries where each dictionary
+            contains the metadata for one song in the album's tracklist
+            with the fields of the SongIn schema [optional]
+
+    Returns:
+        albums (list) -- A list of the created Album objects in the same
+        order as the album metadata.
+    """
+    artists = get_artist_map(
+        [artist for data in album_data for artist in data["artists"]]
+        + [
+            artist
+            for data in album_data
+            for song in data.get("songs", [])
+            for field in CREDIT_FIELDS
+            for artist in song.get(field, [])
+        ]
+    )
+
+    albums = models.Album.objects.bulk_create(
+        [
+            models.Album(
+                **{
+                    key: value
+                    for key, value in data.items()
+                    if key not in ("artists", "songs")
+                }
+            )
+            for data in album_data
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    models.AlbumArtist.objects.bulk_create(
+        [
+            models.AlbumArtist(album=album, artist=artist)
+            for album, data in zip(albums, album_data)
+            for artist in dict.fromkeys(
+                artists[artist["name"].lower()] for artist in data["artists"]
+            )
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    signals.catalog_changed.send(sender=models.Album)
+    signals.catalog_changed.send(sender=models.AlbumArtist)
+
+    bulk_create_songs(
+        [
+            dict(song, album=album)
+            for album, data in zip(albums, album_data)
+            for song in data.get("songs", [])
+        ],
+        artists,
+    )
+
+    return albums
+
+
+def bulk_create_credits(
+    songs: list[models.Song],
+    song_data: list[dict[str, Any]],
+    artists: dict[str, models.Artist] | None = None,
+) -> None:
+    """Credit artists and producers on songs with set-based inserts.
+
+    This utility resolves the artists, group members, and producers of
+    all of the songs with a single get_artists call, unless they were
+    already resolved by the caller, and writes the song
+    artist and production credits with one bulk insert each (split into
+    batches of BULK_BATCH_SIZE rows). Artists listed as group members
+    who are also credited as song artists are only credited once, the
+    same as when songs are created one at a time. The songs should not
+    have any credits yet.
+
+    Arguments:
+        songs (list) -- A list of Song objects.
+        song_data (list) -- A list of dictionaries in the same order as
+        the songs where each dictionary contains the artists,
+        group_members, and producers fields of the SongIn schema.
+        artists (dict) -- The credited artists keyed by lowercased name,
+        as returned by get_artist_map [optional]
+    """
+    if artists is None:
+        artists = get_artist_map(
+            [
+                artist
+                for data in song_data
+                for field in CREDIT_FIELDS
+                for artist in data.get(field, [])
+            ]
+        )
+
+    song_artists, song_producers = [], []
+    for song, data in zip(songs, song_data):
+        features = dict.fromkeys(
+            artists[artist["name"].lower()] for artist in data["artists"]
+        )
+        affiliations = dict.fromkeys(
+            artists[artist["name"].lower()] for artist in data.get("group_members", [])
+        )
+        producers = dict.fromkeys(
+            artists[producer["name"].lower()] for producer in data.get("producers", [])
+        )
+        song_artists += [
+            models.SongArtist(song=song, artist=artist) for artist in features
+        ]
+        song_artists += [
+            models.SongArtist(song=song, artist=artist, group=True)
+            for artist in affiliations
+            if artist not in features
+        ]
+        song_producers += [
+            models.SongProducer(song=song, producer=producer) for producer in producers
+        ]
+
+    models.SongArtist.objects.bulk_create(song_artists, batch_size=BULK_BATCH_SIZE)
+    models.SongProducer.objects.bulk_create(song_producers, batch_size=BULK_BATCH_SIZE)
+    signals.catalog_changed.send(sender=models.SongArtist)
+    signals.catalog_changed.send(sender=models.SongProducer)
+
+
+def bulk_create_songs(
+    song_data: list[dict[str, Any]],
+    artists: dict[str, models.Artist] | None = None,
+) -> list[models.Song]:
+    """Create Song objects and their credits with set-based inserts.
+
+    This utility accepts a list of dictionaries containing song
+    metadata. The songs are written with a single bulk insert (split
+    into batches of BULK_BATCH_SIZE rows) and their credits are written
+    with bulk_create_credits. This utility should be called inside a
+    transaction.
+
+    Arguments:
+        song_data (list) -- A list of dictionaries where each dictionary
+        contains the metadata for one song. Each dictionary should have
+        the fields of the SongIn schema, plus the following field:
+            album (Album) - The Album object the song belongs to
+            [required]
+        Any other Song fields (e.g. file_size) may be included as well.
+        artists (dict) -- The credited artists keyed by lowercased name,
+        as returned by get_artist_map [optional]
+
+    Returns:
+        songs (list) -- A list of the created Song objects in the same
+        order as the song metadata.
+    """
+    songs = models.Song.objects.bulk_create(
+        [
+            models.Song(
+                release_date=data["album"].release_date,
+                **{
+                    key: value
+                    for key, value in data.items()
+                    if key not in CREDIT_FIELDS
+                },
+            )
+            for data in song_data
+        ],
+        batch_size=BULK_BATCH_SIZE,
+    )
+    signals.catalog_changed.send(sender=models.Song)
+    bulk_create_credits(songs, song_data, artists)
+
+    return songs
+
+
+def get_albums(album_data: list[dict[str, Any]]) -> list[models.Album]:
+    """Retrieve Album objects from the database.
+
+    This utility accepts a list of dictionaries containing album
+    metadata. For each album in the list, the corresponding Album object
+    will be retrieved from the database, matching the title
+    case-insensitively along with the release date. The albums that do
+    not yet exist in the database are created together with
+    bulk_create_albums. The metadata of existing albums is left as is.
+
+    Arguments:
+        album_data (list) -- A list of dictionaries where each
+        dictionary contains the metadata for one album with the fields
+        of the AlbumIn schema.
+
+    Returns:
+        albums (list) -- A list of Album objects in the same order as
+        the album metadata.
+    """
+    unique_albums = {}
+    for data in album_data:
+        unique_albums.setdefault((data["title"].lower(), data["release_date"]), data)
+
+    albums = {
+        (album.title.lower(), album.release_date): album
+        for album in models.Album.objects.annotate(title_lower=Lower("title")).filter(
+            title_lower__in={title for title, _ in unique_albums},
+            release_date__in={release_date for _, release_date in unique_albums},
+        )
+    }
+    missing = [key for key in unique_albums if key not in albums]
+
+    if missing:
+        created = bulk_create_albums([unique_albums[key] for key in missing])
+        albums.update(zip(missing, created))
+
+    return [
+        albums[(data["title"].lower(), data["release_date"])] for data in album_data
+    ]
+
+
+def get_artist_map(artist_data: list[dict[str, str]]) -> dict[str, models.Artist]:
+    """Retrieve Artist objects from the database keyed by name.
+
+    This utility passes the artist metadata to get_artists and maps the
+    lowercased name of each artist to its Artist object, so callers
+    resolving the artists of many albums or songs at once can look them
+    up without querying the database again.
+
+    Arguments:
+        artist_data (list) -- A list of dictionaries where each
+        dictionary contains the metadata for one artist (see
+        get_artists).
+
+    Returns:
+        artists (dict) -- A dictionary mapping lowercased artist names
+        to Artist objects.
+    """
+    return {
+        data["name"].lower(): artist
+        for data, artist in zip(artist_data, get_artists(artist_data))
+    }
 
 
 def get_artists(artist_data: list[dict[str, str]]) -> list[models.Artist]:
@@ -14,6 +272,13 @@ def get_artists(artist_data: list[dict[str, str]]) -> list[models.Artist]:
     the corresponding Artist object does not, then the Artist object
     will be updated accordingly.
 
+    Artist names are matched case-insensitively. All of the artists are
+    looked up with one query, the missing artists are inserted with one
+    statement, and the changed hometowns are updated with one statement,
+    no matter how many artists are in the list. Inserts that collide
+    with an artist created concurrently by another request are skipped
+    and the existing artist is retrieved instead.
+
     Arguments:
         artist_data (list) -- A list of dictionaries where each
         dictionary contains the metadata for one artist. Each dictionary
@@ -26,20 +291,196 @@ def get_artists(artist_data: list[dict[str, str]]) -> list[models.Artist]:
     Returns:
         artists (list) -- A list of Artist objects.
     """
-    artists = []
-
+    names, hometowns = {}, {}
     for data in artist_data:
-        try:
-            artist = models.Artist.objects.get(name__iexact=data["name"])
-        except models.Artist.DoesNotExist:
-            artist = models.Artist.objects.create(**data)
-        finally:
-            if data["hometown"] and artist.hometown != data["hometown"]:
-                artist.hometown = data["hometown"]
-                artist.save()
-            artists.append(artist)
+        key = data["name"].lower()
+        names.setdefault(key, data["name"])
+        if data.get("hometown"):
+            hometowns[key] = data["hometown"]
+
+    artists = lookup_artists(names)
+    missing = [key for key in names if key not in artists]
+
+    if missing:
+        models.Artist.objects.bulk_create(
+            [
+                models.Artist(name=names[key], hometown=hometowns.get(key, ""))
+                for key in missing
+            ],
+            ignore_conflicts=True,
+        )
+        artists.update(lookup_artists(missing))
+        for key in missing:
+            if key not in artists:  # Case folding differs between Python and SQL.
+                artists[key] = models.Artist.objects.get(name__iexact=names[key])
+
+    updated = []
+    for key, hometown in hometowns.items():
+        if artists[key].hometown != hometown:
+            artists[key].hometown = hometown
+            updated.append(artists[key])
+    if updated:
+        models.Artist.objects.bulk_update(updated, ["hometown"])
+    if missing or updated:
+        signals.catalog_changed.send(sender=models.Artist)
+
+    return [artists[data["name"].lower()] for data in artist_data]
+
+
+def import_songs(song_data: list[dict[str, Any]]) -> list[models.Song]:
+    """Add songs and the albums they belong to to the database.
+
+    This utility accepts a list of dictionaries containing song
+    metadata along with the metadata of the album each song belongs to.
+    Songs whose path matches a song already in the database
+    (case-insensitively) are skipped, so the same list can safely be
+    imported more than once. The albums of the remaining songs are
+    retrieved or created with get_albums and the songs are created with
+    bulk_create_songs. This utility should be called inside a
+    transaction.
+
+    Arguments:
+        song_data (list) -- A list of dictionaries where each dictionary
+        contains the metadata for one song with the fields of the SongIn
+        schema, plus the following field:
+            album (dict) - The metadata for the album the song belongs
+            to with the fields of the AlbumIn schema [required]
+
+    Returns:
+        songs (list) -- A list of the created Song objects.
+    """
+    existing = set(
+        models.Song.objects.annotate(path_lower=Lower("path"))
+        .filter(path_lower__in=[data["path"].lower() for data in song_data])
+        .values_list("path_lower", flat=True)
+    )
+    new_songs = {}
+    for data in song_data:
+        if data["path"].lower() not in existing:
+            new_songs.setdefault(data["path"].lower(), data)
+
+    song_data = list(new_songs.values())
+    albums = get_albums([data["album"] for data in song_data])
+
+    return bulk_create_songs(
+        [dict(data, album=album) for data, album in zip(song_data, albums)]
+    )
+
+
+def lookup_artists(names: Iterable[str]) -> dict[str, models.Artist]:
+    """Retrieve existing Artist objects from the database by name.
+
+    This utility looks up all of the names with a single query against
+    the case-insensitive unique index on the artist name.
 
-    return artists
+    Arguments:
+        names (iterable) -- The lowercased names of the artists to
+        retrieve.
+
+    Returns:
+        artists (dict) -- A dictionary mapping lowercased artist names
+        to Artist objects. Names without a matching artist are omitted.
+    """
+    return {
+        artist.name.lower(): artist
+        for artist in models.Artist.objects.annotate(name_lower=Lower("name")).filter(
+            name_lower__in=list(names)
+        )
+    }
+
+
+def normalize_path(path: str) -> str:
+    """Normalize the path of a song sent by a client.
+
+    This utility converts Windows separators to slashes, removes
+    duplicate separators and "." segments, strips the LIBRARY_ROOT
+    setting from absolute paths under it, and adds the leading slash
+    songs store their path with.
+
+    Arguments:
+        path (str) -- The path of a song, either relative to the
+        library root or absolute (e.g. "wutang-clan\\enter-the-wutang-36-
+        chambers\\10_protect_ya_neck.flac").
+
+    Returns:
+        path (str) -- The path in the form stored on its Song.
+    """
+    path = posixpath.normpath("/" + path.strip().replace("\\", "/").lstrip("/"))
+    root = posixpath.normpath(settings.LIBRARY_ROOT) if settings.LIBRARY_ROOT else ""
+    if root and path.startswith(f"{root}/"):
+        path = path.removeprefix(root)
+
+    return path
+
+
+def probe_song(path: str) -> dict[str, Any]:
+    """Read the length and stream properties of a song's audio file.
+
+    This utility looks up the audio file of a song under the
+    LIBRARY_ROOT setting and parses its headers with probe.probe_file,
+    so the length of the song is taken from the file rather than from
+    the client. No audio is decoded.
+
+    Arguments:
+        path (str) -- The path of the song relative to the library root
+        (e.g. "/wutang-clan/enter-the-wutang-36-chambers/
+        10_protect_ya_neck.flac").
+
+    Returns:
+        properties (dict) -- A dictionary with the length, sample_rate,
+        bit_depth, channels, and bitrate fields of the Song, or an empty
+        dictionary if LIBRARY_ROOT is not set, the path points outside
+        of it, or the file cannot be probed.
+    """
+    if not settings.LIBRARY_ROOT:
+        return {}
+
+    # normalize_path resolves ".." segments against the leading slash, so
+    # a client cannot have a file outside the library opened.
+    root = os.path.abspath(settings.LIBRARY_ROOT)
+    file_path = os.path.join(root, normalize_path(path).lstrip("/"))
+    if os.path.commonpath([root, file_path]) != root:
+        return {}
+
+    return probe.probe_file(file_path) or {}
+
+
+def resolve_paths(paths: list[str]) -> list[int | None]:
+    """Look up the ids of the songs with the given paths.
+
+    The paths are normalized with normalize_path and matched case
+    insensitively, in both the composed and decomposed Unicode forms
+    (macOS decomposes accented file names), with one query served by
+    the duplicate_song_case_insensitive_match index on Lower(path). Both
+    sides are lowered by the database, whose case folding depends on
+    its collation, and every path is sent with its position so that the
+    same path sent in different forms resolves at each of them.
+
+    Arguments:
+        paths (list) -- The paths of the songs.
+
+    Returns:
+        ids (list) -- The ids of the songs in the order of paths, with
+        None in place of the paths no song has.
+    """
+    positions, forms = [], []
+    for position, path in enumerate(map(normalize_path, paths)):
+        for form in {unicodedata.normalize(form, path) for form in ("NFC", "NFD")}:
+            positions.append(position)
+            forms.append(form)
+
+    ids: list[int | None] = [None] * len(paths)
+    for song in models.Song.objects.raw(
+        "SELECT song.id, input.position "
+        "FROM unnest(%s::integer[], %s::text[]) AS input (position, path) "
+        f"JOIN {connection.ops.quote_name(models.Song._meta.db_table)} AS song "
+        "ON LOWER(song.path) = LOWER(input.path) "
+        "ORDER BY song.id DESC",
+        [positions, forms],
+    ):
+        ids[song.position] = song.id
+
+    return ids
 
 
 def strip_whitespace(data: dict[Any, Any]) -> dict[Any, Any]:
@@ -48,9 +489,9 @@ def strip_whitespace(data: dict[Any, Any]) -> dict[Any, Any]:
     This utility will strip whitespace from the beginning and end of
     all string values in a dictionary. If the string has multiple spaces
     between words, then those will be stripped as well so only one space
-    remains. If a field holds a list of dictionaries, then this utility
-    will call itself recursively on each dictionary in the list. All
-    other non-string fields of the dictionary will be ignored.
+    remains. If a field holds a dictionary or a list of dictionaries,
+    then this utility will call itself recursively on each dictionary.
+    All other non-string fields of the dictionary will be ignored.
 
     Arguments:
         data (dict) -- A dictionary that may contain string values with
@@ -65,6 +506,8 @@ def strip_whitespace(data: dict[Any, Any]) -> dict[Any, Any]:
             for nested_data in value:
                 if isinstance(nested_data, dict):
                     strip_whitespace(nested_data)
+        elif isinstance(value, dict):
+            strip_whitespace(value)
         elif isinstance(value, str):
             value = value.strip()
             while "  " in value:  # Remove extraneous whitespace between words.
@@ -72,3 +515,170 @@ def strip_whitespace(data: dict[Any, Any]) -> dict[Any, Any]:
             data[key] = value
 
     return data
+
+
+def upsert(
+    model: type[Model], data: dict[str, Any], conflict_target: str, updates: dict
+) -> tuple[Model, bool]:
+    """Insert a row or update the row it conflicts with in one statement.
+
+    This utility runs an INSERT ... ON CONFLICT ... DO UPDATE statement,
+    so creating an object that may already exist costs one round trip
+    instead of a failed insert followed by a lookup. Fields missing from
+    the data are set to their defaults when the row is inserted.
+
+    Arguments:
+        model (Model) -- The model of the row.
+        data (dict) -- The field values of the row.
+        conflict_target (str) -- The SQL columns or index expressions of
+        the unique constraint the row may conflict with (e.g.
+        '((LOWER("name")))').
+        updates (dict) -- A dictionary mapping the names of the fields to
+        update on conflict to SQL expressions for their new values, where
+        EXCLUDED refers to the submitted row and existing to the row in
+        the table.
+
+    Returns:
+        object (Model) -- The inserted or updated object.
+        created (bool) -- Whether the object was inserted.
+    """
+    quote = connection.ops.quote_name
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if not field.primary_key and not field.generated
+    ]
+    instance = model(**data)
+    params = [
+        field.get_db_prep_save(field.pre_save(instance, True), connection)
+        for field in fields
+    ]
+    assignments = ", ".join(
+        f"{quote(model._meta.get_field(name).column)} = {expression}"
+        for name, expression in updates.items()
+    )
+
+    # xmax is only 0 for rows inserted, rather than updated, by the statement.
+    instance = next(
+        iter(
+            model.objects.raw(
+                f"INSERT INTO {quote(model._meta.db_table)} AS existing "
+                f"({", ".join(quote(field.column) for field in fields)}) "
+                f"VALUES ({", ".join(["%s"] * len(fields))}) "
+                f"ON CONFLICT {conflict_target} DO UPDATE SET {assignments} "
+                "RETURNING *, (xmax = 0) AS created",
+                params,
+            )
+        )
+    )
+    signals.catalog_changed.send(sender=model)
+
+    return instance, instance.created
+
+
+def upsert_album(album_data: dict[str, Any]) -> tuple[models.Album, bool]:
+    """Create an album or update the album with the same title and
+    release date.
+
+    The title is matched case-insensitively. The label and album type of
+    an existing album are replaced, and the artists of the album are set
+    to the submitted artists either way.
+
+    Arguments:
+        album_data (dict) -- A dictionary containing the metadata of the
+        album with the fields of the AlbumIn schema.
+
+    Returns:
+        album (Album) -- The created or updated Album object.
+        created (bool) -- Whether the album was created.
+    """
+    album_data = dict(album_data)
+    artist_data = album_data.pop("artists")
+    album, created = upsert(
+        models.Album,
+        album_data,
+        '((LOWER("title")), "release_date")',
+        {"label": "EXCLUDED.label", "album_type": "EXCLUDED.album_type"},
+    )
+    album.artists.set(get_artists(artist_data))
+
+    return album, created
+
+
+def upsert_artist(artist_data: dict[str, str]) -> tuple[models.Artist, bool]:
+    """Create an artist or update the artist with the same name.
+
+    The name is matched case-insensitively. The hometown of an existing
+    artist is only replaced if a hometown is submitted, the same as in
+    get_artists.
+
+    Arguments:
+        artist_data (dict) -- A dictionary containing the metadata of the
+        artist with the fields of the ArtistIn schema.
+
+    Returns:
+        artist (Artist) -- The created or updated Artist object.
+        created (bool) -- Whether the artist was created.
+    """
+    return upsert(
+        models.Artist,
+        artist_data,
+        '((LOWER("name")))',
+        {"hometown": "COALESCE(NULLIF(EXCLUDED.hometown, ''), existing.hometown)"},
+    )
+
+
+def upsert_song(song_data: dict[str, Any]) -> tuple[models.Song, bool]:
+    """Create a song or update the song with the same path.
+
+    The path is matched case-insensitively. The title, album, disc,
+    track number, and length of an existing song are replaced and its
+    credits are set to the submitted artists, group members, and
+    producers. The play count of an existing song is kept.
+
+    Arguments:
+        song_data (dict) -- A dictionary containing the metadata of the
+        song with the fields of the SongIn schema, plus the following
+        field:
+            album (Album) - The Album object the song belongs to
+            [required]
+
+    Returns:
+        song (Song) -- The created or updated Song object.
+        created (bool) -- Whether the song was created.
+    """
+    song, created = upsert(
+        models.Song,
+        {
+            "release_date": song_data["album"].release_date,
+            **{
+                key: value
+                for key, value in song_data.items()
+                if key not in CREDIT_FIELDS
+            },
+        },
+        '((LOWER("path")))',
+        {
+            **{
+                field: f"EXCLUDED.{field}"
+                for field in [
+                    "title",
+                    "album_id",
+                    "release_date",
+                    "disc",
+                    "track_number",
+                    "length",
+                ]
+            },
+            **{
+                field: f"COALESCE(EXCLUDED.{field}, existing.{field})"
+                for field in probe.AUDIO_FIELDS
+            },
+        },
+    )
+    if not created:
+        models.SongArtist.objects.filter(song=song).delete()
+        models.SongProducer.objects.filter(song=song).delete()
+    bulk_create_credits([song], [song_data])
+
+    return song, created
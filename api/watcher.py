@@ -0,0 +1,197 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from collections import Counter
+
+from django.db import DatabaseError
+
+from api import library
+from api.scanner import LibraryScanner
+
+# Constants from <sys/inotify.h>.
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (
+    IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """Watch directories for changes with the Linux inotify API.
+
+    Raises:
+        OSError -- If inotify is not available on this system.
+    """
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is only available on Linux.")
+
+        self.libc = libc
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "Could not initialize inotify.")
+        self.watches = {}
+
+    def close(self):
+        os.close(self.fd)
+
+    def watch_tree(self, root: str):
+        """Watch a directory and all of the directories below it."""
+        for directory, _, _ in os.walk(root):
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(directory), WATCH_MASK
+            )
+            if wd >= 0:
+                self.watches[wd] = directory
+
+    def unwatch_tree(self, root: str):
+        """Stop watching a directory and all of the directories below it."""
+        for wd, directory in list(self.watches.items()):
+            if directory == root or directory.startswith(root + os.sep):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.watches[wd]
+
+    def read_events(self, timeout: float | None) -> list[tuple[str, int]]:
+        """Wait for events on the watched directories.
+
+        Arguments:
+            timeout (float) -- The number of seconds to wait for events,
+            or None to wait indefinitely.
+
+        Returns:
+            events (list) -- A list of (path, mask) tuples, or an empty
+            list if no events arrived before the timeout.
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+
+        data, offset, events = os.read(self.fd, 64 * 1024), 0, []
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            start = offset + EVENT_HEADER.size
+            offset = start + length
+            name = data[start:offset]
+
+            if mask & IN_IGNORED:  # The watched directory is gone.
+                self.watches.pop(wd, None)
+                continue
+
+            directory = self.watches.get(wd)
+            if directory is not None or mask & IN_Q_OVERFLOW:
+                name = os.fsdecode(name.rstrip(b"\0"))
+                events.append((os.path.join(directory or "", name), mask))
+
+        return events
+
+
+class LibraryWatcher:
+    """Keep the database in sync with a music library as it changes.
+
+    Events for the files in the library are coalesced until no new
+    events have arrived for debounce seconds, or until max_delay seconds
+    have passed since the first of them, and then synchronized with a
+    single LibraryScanner.scan of the affected paths. Copying a whole
+    album into the library therefore results in one batch of writes.
+
+    Arguments:
+        scanner (LibraryScanner) -- The scanner of the library.
+        debounce (float) -- The number of quiet seconds after which
+        pending changes are synchronized.
+        max_delay (float) -- The maximum number of seconds a change is
+        held back during a continuous burst of events.
+    """
+
+    def __init__(
+        self, scanner: LibraryScanner, debounce: float = 0.25, max_delay: float = 1.0
+    ):
+        self.scanner = scanner
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.inotify = Inotify()
+        self.inotify.watch_tree(scanner.root)
+        self.pending = set()
+        self.full_scan = False
+        self.first_event = self.last_event = 0.0
+
+    def close(self):
+        self.inotify.close()
+
+    def poll(self) -> Counter | None:
+        """Wait for events and synchronize pending changes when due.
+
+        Returns:
+            counts (Counter) -- The counts returned by the scan if
+            pending changes were synchronized, otherwise None.
+        """
+        timeout = None
+        if self.pending or self.full_scan:
+            deadline = min(
+                self.last_event + self.debounce, self.first_event + self.max_delay
+            )
+            timeout = max(deadline - time.monotonic(), 0)
+
+        events = self.inotify.read_events(timeout)
+        if events:
+            now = time.monotonic()
+            if not (self.pending or self.full_scan):
+                self.first_event = now
+            self.last_event = now
+            for path, mask in events:
+                self.handle_event(path, mask)
+
+        due = min(self.last_event + self.debounce, self.first_event + self.max_delay)
+        if (self.pending or self.full_scan) and time.monotonic() >= due:
+            return self.flush()
+        return None
+
+    def handle_event(self, path: str, mask: int):
+        """Record the path affected by an inotify event."""
+        if mask & IN_Q_OVERFLOW:
+            # Events were dropped, so nothing short of a full scan is safe.
+            self.full_scan = True
+        elif mask & IN_ISDIR:
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self.inotify.watch_tree(path)
+            elif mask & IN_MOVED_FROM:
+                self.inotify.unwatch_tree(path)
+            self.pending.add(path)
+        elif os.path.splitext(path)[1].lower() in library.AUDIO_EXTENSIONS:
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_DELETE):
+                self.pending.add(path)
+
+    def flush(self) -> Counter:
+        """Synchronize the pending changes with the database.
+
+        Raises:
+            DatabaseError -- If the scan fails outside of the writes the
+            scanner recovers from (e.g. because the database restarted).
+            The pending changes are kept, so the next poll after the
+            debounce delay retries them.
+        """
+        paths = None if self.full_scan else self.pending
+        self.pending, self.full_scan = set(), False
+
+        try:
+            return self.scanner.scan(paths)
+        except DatabaseError:
+            if paths is None:
+                self.full_scan = True
+            else:
+                self.pending |= paths
+            self.first_event = self.last_event = time.monotonic()
+            raise
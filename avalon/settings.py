@@ -94,3 +94,41 @@ USE_TZ = True
 STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# The directory song paths are relative to. Audio files found under it are
+# probed for their duration and stream properties when songs are created.
+LIBRARY_ROOT = config("LIBRARY_ROOT", default="")
+
+# The responses of the GET endpoints are cached until the catalog changes
+# (see api.cache), which only works if every process that writes to the
+# catalog (server workers and the scan_library, watch_library, and
+# probe_library commands) shares the cache. Set CACHE_LOCATION to a
+# directory to share it with the file-based backend, or set CACHE_BACKEND
+# and CACHE_LOCATION to a shared backend such as Redis or Memcached. The
+# local memory cache is private to each process, so responses are not
+# cached when no shared backend is configured.
+CACHE_LOCATION = config("CACHE_LOCATION", default="")
+CACHE_BACKEND = config(
+    "CACHE_BACKEND",
+    default=(
+        "django.core.cache.backends.filebased.FileBasedCache"
+        if CACHE_LOCATION
+        else "django.core.cache.backends.locmem.LocMemCache"
+    ),
+)
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_LOCATION,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+RESPONSE_CACHE = not CACHE_BACKEND.endswith(".LocMemCache")
+RESPONSE_CACHE_TIMEOUT = config("RESPONSE_CACHE_TIMEOUT", default=3600, cast=int)
+# Streamed responses are only cached up to this size (in bytes), so that the
+# content of a long stream is not held in memory while it is sent.
+RESPONSE_CACHE_MAX_STREAM_SIZE = config(
+    "RESPONSE_CACHE_MAX_STREAM_SIZE", default=1024 * 1024, cast=int
+)
@@ -5,3 +5,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "avalon.settings")
 
 application = get_wsgi_application()
+
+# Build the typeahead indexes of each worker process in the background as it
+# starts, rather than on the first lookup. Servers that load the application
+# before forking their workers (e.g. gunicorn --preload) have to start the
+# thread in each worker instead, as threads do not survive a fork.
+from api import typeahead  # noqa: E402
+
+typeahead.index.start()